@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Batch Review
+Run the diff generator over many repositories in parallel.
+
+Repositories come from the command line or a manifest: a text file with one
+path per line, or a JSON list of objects with ``repo`` and optionally
+``base``, ``head``, ``merge_base``, ``range`` and ``output_dir``. Each repository is reviewed
+in a worker process of a process pool and gets its own output directory
+(with the generator's output captured in ``review.log``). A semaphore shared
+by all workers caps the number of endpoint calls in flight across the whole
+batch (or, with ``--rate-limit-db``, the adaptive limit shared with every
+other run on the host), and one ``index.json`` summarizes every repository.
+With ``--findings-ndjson`` every worker also appends its findings to one
+shared NDJSON file::
+
+    python scripts/batch_review.py --manifest repos.txt --processes 16 --max-endpoint-calls 4
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from findings_stream import FindingsStream
+from generate_diff import DATABRICKS_ENDPOINT_URL, DiffGenerator
+from http_transport import EndpointTransport
+from rate_limiter import SharedRateLimiter
+from review_cache import ReviewCache
+from security_prefilter import SecurityPrefilter
+
+
+# Set in each worker process by _init_worker.
+_ENDPOINT_LIMITER = None
+
+
+def _init_worker(limiter):
+    global _ENDPOINT_LIMITER
+    _ENDPOINT_LIMITER = limiter
+
+
+def load_manifest(path: str) -> List[Dict]:
+    """
+    Read a manifest: a JSON list of job objects or strings, or one repository path per line.
+
+    Relative repository paths are taken relative to the manifest's directory,
+    not the current one, so a manifest works wherever the batch is started.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        jobs = [dict(entry) if isinstance(entry, dict) else {"repo": entry} for entry in json.loads(text)]
+    else:
+        jobs = [
+            {"repo": line.strip()}
+            for line in text.splitlines()
+            if line.strip() and not line.strip().startswith('#')
+        ]
+    for job in jobs:
+        job["repo"] = str(Path(path).parent / job["repo"])
+    return jobs
+
+
+def repo_output_dir(output_root: str, repo: str) -> str:
+    """Per-repository output directory; the path hash keeps same-named repositories apart."""
+    repo = os.path.abspath(repo)
+    digest = hashlib.sha1(repo.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(output_root, f"{os.path.basename(repo.rstrip(os.sep)) or 'repo'}-{digest}")
+
+
+def review_repo(job: Dict, options: Dict) -> Dict:
+    """
+    Review one repository; runs in a worker process.
+
+    Args:
+        job: Manifest entry (``repo`` plus optional ``base``, ``head``, ``merge_base``, ``range``, ``output_dir``)
+        options: Settings shared by the batch (endpoint, generator and cache options)
+
+    Returns:
+        Index entry for the repository
+    """
+    repo = os.path.abspath(job["repo"])
+    output_dir = job.get("output_dir") or repo_output_dir(options["output_root"], repo)
+    entry = {"repo": repo, "output_dir": output_dir, "status": "failed"}
+    start = time.perf_counter()
+
+    if not os.path.exists(os.path.join(repo, ".git")):
+        entry["error"] = "Not a git repository"
+        return entry
+
+    os.makedirs(output_dir, exist_ok=True)
+    limiter = _ENDPOINT_LIMITER
+    if options.get("rate_limit_db"):
+        limiter = SharedRateLimiter(options["endpoint_url"], options["rate_limit_db"],
+                                    max_concurrency=options["max_endpoint_calls"])
+    transport = EndpointTransport(
+        options["endpoint_url"],
+        pool_size=options["pool_size"],
+        read_timeout=options["read_timeout"],
+        gzip_body=options["gzip"],
+        max_retries=options["max_retries"],
+        limiter=limiter
+    )
+    cache = None
+    if options.get("cache_path"):
+        cache = ReviewCache(options["cache_path"])
+    prefilter = None
+    if options["prefilter"] != "off":
+        prefilter = SecurityPrefilter.from_catalog(extra_rules_path=options.get("prefilter_rules"))
+
+    generator = None
+    try:
+        with open(os.path.join(output_dir, "review.log"), 'w', encoding='utf-8') as log, redirect_stdout(log):
+            generator = DiffGenerator(
+                options["context_lines"],
+                output_dir,
+                chunked=options["chunked"],
+                max_chunk_bytes=options["max_chunk_bytes"],
+                max_workers=options["max_workers"],
+                cache=cache,
+                transport=transport,
+                prefilter=prefilter,
+                prefilter_mode=options["prefilter"],
+                base=job.get("base"),
+                head=job.get("head"),
+                merge_base=bool(job.get("merge_base")),
+                commit_range=job.get("range"),
+                compact_json=options["compact_json"],
+                findings_stream=FindingsStream(options["findings_ndjson"]) if options.get("findings_ndjson") else None,
+                repo_path=repo
+            )
+            report = generator.generate()
+
+        severities = Counter(finding.get("severity") or "Unspecified" for finding in report.get("findings", []))
+        entry.update({
+            "status": "done",
+            "commit": report["commits"]["current"]["hash"],
+            "previous_commit": report["commits"]["previous"]["hash"],
+            "diff_lines": report["statistics"]["total_diff_lines"],
+            "changed_files": report["statistics"]["changed_files"],
+            "ai_review": "ai_review" in report,
+            "findings": sum(severities.values()),
+            "severities": dict(severities),
+            "queue_wait_seconds": report["timings"]["http"]["queue_wait_seconds"],
+            "report": os.path.join(output_dir, "diff_report.json")
+        })
+    except Exception as e:
+        entry["error"] = str(e)
+    finally:
+        if generator is not None:
+            generator.close()
+        else:
+            transport.close()
+        if cache is not None:
+            cache.close()
+        entry["seconds"] = round(time.perf_counter() - start, 3)
+    return entry
+
+
+def run_batch(jobs: List[Dict], options: Dict, processes: int, max_endpoint_calls: int) -> Dict:
+    """
+    Review every job across a process pool and build the aggregated index.
+
+    Returns:
+        The index: one entry per repository, in manifest order, plus totals
+    """
+    context = multiprocessing.get_context()
+    limiter = context.BoundedSemaphore(max_endpoint_calls)
+    start = time.perf_counter()
+    entries: List[Optional[Dict]] = [None] * len(jobs)
+
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                             initializer=_init_worker, initargs=(limiter,)) as pool:
+        futures = {pool.submit(review_repo, job, options): index for index, job in enumerate(jobs)}
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                entry = {"repo": jobs[index]["repo"], "status": "failed", "error": str(e)}
+            entries[index] = entry
+            marker = "✅" if entry["status"] == "done" else "❌"
+            detail = f"{entry.get('findings', 0)} findings" if entry["status"] == "done" else entry.get("error", "")
+            print(f"{marker} [{done}/{len(jobs)}] {entry['repo']}: {detail}")
+
+    severities: Counter = Counter()
+    for entry in entries:
+        severities.update(entry.get("severities", {}))
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "seconds": round(time.perf_counter() - start, 3),
+        "processes": processes,
+        "max_endpoint_calls": max_endpoint_calls,
+        "totals": {
+            "repos": len(entries),
+            "done": sum(1 for entry in entries if entry["status"] == "done"),
+            "failed": sum(1 for entry in entries if entry["status"] != "done"),
+            "findings": sum(severities.values()),
+            "severities": dict(severities)
+        },
+        "repos": entries
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Review many repositories in parallel")
+    parser.add_argument("repos", nargs="*", help="Repository paths")
+    parser.add_argument("--manifest", "-m", type=str, default=None,
+                        help="File listing repositories: one path per line, or a JSON list of job objects")
+    parser.add_argument("--output-root", "-o", type=str, default="batch_output",
+                        help="Directory holding one output directory per repository and index.json (default: batch_output)")
+    parser.add_argument("--processes", "-p", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--max-endpoint-calls", type=int, default=4,
+                        help="Endpoint calls in flight across the whole batch (default: 4)")
+    parser.add_argument("--base", type=str, default=None, help="Base revision for every repository")
+    parser.add_argument("--head", type=str, default=None, help="Head revision for every repository")
+    parser.add_argument("--merge-base", action="store_true",
+                        help="Diff each head against the merge base of its base and head")
+    parser.add_argument("--range", type=str, default=None, dest="commit_range",
+                        help="Review every commit of BASE..HEAD in every repository")
+    parser.add_argument("--context-lines", "-c", type=int, default=10, help="Number of context lines (default: 10)")
+    parser.add_argument("--chunked", action="store_true", help="Review diffs in concurrent chunks")
+    parser.add_argument("--max-chunk-bytes", type=int, default=200_000, help="Maximum size of a review chunk (default: 200000)")
+    parser.add_argument("--max-workers", type=int, default=4, help="Concurrent chunk requests per repository (default: 4)")
+    parser.add_argument(
+        "--endpoint-url",
+        type=str,
+        default=os.environ.get('DATABRICKS_ENDPOINT_URL', DATABRICKS_ENDPOINT_URL),
+        help="Model serving endpoint URL (default: $DATABRICKS_ENDPOINT_URL or the SecureGuard endpoint)"
+    )
+    parser.add_argument("--pool-size", type=int, default=10, help="Pooled connections per worker process (default: 10)")
+    parser.add_argument("--read-timeout", type=float, default=30.0, help="Endpoint read timeout in seconds (default: 30)")
+    parser.add_argument("--max-retries", type=int, default=3, help="Retries for transient endpoint failures (default: 3)")
+    parser.add_argument("--rate-limit-db", type=str, default=None,
+                        help="Use the adaptive limit shared through this SQLite database instead of a batch semaphore; "
+                             "--max-endpoint-calls becomes its upper bound")
+    parser.add_argument("--gzip", action="store_true", help="Send gzip-compressed request bodies")
+    parser.add_argument("--cache-path", type=str, default=None, help="Review cache database shared by all workers")
+    parser.add_argument("--prefilter", choices=["off", "report", "flagged", "gate"], default="off",
+                        help="Local pattern scan mode (default: off)")
+    parser.add_argument("--prefilter-rules", type=str, default=None, help="JSON file with extra prefilter rules")
+    parser.add_argument("--compact-json", action="store_true", help="Write reports without indentation")
+    parser.add_argument("--findings-ndjson", type=str, default=None,
+                        help="NDJSON file every repository appends its findings and run summary to")
+    args = parser.parse_args()
+
+    jobs = [{"repo": repo} for repo in args.repos]
+    if args.manifest:
+        jobs.extend(load_manifest(args.manifest))
+    if not jobs:
+        print("❌ No repositories given (pass paths or --manifest)")
+        sys.exit(1)
+
+    if args.processes <= 0 or args.max_endpoint_calls <= 0:
+        print("❌ --processes and --max-endpoint-calls must be positive")
+        sys.exit(1)
+
+    if args.commit_range and (args.base or args.head):
+        print("❌ --range cannot be combined with --base/--head")
+        sys.exit(1)
+
+    for job in jobs:
+        for key, value in (("base", args.base), ("head", args.head), ("merge_base", args.merge_base),
+                           ("range", args.commit_range)):
+            if value and key not in job:
+                job[key] = value
+
+    os.makedirs(args.output_root, exist_ok=True)
+    options = {
+        "output_root": os.path.abspath(args.output_root),
+        "endpoint_url": args.endpoint_url,
+        "pool_size": args.pool_size,
+        "read_timeout": args.read_timeout,
+        "max_retries": args.max_retries,
+        "gzip": args.gzip,
+        "cache_path": os.path.abspath(args.cache_path) if args.cache_path else None,
+        "prefilter": args.prefilter,
+        "prefilter_rules": args.prefilter_rules,
+        "context_lines": args.context_lines,
+        "chunked": args.chunked,
+        "max_chunk_bytes": args.max_chunk_bytes,
+        "max_workers": args.max_workers,
+        "compact_json": args.compact_json,
+        "findings_ndjson": os.path.abspath(args.findings_ndjson) if args.findings_ndjson else None,
+        "rate_limit_db": os.path.abspath(args.rate_limit_db) if args.rate_limit_db else None,
+        "max_endpoint_calls": args.max_endpoint_calls
+    }
+
+    processes = min(args.processes, len(jobs))
+    print(f"🚀 Reviewing {len(jobs)} repositories with {processes} processes, "
+          f"at most {args.max_endpoint_calls} endpoint calls at a time")
+    index = run_batch(jobs, options, processes, args.max_endpoint_calls)
+
+    index_file = os.path.join(args.output_root, "index.json")
+    with open(index_file, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+
+    totals = index["totals"]
+    print(f"📊 Batch complete in {index['seconds']:.1f}s: {totals['done']} reviewed, "
+          f"{totals['failed']} failed, {totals['findings']} findings")
+    print(f"📁 Index saved to: {index_file}")
+    if totals["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
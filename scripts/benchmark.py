@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+Diff Generator Benchmark
+Times ``DiffGenerator.generate`` against synthetic repositories and a local mock endpoint.
+
+Each scenario builds a throwaway git repository (with ``git fast-import``, so
+even thousands of commits take a moment), starts a ``MockEndpoint`` with the
+scenario's latency and response size, and runs the generator in a fresh
+process. Time spent in git, in endpoint calls, in rendering and in writing
+the JSON report is measured by wrapping the generator's own entry points;
+peak memory is the process's maximum resident set size.
+
+Results are written as JSON. ``--baseline`` compares them with an earlier
+run and ``--budget`` with absolute limits; either exits non-zero when a
+metric regresses::
+
+    python scripts/benchmark.py -o bench.json
+    python scripts/benchmark.py --baseline bench.json --tolerance 0.2
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from mock_endpoint import MockEndpoint
+
+
+@dataclass
+class Scenario:
+    name: str
+    files: int = 20
+    changed_files: int = 5
+    lines_per_file: int = 200
+    line_length: int = 60
+    change_ratio: float = 0.1
+    binary_files: int = 0
+    binary_bytes: int = 64 * 1024
+    commits: int = 2
+    latency: float = 0.05
+    response_bytes: int = 2000
+    options: Dict = field(default_factory=dict)
+
+
+SCENARIOS = [
+    Scenario("small"),
+    Scenario("wide", files=2000, changed_files=500, lines_per_file=40),
+    Scenario("large-diff", files=40, changed_files=40, lines_per_file=5000, change_ratio=0.5),
+    Scenario("large-diff-stream", files=40, changed_files=40, lines_per_file=5000, change_ratio=0.5,
+             options={"stream": True}),
+    Scenario("large-diff-pipelined", files=40, changed_files=40, lines_per_file=5000, change_ratio=0.5,
+             options={"pipelined": True}),
+    Scenario("long-lines", files=10, changed_files=10, line_length=20000),
+    Scenario("binary", binary_files=50),
+    Scenario("chunked", files=200, changed_files=200, lines_per_file=300,
+             options={"chunked": True, "max_chunk_bytes": 100_000}),
+    Scenario("history", files=100, changed_files=10, commits=200,
+             options={"commit_range": "HEAD~100..HEAD", "commits_per_request": 5}),
+]
+
+# Metrics compared against a baseline or budget.
+METRICS = ["wall_seconds", "git_seconds", "api_seconds", "render_seconds",
+           "serialization_seconds", "peak_rss_mb"]
+
+# Changes smaller than this many seconds are treated as noise.
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def _line(file_index: int, line_index: int, length: int, revision: int) -> str:
+    """One line of Python-looking source, fully determined by its position and revision."""
+    prefix = f"value_{file_index}_{line_index} = compute({line_index}, {revision}, '"
+    filler = f"{(file_index * 7919 + line_index * 104729 + revision * 1299709) % 2 ** 32:08x}"
+    body = (filler * (length // len(filler) + 1))[:max(0, length - len(prefix) - 2)]
+    return prefix + body + "')"
+
+
+def _text_file(scenario: Scenario, file_index: int, revision: int, changed: Optional[set] = None) -> bytes:
+    lines = []
+    for line_index in range(scenario.lines_per_file):
+        line_revision = revision if changed is None or line_index in changed else 0
+        lines.append(_line(file_index, line_index, scenario.line_length, line_revision))
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _binary_file(rng: random.Random, size: int) -> bytes:
+    return b'\0' + rng.randbytes(max(0, size - 1))
+
+
+def build_repo(scenario: Scenario, path: Path, seed: int = 0) -> Dict:
+    """
+    Build a synthetic repository for ``scenario`` at ``path``.
+
+    The first commit adds every file; intermediate commits each touch one
+    file; the last commit rewrites ``change_ratio`` of the lines of
+    ``changed_files`` files and every binary file.
+
+    Returns:
+        Build statistics (seconds, commits, bytes imported)
+    """
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    subprocess.run(["git", "init", "-q", "-b", "main", str(path)], check=True)
+
+    stream = io.BytesIO()
+
+    def data(payload: bytes):
+        stream.write(f"data {len(payload)}\n".encode())
+        stream.write(payload)
+        stream.write(b"\n")
+
+    def commit(mark: int, message: str, changes: List[tuple]):
+        stream.write(f"commit refs/heads/main\nmark :{mark}\n".encode())
+        stream.write(f"committer Bench <bench@example.com> {1700000000 + mark} +0000\n".encode())
+        data(message.encode())
+        if mark > 1:
+            stream.write(f"from :{mark - 1}\n".encode())
+        for file_path, payload in changes:
+            stream.write(f"M 100644 inline {file_path}\n".encode())
+            data(payload)
+
+    changed_lines = max(1, int(scenario.lines_per_file * scenario.change_ratio))
+    initial = [(f"src/module_{i}.py", _text_file(scenario, i, 0)) for i in range(scenario.files)]
+    initial += [(f"assets/blob_{i}.bin", _binary_file(rng, scenario.binary_bytes)) for i in range(scenario.binary_files)]
+    commit(1, "Initial import", initial)
+
+    for mark in range(2, scenario.commits):
+        file_index = (mark - 2) % max(1, scenario.files)
+        changed = set(rng.sample(range(scenario.lines_per_file), min(3, scenario.lines_per_file)))
+        commit(mark, f"Touch module {file_index}",
+               [(f"src/module_{file_index}.py", _text_file(scenario, file_index, mark, changed))])
+
+    last = max(2, scenario.commits)
+    final = []
+    for file_index in range(min(scenario.changed_files, scenario.files)):
+        changed = set(rng.sample(range(scenario.lines_per_file), changed_lines))
+        final.append((f"src/module_{file_index}.py", _text_file(scenario, file_index, last, changed)))
+    final += [(f"assets/blob_{i}.bin", _binary_file(rng, scenario.binary_bytes)) for i in range(scenario.binary_files)]
+    commit(last, "Benchmark change", final)
+
+    payload = stream.getvalue()
+    subprocess.run(["git", "fast-import", "--quiet"], input=payload, cwd=path, check=True)
+    subprocess.run(["git", "checkout", "-q", "main"], cwd=path, check=True)
+
+    return {
+        "build_seconds": round(time.perf_counter() - start, 3),
+        "commits": last,
+        "imported_bytes": len(payload)
+    }
+
+
+class StageTimer:
+    """
+    Accumulates seconds and call counts per stage.
+
+    Calls made concurrently from worker threads are summed, so a stage's
+    total can exceed the wall time of the run.
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, elapsed: float, calls: int = 1):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + elapsed
+            self.calls[stage] = self.calls.get(stage, 0) + calls
+
+    def wrap(self, stage: str, func: Callable) -> Callable:
+        """Time every call of ``func`` under ``stage``."""
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return timed
+
+    def wrap_iterator(self, stage: str, func: Callable) -> Callable:
+        """Time only the ``next`` calls of the iterators ``func`` returns, not their consumers."""
+        def timed(*args, **kwargs) -> Iterator:
+            iterator = iter(func(*args, **kwargs))
+            self.add(stage, 0.0)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self.add(stage, time.perf_counter() - start, calls=0)
+                    return
+                self.add(stage, time.perf_counter() - start, calls=0)
+                yield item
+        return timed
+
+
+def run_scenario(scenario: Dict, repo: str, endpoint_url: str, verbose: bool = False) -> Dict:
+    """
+    Run the generator once on ``repo``; executed in a fresh process.
+
+    Returns:
+        Per-stage timings, counters and peak memory of the run
+    """
+    from generate_diff import DiffGenerator
+    from http_transport import EndpointTransport
+
+    os.chdir(repo)
+    os.environ.setdefault('DATABRICKS_TOKEN', 'benchmark')
+    output_dir = tempfile.mkdtemp(prefix="bench-out-")
+    timer = StageTimer()
+
+    generator = DiffGenerator(
+        output_dir=output_dir,
+        transport=EndpointTransport(endpoint_url, read_timeout=300),
+        **scenario["options"]
+    )
+    generator.git.run = timer.wrap("git", generator.git.run)
+    generator.git.resolve = timer.wrap("git", generator.git.resolve)
+    generator.git.iter_lines = timer.wrap_iterator("git", generator.git.iter_lines)
+    generator.transport.post = timer.wrap("api", generator.transport.post)
+    generator.create_markdown_summary = timer.wrap("render", generator.create_markdown_summary)
+    generator.create_pr_comment = timer.wrap("render", generator.create_pr_comment)
+    generator.write_json_report = timer.wrap("serialization", generator.write_json_report)
+
+    sink = sys.stdout if verbose else open(os.devnull, 'w')
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(sink):
+            report = generator.generate()
+    finally:
+        wall = time.perf_counter() - start
+        generator.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    diff_bytes = os.path.getsize(os.path.join(output_dir, "code_diff.txt"))
+    report_bytes = os.path.getsize(os.path.join(output_dir, "diff_report.json"))
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    measured = sum(timer.seconds.get(stage, 0.0) for stage in ("git", "api", "render", "serialization"))
+    return {
+        "wall_seconds": wall,
+        "git_seconds": timer.seconds.get("git", 0.0),
+        "api_seconds": timer.seconds.get("api", 0.0),
+        "render_seconds": timer.seconds.get("render", 0.0),
+        "serialization_seconds": timer.seconds.get("serialization", 0.0),
+        "other_seconds": max(0.0, wall - measured),
+        "git_processes": generator.git.process_count,
+        "api_requests": timer.calls.get("api", 0),
+        "diff_bytes": diff_bytes,
+        "report_bytes": report_bytes,
+        "diff_lines": report["statistics"]["total_diff_lines"],
+        "ai_review": "ai_review" in report,
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def _peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process in MiB.
+
+    On Linux ``ru_maxrss`` survives ``exec`` and so may report the parent's
+    peak; ``VmHWM`` belongs to the current address space only.
+    """
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def benchmark(scenario: Scenario, work_dir: Path, repeat: int = 1, verbose: bool = False) -> Dict:
+    """Build the scenario's repository and run it ``repeat`` times, reporting the median of each metric."""
+    repo = work_dir / scenario.name
+    if repo.exists():
+        shutil.rmtree(repo)
+    repo.mkdir(parents=True)
+    print(f"🏗️  Building {scenario.name} repository...", file=sys.stderr)
+    build = build_repo(scenario, repo)
+
+    endpoint = MockEndpoint(latency=scenario.latency, response_bytes=scenario.response_bytes).start()
+    runs = []
+    try:
+        for index in range(repeat):
+            print(f"⏱️  Running {scenario.name} ({index + 1}/{repeat})...", file=sys.stderr)
+            # A fresh process per run keeps peak memory and caches independent
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                runs.append(pool.submit(run_scenario, asdict(scenario), str(repo), endpoint.url, verbose).result())
+    finally:
+        endpoint.stop()
+
+    result = {"name": scenario.name, "config": asdict(scenario), "repo": build, "runs": len(runs)}
+    for key, value in runs[0].items():
+        if isinstance(value, float):
+            result[key] = round(statistics.median(run[key] for run in runs), 4)
+        else:
+            result[key] = value
+    return result
+
+
+def check_regressions(results: Dict, baseline: Optional[Dict] = None, tolerance: float = 0.2,
+                      budget: Optional[Dict] = None) -> List[str]:
+    """
+    Compare results with a previous run and/or absolute budgets.
+
+    Args:
+        results: Output of this run
+        baseline: Output of an earlier run; a metric regresses when it grew by more than ``tolerance``
+        tolerance: Allowed relative growth over the baseline
+        budget: ``{scenario: {metric: maximum}}`` absolute limits
+
+    Returns:
+        Human-readable descriptions of every regression
+    """
+    problems = []
+    previous = {scenario["name"]: scenario for scenario in (baseline or {}).get("scenarios", [])}
+    for scenario in results["scenarios"]:
+        name = scenario["name"]
+        for metric in METRICS:
+            value = scenario.get(metric)
+            if value is None:
+                continue
+            if name in previous and metric in previous[name]:
+                before = previous[name][metric]
+                limit = before * (1 + tolerance)
+                if metric.endswith("_seconds"):
+                    limit = max(limit, before + MIN_REGRESSION_SECONDS)
+                if value > limit:
+                    problems.append(f"{name}: {metric} {value:.3f} exceeds baseline {before:.3f} (+{tolerance:.0%})")
+            maximum = (budget or {}).get(name, {}).get(metric)
+            if maximum is not None and value > maximum:
+                problems.append(f"{name}: {metric} {value:.3f} exceeds budget {maximum:.3f}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the diff generator on synthetic repositories")
+    parser.add_argument(
+        "--scenario", "-s",
+        action="append",
+        choices=[scenario.name for scenario in SCENARIOS],
+        help="Scenario to run; repeat for several (default: all)"
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="List the scenarios and exit"
+    )
+    parser.add_argument(
+        "--repeat", "-r",
+        type=int,
+        default=1,
+        help="Runs per scenario; the median of each metric is reported (default: 1)"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=None,
+        help="Override the mock endpoint latency in seconds"
+    )
+    parser.add_argument(
+        "--response-bytes",
+        type=int,
+        default=None,
+        help="Override the mock endpoint response size"
+    )
+    parser.add_argument(
+        "--work-dir",
+        type=str,
+        default=None,
+        help="Directory for the synthetic repositories (default: a temporary directory, removed afterwards)"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        type=str,
+        default=None,
+        help="Write the results to this JSON file (default: stdout)"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="Results of an earlier run to compare against"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative growth over the baseline (default: 0.2)"
+    )
+    parser.add_argument(
+        "--budget",
+        type=str,
+        default=None,
+        help="JSON file of absolute limits: {\"scenario\": {\"wall_seconds\": 2.0, ...}}"
+    )
+    parser.add_argument(
+        "--verbose", "-v",
+        action="store_true",
+        help="Show the generator's own output"
+    )
+    args = parser.parse_args()
+
+    if args.list:
+        for scenario in SCENARIOS:
+            print(f"{scenario.name}: {json.dumps(asdict(scenario))}")
+        return
+
+    if args.repeat <= 0:
+        print("❌ --repeat must be positive")
+        sys.exit(1)
+
+    selected = [scenario for scenario in SCENARIOS if not args.scenario or scenario.name in args.scenario]
+    for scenario in selected:
+        if args.latency is not None:
+            scenario.latency = args.latency
+        if args.response_bytes is not None:
+            scenario.response_bytes = args.response_bytes
+
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="diff-bench-"))
+    try:
+        results = {
+            "benchmark": "generate_diff",
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scenarios": [benchmark(scenario, work_dir, args.repeat, args.verbose) for scenario in selected]
+        }
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    serialized = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(serialized)
+        print(f"📁 Results saved to: {args.output}", file=sys.stderr)
+    else:
+        print(serialized)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    budget = None
+    if args.budget:
+        with open(args.budget, 'r', encoding='utf-8') as f:
+            budget = json.load(f)
+
+    problems = check_regressions(results, baseline, args.tolerance, budget)
+    for problem in problems:
+        print(f"❌ {problem}", file=sys.stderr)
+    if problems:
+        sys.exit(1)
+    if baseline or budget:
+        print("✅ No regressions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Catalog Index
+In-process similarity search over security_vulnerabilities.json.
+
+Each catalog entry's ``bad_code`` is indexed as a TF-IDF vector over code
+tokens (identifiers, their snake_case parts and dotted ``module.call``
+pairs). The vectors are stored as an inverted index in flat arrays: per term
+its IDF and the offset of its postings, per posting an entry number and a
+weight. The index is persisted to one binary file (a small JSON header with
+the vocabulary and the examples, then the arrays) that loads with a few
+``frombytes`` calls, and is rebuilt only when the catalog's hash changes.
+
+For every changed hunk of a diff, the added lines are scored against the
+index and the best matching examples (``bad_code`` with its ``good_code``)
+are attached to the request, so the endpoint has the relevant catalog
+context without a remote vector search.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import struct
+import hashlib
+import tempfile
+import threading
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from diff_packer import file_path, iter_file_diffs
+from hunk_dedup import hunk_location
+from security_prefilter import DEFAULT_CATALOG
+
+
+DEFAULT_INDEX_PATH = os.path.join(tempfile.gettempdir(), "secureguard_catalog_index.bin")
+
+# File signature; bump the version when the layout changes.
+INDEX_MAGIC = b"SGCATIDX1\n"
+
+# Examples retrieved per hunk.
+DEFAULT_TOP_K = 3
+
+# Cosine similarity below which an example is not worth sending.
+MIN_SIMILARITY = 0.15
+
+# Distinct examples attached to one request, however many hunks it holds.
+MAX_ATTACHED_EXAMPLES = 10
+
+TOKEN_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*')
+
+# Tokens too short or too common in code to tell examples apart.
+STOP_TOKENS = {
+    'self', 'def', 'return', 'import', 'from', 'as', 'if', 'else', 'for', 'in', 'with',
+    'and', 'or', 'not', 'is', 'none', 'true', 'false', 'the', 'to', 'of', 'a'
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split code into index terms.
+
+    ``hashlib.md5`` yields ``hashlib.md5``, ``hashlib`` and ``md5``;
+    ``file_path`` yields ``file_path``, ``file`` and ``path``.
+    """
+    terms: List[str] = []
+    for match in TOKEN_RE.finditer(text):
+        token = match.group(0).lower()
+        names = token.split('.')
+        if len(names) > 1:
+            terms.extend(f"{left}.{right}" for left, right in zip(names, names[1:]))
+        for name in names:
+            if name in STOP_TOKENS or len(name) < 2:
+                continue
+            terms.append(name)
+            if '_' in name.strip('_'):
+                terms.extend(part for part in name.split('_') if len(part) > 1 and part not in STOP_TOKENS)
+    return terms
+
+
+def term_weights(terms: Iterable[str]) -> Dict[str, float]:
+    """Sublinear term frequencies: ``1 + log(tf)``."""
+    return {term: 1.0 + math.log(count) for term, count in Counter(terms).items()}
+
+
+class CatalogIndex:
+    def __init__(self, digest: str, terms: List[str], entries: List[Dict], idf: array,
+                 offsets: array, postings: array, weights: array):
+        """
+        Args:
+            digest: SHA-256 of the catalog the index was built from
+            terms: Vocabulary, in term id order
+            entries: Catalog examples, in entry number order
+            idf: Inverse document frequency per term id
+            offsets: Start of each term's postings; ``offsets[t + 1]`` is its end
+            postings: Entry number of each posting
+            weights: Normalized TF-IDF weight of each posting
+        """
+        self.digest = digest
+        self.terms = terms
+        self.entries = entries
+        self.idf = idf
+        self.offsets = offsets
+        self.postings = postings
+        self.weights = weights
+        self._term_ids = {term: index for index, term in enumerate(terms)}
+        self.built = False
+        self.load_seconds = 0.0
+        self.queries = 0
+        self.matched = 0
+        self.query_seconds = 0.0
+        self.max_query_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, catalog: Dict, digest: str) -> "CatalogIndex":
+        """Index the ``bad_code`` of every catalog entry."""
+        entries = []
+        documents: List[Dict[str, float]] = []
+        for entry in catalog.get("vulnerabilities", []):
+            weights = term_weights(tokenize(entry.get("bad_code", "")))
+            if not weights:
+                continue
+            entries.append({
+                "id": entry.get("id"),
+                "attack_type": entry.get("attack_type", ""),
+                "cve": entry.get("cve", ""),
+                "bad_code": entry.get("bad_code", ""),
+                "good_code": entry.get("good_code", "")
+            })
+            documents.append(weights)
+
+        document_frequency = Counter(term for document in documents for term in document)
+        terms = sorted(document_frequency)
+        # Smoothed IDF, as scikit-learn computes it, so no term weighs zero
+        idf_values = {term: math.log((1 + len(documents)) / (1 + document_frequency[term])) + 1.0 for term in terms}
+
+        postings_by_term: Dict[str, List[Tuple[int, float]]] = {term: [] for term in terms}
+        for number, document in enumerate(documents):
+            vector = {term: weight * idf_values[term] for term, weight in document.items()}
+            norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+            for term, value in vector.items():
+                postings_by_term[term].append((number, value / norm))
+
+        idf, offsets, postings, weights = array('f'), array('I', [0]), array('I'), array('f')
+        for term in terms:
+            idf.append(idf_values[term])
+            for number, weight in postings_by_term[term]:
+                postings.append(number)
+                weights.append(weight)
+            offsets.append(len(postings))
+
+        index = cls(digest, terms, entries, idf, offsets, postings, weights)
+        index.built = True
+        return index
+
+    def save(self, path: str):
+        """Write the index atomically: magic, header length, JSON header, then the arrays."""
+        header = json.dumps({
+            "catalog_sha256": self.digest,
+            "terms": self.terms,
+            "entries": self.entries,
+            "postings": len(self.postings)
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temp_file, 'wb') as f:
+            f.write(INDEX_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for values in (self.idf, self.offsets, self.postings, self.weights):
+                f.write(_little_endian(array(values.typecode, values)).tobytes())
+        os.replace(temp_file, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CatalogIndex":
+        """Read an index written by ``save``."""
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(INDEX_MAGIC):
+            raise ValueError(f"{path} is not a catalog index")
+        position = len(INDEX_MAGIC)
+        (header_size,) = struct.unpack_from('<I', data, position)
+        position += 4
+        header = json.loads(data[position:position + header_size].decode('utf-8'))
+        position += header_size
+
+        sizes = (len(header["terms"]), len(header["terms"]) + 1, header["postings"], header["postings"])
+        arrays = []
+        for typecode, count in zip('fIIf', sizes):
+            values = array(typecode)
+            end = position + count * values.itemsize
+            values.frombytes(data[position:end])
+            arrays.append(_little_endian(values))
+            position = end
+        if position != len(data):
+            raise ValueError(f"{path} is truncated or corrupt")
+        return cls(header["catalog_sha256"], header["terms"], header["entries"], *arrays)
+
+    @classmethod
+    def load_or_build(cls, catalog_path: Optional[str] = None,
+                      index_path: str = DEFAULT_INDEX_PATH) -> "CatalogIndex":
+        """
+        Load the persisted index, rebuilding and saving it when missing, unreadable or stale.
+
+        Args:
+            catalog_path: Vulnerability catalog (default: security_vulnerabilities.json)
+            index_path: Index file, shared by every run on the host
+        """
+        start = time.perf_counter()
+        with open(catalog_path or DEFAULT_CATALOG, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        index = None
+        if os.path.exists(index_path):
+            try:
+                index = cls.load(index_path)
+            except (OSError, ValueError, KeyError, struct.error):
+                index = None
+            if index is not None and index.digest != digest:
+                index = None
+        if index is None:
+            index = cls.build(json.loads(raw.decode('utf-8')), digest)
+            try:
+                index.save(index_path)
+            except OSError as e:
+                print(f"⚠️  Could not save catalog index to {index_path}: {e}")
+        index.load_seconds = time.perf_counter() - start
+        return index
+
+    def query(self, text: str, k: int = DEFAULT_TOP_K) -> List[Tuple[int, float]]:
+        """
+        Score code against every example.
+
+        Returns:
+            Up to ``k`` (entry number, cosine similarity) pairs of at least
+            ``MIN_SIMILARITY``, best first
+        """
+        start = time.perf_counter()
+        vector: Dict[int, float] = {}
+        for term, weight in term_weights(tokenize(text)).items():
+            term_id = self._term_ids.get(term)
+            if term_id is not None:
+                vector[term_id] = weight * self.idf[term_id]
+        scores: Dict[int, float] = {}
+        if vector:
+            norm = math.sqrt(sum(value * value for value in vector.values()))
+            for term_id, value in vector.items():
+                value /= norm
+                for position in range(self.offsets[term_id], self.offsets[term_id + 1]):
+                    number = self.postings[position]
+                    scores[number] = scores.get(number, 0.0) + value * self.weights[position]
+        ranked = sorted((item for item in scores.items() if item[1] >= MIN_SIMILARITY),
+                        key=lambda item: (-item[1], item[0]))[:k]
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.queries += 1
+            self.matched += 1 if ranked else 0
+            self.query_seconds += elapsed
+            self.max_query_seconds = max(self.max_query_seconds, elapsed)
+        return ranked
+
+    def examples_for_diff(self, diff_content: str, k: int = DEFAULT_TOP_K) -> Optional[Dict]:
+        """
+        Retrieve the best examples for every hunk of a diff.
+
+        Each hunk is queried with its added lines. The examples of all hunks
+        are merged, ranked by their best score and capped at
+        ``MAX_ATTACHED_EXAMPLES``, and each hunk lists the ids of its own.
+
+        Returns:
+            ``{"catalog_examples": [...], "hunk_examples": [...]}`` for the
+            request's ``custom_inputs``, or None when nothing matched
+        """
+        best: Dict[int, float] = {}
+        hunk_matches: List[Tuple[Dict, List[Tuple[int, float]]]] = []
+        for header, hunks in iter_file_diffs(diff_content.splitlines(keepends=True)):
+            path = file_path(header)
+            for hunk in hunks:
+                added = ''.join(line[1:] for line in hunk[1:] if line.startswith('+'))
+                if not added.strip():
+                    continue
+                ranked = self.query(added, k)
+                if not ranked:
+                    continue
+                hunk_matches.append((hunk_location(path, hunk), ranked))
+                for number, score in ranked:
+                    best[number] = max(best.get(number, 0.0), score)
+        if not best:
+            return None
+
+        attached = sorted(best, key=lambda number: (-best[number], number))[:MAX_ATTACHED_EXAMPLES]
+        examples = [dict(self.entries[number], score=round(best[number], 3)) for number in attached]
+        hunks = []
+        for location, ranked in hunk_matches:
+            ids = [self.entries[number]["id"] for number, _ in ranked if number in attached]
+            if ids:
+                hunks.append({"file": location["path"], "line": location["start"], "examples": ids})
+        return {"catalog_examples": examples, "hunk_examples": hunks}
+
+    def stats(self) -> Dict:
+        """Index size and the query counters of this process."""
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "terms": len(self.terms),
+                "built": self.built,
+                "load_seconds": round(self.load_seconds, 6),
+                "hunks_queried": self.queries,
+                "hunks_matched": self.matched,
+                "query_seconds": round(self.query_seconds, 6),
+                "max_query_seconds": round(self.max_query_seconds, 6)
+            }
+
+
+def _little_endian(values: array) -> array:
+    """The index is stored little-endian; swap in place on big-endian hosts."""
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Diff Exclusions
+Drops or truncates generated, vendored, minified and binary changes while the diff streams.
+
+Rules use gitattributes syntax: a path pattern followed by attributes, one
+rule per line, with the last matching rule winning::
+
+    package-lock.json   exclude
+    **/vendor/**        exclude
+    dist/**             truncate=200
+    vendor/ours/**      include
+
+Besides ``exclude``, ``truncate[=lines]`` and ``include``, the linguist
+attributes are understood (``linguist-generated[=true]``,
+``linguist-vendored[=true]``, ``-diff`` and ``binary`` exclude; ``=false``,
+``-linguist-generated``, ``-linguist-vendored`` or ``diff`` include; an
+unspecified ``!attribute`` leaves the file to the heuristics), so a
+repository's own ``.gitattributes`` can be read as is; other attributes are
+ignored. Patterns are compiled once into a single regular expression.
+
+Files no rule decides are checked with a few heuristics as their patch
+streams by: git's binary flag, a very long (minified) line among the first
+changed lines, a ``@generated``-style marker in a comment of the file's
+leading header (a marker anywhere else is just text and does not exclude the
+file), and an optional cap on the lines kept per file. Only the first lines of a file are buffered while it is
+being decided, so the filter never holds a whole file's patch in memory.
+"""
+
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from diff_packer import HUNK_HEADER_RE
+
+
+# Lock files, vendored trees and build output: no security value in review.
+DEFAULT_RULES = """
+package-lock.json       exclude
+npm-shrinkwrap.json     exclude
+yarn.lock               exclude
+pnpm-lock.yaml          exclude
+poetry.lock             exclude
+Pipfile.lock            exclude
+Cargo.lock              exclude
+Gemfile.lock            exclude
+composer.lock           exclude
+go.sum                  exclude
+*.min.js                exclude
+*.min.css               exclude
+*.map                   exclude
+*_pb2.py                exclude
+*_pb2_grpc.py           exclude
+*.pb.go                 exclude
+**/vendor/**            exclude
+**/third_party/**       exclude
+**/node_modules/**      exclude
+**/dist/**              truncate
+**/build/**             truncate
+"""
+
+# Markers generators put near the top of their output.
+GENERATED_RE = re.compile(r'@generated|DO NOT EDIT|Code generated by|auto-?generated', re.IGNORECASE)
+
+# Comment leaders a generated-file marker must follow to count.
+COMMENT_RE = re.compile(r'\s*(?:#|//|/\*|\*|--|<!--|;|%|\'\'\'|""")')
+
+# Leading lines of a file searched for a generated-file marker.
+GENERATED_HEADER_LINES = 5
+
+# Changed lines of a file inspected by the heuristics before it is passed on.
+HEURISTIC_WINDOW = 40
+
+# A changed line this long almost certainly comes from minified output.
+MINIFIED_LINE_LENGTH = 1000
+
+# Changed lines kept by ``truncate`` when the rule gives no count.
+DEFAULT_TRUNCATE_LINES = 200
+
+EXCLUDE_ATTRIBUTES = {
+    "exclude", "-diff", "binary",
+    "linguist-generated", "linguist-generated=true", "linguist-vendored", "linguist-vendored=true"
+}
+INCLUDE_ATTRIBUTES = {
+    "include", "diff",
+    "linguist-generated=false", "-linguist-generated", "linguist-vendored=false", "-linguist-vendored"
+}
+# Attributes reset to unspecified: the file is left to the heuristics.
+UNSET_ATTRIBUTES = {"!diff", "!binary", "!linguist-generated", "!linguist-vendored"}
+
+
+def glob_to_regex(pattern: str) -> str:
+    """
+    Translate a gitattributes-style glob into a regular expression for repository paths.
+
+    A pattern without a slash matches the file name at any depth; one with a
+    slash is anchored at the repository root. ``**`` spans directories, while
+    ``*`` and ``?`` stay within one path component.
+    """
+    anchored = '/' in pattern.rstrip('/')
+    pattern = pattern.lstrip('/')
+    if pattern.endswith('/'):
+        pattern += '**'
+    regex = ''
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith('**/', index):
+            regex += '(?:.*/)?'
+            index += 3
+            continue
+        if pattern.startswith('**', index):
+            regex += '.*'
+            index += 2
+            continue
+        if char == '*':
+            regex += '[^/]*'
+        elif char == '?':
+            regex += '[^/]'
+        elif char == '[':
+            end = pattern.find(']', index + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                body = pattern[index + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                regex += '[' + body.replace('\\', '\\\\') + ']'
+                index = end
+        else:
+            regex += re.escape(char)
+        index += 1
+    return regex if anchored else '(?:.*/)?' + regex
+
+
+def parse_rules(text: str, source: str) -> List[Dict]:
+    """
+    Parse gitattributes-style rule lines.
+
+    Returns:
+        One dict per rule that decides something, with ``pattern``, ``action``
+        (exclude, truncate, include, or unset to leave the file to the
+        heuristics), ``lines`` for truncate and ``source``
+    """
+    rules = []
+    for number, line in enumerate(text.splitlines(), 1):
+        parts = line.split()
+        if not parts or parts[0].startswith('#'):
+            continue
+        pattern, attributes = parts[0], parts[1:]
+        action, lines = None, None
+        for attribute in attributes:
+            if attribute in EXCLUDE_ATTRIBUTES:
+                action = "exclude"
+            elif attribute in INCLUDE_ATTRIBUTES:
+                action = "include"
+            elif attribute in UNSET_ATTRIBUTES:
+                action = "unset"
+            elif attribute == "truncate" or attribute.startswith("truncate="):
+                action = "truncate"
+                _, _, count = attribute.partition('=')
+                if count and not count.isdigit():
+                    raise ValueError(f"{source}:{number}: invalid line count in '{attribute}'")
+                lines = int(count) if count else DEFAULT_TRUNCATE_LINES
+        if action is not None:
+            rules.append({"pattern": pattern, "action": action, "lines": lines, "source": f"{source}:{number}"})
+    return rules
+
+
+class ExclusionRules:
+    def __init__(self, rules: List[Dict], max_file_lines: Optional[int] = None):
+        """
+        Args:
+            rules: Rules as returned by ``parse_rules``, in file order
+            max_file_lines: Changed lines kept per file no rule decides (None keeps all)
+        """
+        self.rules = rules
+        self.max_file_lines = max_file_lines
+        # Last rule first, so the leftmost matching alternative is the rule that wins
+        alternatives = [f"(?P<r{index}>{glob_to_regex(rule['pattern'])})"
+                        for index, rule in reversed(list(enumerate(rules)))]
+        self._matcher = re.compile('(?:' + '|'.join(alternatives) + r')\Z') if alternatives else None
+
+    @classmethod
+    def load(cls, rules_path: Optional[str] = None, repo_path: Optional[str] = None,
+             defaults: bool = True, max_file_lines: Optional[int] = None) -> "ExclusionRules":
+        """
+        Build the rules from the defaults, the repository's ``.gitattributes`` and a rules file, in that order.
+
+        Later sources override earlier ones, so a rules file can re-include
+        what a default or ``.gitattributes`` entry excludes.
+        """
+        rules = parse_rules(DEFAULT_RULES, "defaults") if defaults else []
+        attributes_file = Path(repo_path or ".") / ".gitattributes"
+        if attributes_file.is_file():
+            rules.extend(parse_rules(attributes_file.read_text(encoding='utf-8', errors='replace'),
+                                     ".gitattributes"))
+        if rules_path:
+            with open(rules_path, 'r', encoding='utf-8') as f:
+                rules.extend(parse_rules(f.read(), rules_path))
+        return cls(rules, max_file_lines=max_file_lines)
+
+    def match(self, path: str) -> Optional[Dict]:
+        """The rule deciding ``path``, or None when no rule matches."""
+        if self._matcher is None:
+            return None
+        found = self._matcher.match(path)
+        if found is None:
+            return None
+        return self.rules[int(found.lastgroup[1:])]
+
+    def filter_diff(self, diff_lines: Iterable[str], files: List[Dict],
+                    exclusions: List[Dict]) -> Iterator[str]:
+        """
+        Yield the diff without excluded files and with truncated files cut short.
+
+        Args:
+            diff_lines: Lines of a ``git diff`` patch
+            files: Per-file records of the same diff, in patch order
+            exclusions: Receives one entry per excluded or truncated file
+
+        Yields:
+            The remaining diff lines
+        """
+        section: Optional[_FileSection] = None
+        index = 0
+        for line in diff_lines:
+            if line.startswith('diff --git '):
+                if section is not None:
+                    yield from section.finish(exclusions)
+                record = files[index] if index < len(files) else None
+                index += 1
+                section = _FileSection(self, record, line)
+            if section is None:
+                yield line
+            else:
+                yield from section.feed(line)
+        if section is not None:
+            yield from section.finish(exclusions)
+
+    def decide(self, record: Optional[Dict]) -> Tuple[Optional[str], Optional[int], str]:
+        """
+        Decide a file from its record before any of its patch is seen.
+
+        Returns:
+            Tuple of (action or None to apply the heuristics, line limit, reason)
+        """
+        if record is None:
+            return None, self.max_file_lines, ""
+        rule = self.match(record["path"])
+        if rule is not None and rule["action"] != "unset":
+            return rule["action"], rule["lines"], f"rule {rule['pattern']} ({rule['source']})"
+        if record.get("binary"):
+            return "exclude", None, "binary"
+        return None, self.max_file_lines, ""
+
+    def inspect(self, lines: List[str]) -> Optional[str]:
+        """
+        Reason to exclude a file from the first lines of its patch, if any.
+
+        A generated-file marker only counts in a comment among the first
+        ``GENERATED_HEADER_LINES`` lines of the file, which the patch shows
+        only when its first hunk starts at line 1.
+        """
+        hunks = 0
+        header_lines = 0
+        generated = False
+        for line in lines:
+            if line.startswith('@@'):
+                hunks += 1
+                match = HUNK_HEADER_RE.match(line.rstrip('\n'))
+                header_lines = GENERATED_HEADER_LINES if hunks == 1 and match and int(match.group(3)) <= 1 else 0
+                continue
+            if not hunks:
+                continue
+            if header_lines and line[:1] in ' +':
+                header_lines -= 1
+                if COMMENT_RE.match(line[1:]) and GENERATED_RE.search(line):
+                    generated = True
+            if line[:1] in '+-' and len(line) > MINIFIED_LINE_LENGTH:
+                return "minified"
+        return "generated" if generated else None
+
+
+class _FileSection:
+    """Streaming state for the patch of one file."""
+
+    def __init__(self, rules: ExclusionRules, record: Optional[Dict], header: str):
+        self.rules = rules
+        self.record = record
+        self.path = record["path"] if record is not None else header.strip().split(' b/', 1)[-1]
+        self.action, self.limit, self.reason = rules.decide(record)
+        # Lines held while the heuristics decide, and the hunk being cut to the limit
+        self.pending: Optional[List[str]] = [] if self.action is None else None
+        self.window = 0
+        self.hunk: List[str] = []
+        self.kept = 0
+        self.dropped = 0
+        self.truncated = False
+
+    def feed(self, line: str) -> List[str]:
+        if self.action == "exclude":
+            self.dropped += 1
+            return []
+        if self.pending is not None:
+            self.pending.append(line)
+            if line[:1] in '+-' and not line.startswith(('+++', '---')):
+                self.window += 1
+            if self.window < HEURISTIC_WINDOW:
+                return []
+            return self._settle()
+        return self._keep(line)
+
+    def _settle(self) -> List[str]:
+        """Apply the heuristics to the buffered lines and pass them on or drop them."""
+        pending, self.pending = self.pending, None
+        reason = self.rules.inspect(pending)
+        if reason is not None:
+            self.action, self.reason, self.dropped = "exclude", reason, len(pending)
+            return []
+        self.action = "include" if self.limit is None else "truncate"
+        self.reason = f"over {self.limit} changed lines"
+        output: List[str] = []
+        for line in pending:
+            output.extend(self._keep(line))
+        return output
+
+    def _keep(self, line: str) -> List[str]:
+        """Pass a line through, cutting the patch to ``limit`` changed lines at a hunk boundary or inside a hunk."""
+        if self.action == "include" or self.limit is None:
+            return [line]
+        if self.truncated:
+            self.dropped += 1
+            return []
+        if line.startswith('@@'):
+            output = self._flush_hunk()
+            if self.kept >= self.limit:
+                self.truncated = True
+                self.dropped += 1
+                return output
+            self.hunk = [line]
+            return output
+        if not self.hunk:
+            return [line]
+        self.hunk.append(line)
+        if line[:1] in '+-':
+            self.kept += 1
+            if self.kept >= self.limit:
+                output = self._flush_hunk(cut=True)
+                self.truncated = True
+                return output
+        return []
+
+    def _flush_hunk(self, cut: bool = False) -> List[str]:
+        """Emit the buffered hunk, rewriting its line counts when its tail was cut."""
+        hunk, self.hunk = self.hunk, []
+        match = HUNK_HEADER_RE.match(hunk[0].rstrip('\n')) if cut and hunk else None
+        if match is not None:
+            # Only the tail is dropped, so the start lines stay valid
+            old_count = sum(1 for line in hunk[1:] if line[:1] in ' -')
+            new_count = sum(1 for line in hunk[1:] if line[:1] in ' +')
+            hunk[0] = f"@@ -{match.group(1)},{old_count} +{match.group(3)},{new_count} @@{match.group(5)}\n"
+        return hunk
+
+    def finish(self, exclusions: List[Dict]) -> List[str]:
+        """End the file: settle a still-undecided file and record what was dropped."""
+        output = self._settle() if self.pending is not None else []
+        if self.action != "exclude":
+            output.extend(self._flush_hunk())
+        if self.action == "exclude" or self.truncated:
+            entry = {
+                "path": self.path,
+                "action": "excluded" if self.action == "exclude" else "truncated",
+                "reason": self.reason,
+                "dropped_lines": self.dropped
+            }
+            if self.truncated:
+                entry["kept_lines"] = self.kept
+            exclusions.append(entry)
+        return output
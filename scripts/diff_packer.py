@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Diff Packer
+Fits a diff into a token budget, security-relevant changes first.
+
+Files are scored by type (source, config, tests, docs, data) and by how many
+changed lines touch security-sensitive APIs (auth, crypto, SQL, file I/O,
+process execution, deserialization...). The packer then walks files from the
+highest score down: a file goes in whole if it fits, with its context shrunk
+if that fits, or with only its most relevant hunks; low-value files that do
+not fit are skipped. Every decision is recorded for the report.
+"""
+
+import re
+import math
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+HUNK_HEADER_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@(.*)$')
+
+SECURITY_RE = re.compile(
+    r'auth|login|passw|secret|token|session|cookie|jwt|oauth|crypt|cipher|hash|md5|sha1|'
+    r'ssl|tls|verify|cert|sql|select\s|insert\s|update\s|delete\s|execute|cursor|query|'
+    r'open\(|upload|path|subprocess|os\.system|popen|shell|eval\(|exec\(|pickle|yaml\.load|'
+    r'deserial|request\.|redirect|xml|tempfile|tarfile|zipfile|chmod|permission|admin',
+    re.IGNORECASE
+)
+
+SOURCE_EXTENSIONS = {
+    '.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.kt', '.go', '.rb', '.php', '.cs',
+    '.c', '.h', '.cc', '.cpp', '.hpp', '.rs', '.swift', '.scala', '.sh', '.sql', '.m'
+}
+CONFIG_EXTENSIONS = {'.yml', '.yaml', '.toml', '.ini', '.cfg', '.conf', '.xml', '.properties', '.gradle', '.env'}
+DOC_EXTENSIONS = {'.md', '.rst', '.txt', '.adoc'}
+DATA_EXTENSIONS = {'.json', '.csv', '.tsv', '.lock', '.svg', '.png', '.jpg', '.gif', '.ipynb', '.parquet'}
+
+CATEGORY_WEIGHTS = {"source": 3.0, "config": 2.0, "other": 1.0, "test": 0.5, "docs": 0.2, "data": 0.1}
+LOW_VALUE_CATEGORIES = {"test", "docs", "data"}
+
+# Cap on the keyword bonus so one huge file cannot outrank everything else.
+MAX_KEYWORD_HITS = 20
+
+
+def iter_file_diffs(diff_lines: Iterable[str]) -> Iterator[Tuple[List[str], List[List[str]]]]:
+    """
+    Split diff lines into per-file sections.
+
+    Yields:
+        Tuples of (file header lines, list of hunks), each hunk a list of
+        lines starting with its ``@@`` header. Lines keep a trailing newline.
+    """
+    header: List[str] = []
+    hunks: List[List[str]] = []
+    for line in diff_lines:
+        if not line.endswith('\n'):
+            line += '\n'
+        if line.startswith('diff --git '):
+            if header or hunks:
+                yield header, hunks
+            header, hunks = [line], []
+        elif line.startswith('@@'):
+            hunks.append([line])
+        elif hunks:
+            hunks[-1].append(line)
+        else:
+            header.append(line)
+    if header or hunks:
+        yield header, hunks
+
+
+def file_path(header: List[str]) -> str:
+    """Best-effort path of the file a diff header describes (the new path unless deleted)."""
+    old_path = ""
+    for line in header:
+        if line.startswith('+++ ') and not line.startswith('+++ /dev/null'):
+            return line[4:].strip()[2:] if line[4:].startswith('b/') else line[4:].strip()
+        if line.startswith('--- ') and not line.startswith('--- /dev/null'):
+            old_path = line[4:].strip()
+            old_path = old_path[2:] if old_path.startswith('a/') else old_path
+    if old_path:
+        return old_path
+    if header and header[0].startswith('diff --git '):
+        parts = header[0].strip().split(' b/', 1)
+        if len(parts) == 2:
+            return parts[1]
+    return ""
+
+
+def classify_path(path: str) -> str:
+    """Classify a path as source, config, test, docs, data or other."""
+    pure = PurePosixPath(path.lower())
+    parts = set(pure.parts[:-1])
+    name = pure.name
+    suffix = pure.suffix
+
+    if parts & {'test', 'tests', '__tests__', 'spec', 'testdata'} or name.startswith('test_') \
+            or re.search(r'[._-](test|spec)\.[a-z]+$', name):
+        return "test"
+    if parts & {'docs', 'doc'} or suffix in DOC_EXTENSIONS or name in {'readme', 'license', 'changelog'}:
+        return "docs"
+    if suffix in DATA_EXTENSIONS or name.endswith(('.min.js', '.min.css')):
+        return "data"
+    if suffix in SOURCE_EXTENSIONS:
+        return "source"
+    if suffix in CONFIG_EXTENSIONS or name in {'dockerfile', 'makefile'} or name.startswith('.env'):
+        return "config"
+    return "other"
+
+
+def security_hits(lines: Iterable[str]) -> int:
+    """Count changed (added or removed) lines that mention security-sensitive APIs."""
+    hits = 0
+    for line in lines:
+        if line[:1] in ('+', '-') and not line.startswith(('+++', '---')) and SECURITY_RE.search(line):
+            hits += 1
+    return hits
+
+
+def trim_hunk(hunk: List[str], context: int) -> List[List[str]]:
+    """
+    Shrink a hunk's context to ``context`` lines around each change.
+
+    Changes further apart than ``2 * context`` lines end up in separate
+    hunks with recomputed ``@@`` headers.
+    """
+    match = HUNK_HEADER_RE.match(hunk[0].rstrip('\n'))
+    if not match:
+        return [hunk]
+    old_line = int(match.group(1))
+    new_line = int(match.group(3))
+    section = match.group(5)
+    body = hunk[1:]
+
+    changed = [i for i, line in enumerate(body) if line[:1] in ('+', '-')]
+    if not changed:
+        return []
+
+    keep = set()
+    for i in changed:
+        keep.update(range(max(0, i - context), min(len(body), i + context + 1)))
+    # "\ No newline at end of file" belongs to the line before it
+    for i, line in enumerate(body):
+        if line.startswith('\\') and i - 1 in keep:
+            keep.add(i)
+
+    trimmed: List[List[str]] = []
+    current: List[str] = []
+    start_old = start_new = 0
+    count_old = count_new = 0
+    previous = -2
+    for i, line in enumerate(body):
+        kind = line[:1]
+        if i in keep:
+            if i != previous + 1 and current:
+                trimmed.append([_hunk_header(start_old, count_old, start_new, count_new, section)] + current)
+                current = []
+            if not current:
+                start_old, start_new = old_line, new_line
+                count_old = count_new = 0
+            current.append(line)
+            if kind in (' ', '-'):
+                count_old += 1
+            if kind in (' ', '+'):
+                count_new += 1
+            previous = i
+        if kind in (' ', '-'):
+            old_line += 1
+        if kind in (' ', '+'):
+            new_line += 1
+    if current:
+        trimmed.append([_hunk_header(start_old, count_old, start_new, count_new, section)] + current)
+    return trimmed
+
+
+def _hunk_header(old_start: int, old_count: int, new_start: int, new_count: int, section: str) -> str:
+    # Git reports the line before an empty range as its start
+    if old_count == 0:
+        old_start -= 1
+    if new_count == 0:
+        new_start -= 1
+    return f"@@ -{old_start},{old_count} +{new_start},{new_count} @@{section}\n"
+
+
+@dataclass
+class FilePlan:
+    index: int
+    path: str
+    category: str
+    score: float
+    tokens: int
+    trimmed_tokens: int
+    header_tokens: int
+    hunk_scores: List[int] = field(default_factory=list)
+    hunk_trimmed_tokens: List[int] = field(default_factory=list)
+    status: str = "skipped"
+    reason: str = ""
+    kept_hunks: Optional[List[int]] = None
+    packed_tokens: int = 0
+
+    def to_dict(self) -> Dict:
+        record = {
+            "path": self.path,
+            "category": self.category,
+            "score": round(self.score, 2),
+            "estimated_tokens": self.tokens,
+            "packed_tokens": self.packed_tokens,
+            "status": self.status,
+            "reason": self.reason
+        }
+        if self.kept_hunks is not None:
+            record["kept_hunks"] = self.kept_hunks
+            record["total_hunks"] = len(self.hunk_scores)
+        return record
+
+
+class DiffPacker:
+    def __init__(self, token_budget: int, min_context: int = 3, chars_per_token: float = 4.0):
+        self.token_budget = token_budget
+        self.min_context = min_context
+        self.chars_per_token = chars_per_token
+
+    def estimate_tokens(self, text_length: int) -> int:
+        """Rough token estimate from a character count."""
+        return int(math.ceil(text_length / self.chars_per_token))
+
+    def _plan_file(self, index: int, header: List[str], hunks: List[List[str]],
+                   record: Optional[Dict] = None) -> FilePlan:
+        path = file_path(header)
+        # git's own per-file record knows about binary content the patch only hints at
+        category = "data" if record is not None and record.get("binary") else classify_path(path)
+        header_length = sum(len(line) for line in header)
+        full_length = header_length + sum(len(line) for hunk in hunks for line in hunk)
+
+        hunk_scores = []
+        hunk_trimmed_tokens = []
+        for hunk in hunks:
+            hunk_scores.append(security_hits(hunk))
+            trimmed_length = sum(len(line) for piece in trim_hunk(hunk, self.min_context) for line in piece)
+            hunk_trimmed_tokens.append(self.estimate_tokens(trimmed_length))
+
+        hits = min(sum(hunk_scores), MAX_KEYWORD_HITS)
+        return FilePlan(
+            index=index,
+            path=path,
+            category=category,
+            score=CATEGORY_WEIGHTS[category] + 0.5 * hits,
+            tokens=self.estimate_tokens(full_length),
+            trimmed_tokens=self.estimate_tokens(header_length) + sum(hunk_trimmed_tokens),
+            header_tokens=self.estimate_tokens(header_length),
+            hunk_scores=hunk_scores,
+            hunk_trimmed_tokens=hunk_trimmed_tokens
+        )
+
+    def _decide(self, plans: List[FilePlan]) -> List[FilePlan]:
+        """Assign a status to every file; returns plans in priority order."""
+        ordered = sorted(plans, key=lambda plan: (-plan.score, plan.index))
+        remaining = self.token_budget
+        for plan in ordered:
+            if plan.tokens <= remaining:
+                plan.status, plan.reason, plan.packed_tokens = "included", "", plan.tokens
+            elif plan.hunk_scores and plan.trimmed_tokens <= remaining:
+                plan.status = "trimmed"
+                plan.reason = f"context reduced to ±{self.min_context} lines"
+                plan.packed_tokens = plan.trimmed_tokens
+            elif plan.category in LOW_VALUE_CATEGORIES or not plan.hunk_scores:
+                plan.status, plan.reason = "skipped", f"over budget ({plan.category})"
+            else:
+                available = remaining - plan.header_tokens
+                kept = []
+                by_relevance = sorted(range(len(plan.hunk_scores)), key=lambda i: (-plan.hunk_scores[i], i))
+                for hunk_index in by_relevance:
+                    if plan.hunk_trimmed_tokens[hunk_index] <= available:
+                        kept.append(hunk_index)
+                        available -= plan.hunk_trimmed_tokens[hunk_index]
+                if kept:
+                    plan.kept_hunks = sorted(kept)
+                    plan.status = "trimmed"
+                    plan.reason = (f"context reduced to ±{self.min_context} lines, "
+                                   f"{len(plan.hunk_scores) - len(kept)} hunks dropped")
+                    plan.packed_tokens = plan.header_tokens + sum(plan.hunk_trimmed_tokens[i] for i in kept)
+                else:
+                    plan.status, plan.reason = "skipped", "over budget"
+            remaining -= plan.packed_tokens
+        return ordered
+
+    def pack(self, diff_lines: Callable[[], Iterable[str]],
+             files: Optional[List[Dict]] = None) -> Tuple[str, Dict]:
+        """
+        Pack a diff into the token budget.
+
+        ``diff_lines`` is called twice: once to score every file, once to
+        render the selected ones. Only file metadata is kept between the two
+        passes, so a streamed diff never has to be held in memory whole.
+
+        Args:
+            diff_lines: Callable returning a fresh iterable of diff lines
+            files: Per-file records from ``git diff --numstat``, matched by path
+
+        Returns:
+            Tuple of (packed diff text in priority order, packing report)
+        """
+        records = {record["path"]: record for record in files or []}
+        plans = []
+        for index, (header, hunks) in enumerate(iter_file_diffs(diff_lines())):
+            plans.append(self._plan_file(index, header, hunks, records.get(file_path(header))))
+        ordered = self._decide(plans)
+
+        rendered: Dict[int, str] = {}
+        for index, (header, hunks) in enumerate(iter_file_diffs(diff_lines())):
+            plan = plans[index]
+            if plan.status == "included":
+                rendered[index] = ''.join(header) + ''.join(line for hunk in hunks for line in hunk)
+            elif plan.status == "trimmed":
+                selected = plan.kept_hunks if plan.kept_hunks is not None else range(len(hunks))
+                pieces = [piece for i in selected for piece in trim_hunk(hunks[i], self.min_context)]
+                rendered[index] = ''.join(header) + ''.join(line for piece in pieces for line in piece)
+
+        packed = ''.join(rendered[plan.index] for plan in ordered if plan.index in rendered)
+        report = {
+            "token_budget": self.token_budget,
+            "estimated_tokens": sum(plan.tokens for plan in plans),
+            "packed_tokens": sum(plan.packed_tokens for plan in plans),
+            "included": [plan.path for plan in ordered if plan.status == "included"],
+            "trimmed": [plan.path for plan in ordered if plan.status == "trimmed"],
+            "skipped": [plan.path for plan in ordered if plan.status == "skipped"],
+            "files": [plan.to_dict() for plan in ordered]
+        }
+        return packed, report
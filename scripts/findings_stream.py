@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Findings Stream
+Appends the findings of a run to an NDJSON file for bulk ingestion.
+
+Every run adds one compact JSON line per finding followed by one ``run``
+summary line, so loaders can stream-ingest the findings of thousands of runs
+without parsing whole ``diff_report.json`` files. Each line carries the run
+id, repository, commit hashes and timings; finding lines add file, line,
+severity, CWE and title. A fanned-out copy of a finding on a duplicate hunk
+is a line of its own, with ``duplicate_of`` naming the reviewed location. In
+range mode each finding carries the hash of the commit it was found in.
+
+All lines of a run are written with a single append, so runs sharing the
+file (batch workers, parallel CI jobs on one host) never interleave lines.
+``-`` writes to standard output instead.
+"""
+
+import os
+import sys
+import json
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+
+# Version of the line layout, for loaders that see files from older runs.
+SCHEMA_VERSION = 1
+
+
+def run_records(report: Dict, repo: str, run_id: Optional[str] = None) -> List[Dict]:
+    """
+    Flatten a finished report into finding lines plus a trailing run line.
+
+    Args:
+        report: The complete ``diff_report.json`` content
+        repo: Repository name recorded on every line
+        run_id: Identifier shared by the lines of the run (default: a random one)
+
+    Returns:
+        The records, findings first and the run summary last
+    """
+    run_id = run_id or uuid.uuid4().hex
+    timings = report.get("timings", {})
+    commits = report["commits"]
+    base = {
+        "schema": SCHEMA_VERSION,
+        "run_id": run_id,
+        "repo": repo,
+        "commit": commits["current"]["hash"],
+        "previous_commit": commits["previous"]["hash"],
+        "timestamp": report["metadata"]["timestamp"]
+    }
+    run_timings = {
+        "total_seconds": timings.get("total_seconds"),
+        "review_seconds": timings.get("stages", {}).get("api")
+    }
+
+    if "commit_reviews" in report:
+        found = [(commit["hash"], finding) for commit in report["commit_reviews"] for finding in commit["findings"]]
+    else:
+        found = [(base["commit"], finding) for finding in report.get("findings", [])]
+
+    records = []
+    severities: Counter = Counter()
+    for commit, finding in found:
+        severities[finding.get("severity") or "Unspecified"] += 1
+        records.append(dict(
+            base,
+            type="finding",
+            commit=commit,
+            file=finding.get("file") or None,
+            line=finding.get("line") or None,
+            function=finding.get("function") or None,
+            severity=finding.get("severity") or None,
+            cwe=finding.get("cwe") or None,
+            title=finding.get("title"),
+            duplicate_of=finding.get("duplicate_of") or None,
+            timings=run_timings
+        ))
+
+    statistics = report.get("statistics", {})
+    http = timings.get("http", {})
+    records.append(dict(
+        base,
+        type="run",
+        author=report.get("author"),
+        is_initial_commit=report["metadata"].get("is_initial_commit", False),
+        commits_reviewed=len(report["commit_reviews"]) if "commit_reviews" in report else None,
+        changed_files=statistics.get("changed_files"),
+        additions=statistics.get("additions"),
+        deletions=statistics.get("deletions"),
+        diff_lines=statistics.get("total_diff_lines"),
+        reviewed="ai_review" in report,
+        degraded=report.get("degraded"),
+        findings=len(found),
+        duplicates=sum(1 for _, finding in found if finding.get("duplicate_of")),
+        severities=dict(severities),
+        timings=dict(
+            run_timings,
+            stages=timings.get("stages", {}),
+            http_seconds=http.get("seconds"),
+            queue_wait_seconds=http.get("queue_wait_seconds"),
+            first_finding_seconds=statistics.get("streaming", {}).get("first_finding_seconds")
+        )
+    ))
+    return records
+
+
+class FindingsStream:
+    def __init__(self, target: str):
+        """
+        Args:
+            target: NDJSON file to append to, or ``-`` for standard output
+        """
+        self.target = target
+        # Standard output as it is now; progress messages may be redirected away from it later
+        self._stdout = sys.stdout if target == "-" else None
+
+    def append(self, records: List[Dict]) -> int:
+        """
+        Append records as one line each, in a single write.
+
+        Returns:
+            Number of bytes written
+        """
+        data = ''.join(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n' for record in records)
+        if self._stdout is not None:
+            self._stdout.write(data)
+            self._stdout.flush()
+            return len(data.encode('utf-8'))
+
+        payload = data.encode('utf-8')
+        directory = os.path.dirname(os.path.abspath(self.target))
+        os.makedirs(directory, exist_ok=True)
+        # O_APPEND moves to the end on every write, so concurrent appenders never overwrite each other
+        fd = os.open(self.target, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(payload)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+        finally:
+            os.close(fd)
+        return len(payload)
+
+    def write_run(self, report: Dict, repo: str) -> int:
+        """Append the findings and summary line of one run; returns the number of findings written."""
+        records = run_records(report, repo)
+        self.append(records)
+        return len(records) - 1
@@ -7,99 +7,294 @@ Generates detailed diffs with customizable context lines and multiple output for
 import os
 import sys
 import json
-import subprocess
+import math
+import hashlib
 import argparse
-import requests
+import shutil
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext, redirect_stdout
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from catalog_index import DEFAULT_INDEX_PATH, DEFAULT_TOP_K, CatalogIndex
+from diff_exclusions import ExclusionRules
+from diff_packer import DiffPacker, iter_file_diffs
+from findings_stream import FindingsStream
+from git_backend import EMPTY_TREE, GitBackend
+from hedging import CircuitBreaker, Deadline, HedgedTransport
+from http_transport import EndpointTransport
+from hunk_dedup import HunkDeduplicator
+from rate_limiter import DEFAULT_DB_PATH, SharedRateLimiter
+from review_cache import ReviewCache
+from response_recorder import RecordReplayTransport
+from review_parser import ReviewParser, parse_review, render_finding, render_findings
+from review_stream import iter_text
+from security_prefilter import SecurityPrefilter
+from tracing import Tracer
+
+
+DATABRICKS_ENDPOINT_URL = "https://dbc-477bce68-f9e4.cloud.databricks.com/serving-endpoints/agents_workspace-default-secureguard/invocations"
+
+# Bump when the SecureGuard system prompt changes so cached reviews are not reused.
+REVIEW_PROMPT_VERSION = "secureguard-v1"
+
+# Placeholder swapped for the diff text when diff_report.json is streamed to disk.
+STREAMED_DIFF_PLACEHOLDER = "\0streamed-diff-content\0"
+
+# Read size used when copying code_diff.txt into the other outputs in streaming mode.
+STREAM_BLOCK_SIZE = 1024 * 1024
+
+# Widest +/- bar in the rendered file statistics, as in ``git diff --stat``.
+STAT_GRAPH_WIDTH = 40
+
+# One finding of the local-only fallback review, in the layout the endpoint's reviews use.
+LOCAL_FINDING_TEMPLATE = """## {attack_type} (local pattern match)
+
+### **Location:**
+- **File:** `{path}`
+- **Line:** {line}
+
+### **Vulnerability Description:**
+The added line matches a pattern derived from the catalog's {attack_type} examples (entries {catalog_ids}). The endpoint did not review this change, so the match is unconfirmed.
+
+### **Risk Assessment:**
+- **Severity:** Medium
+
+### **Vulnerable Code:**
+```
+{code}
+```
+"""
 
 
 class DiffGenerator:
-    def __init__(self, context_lines: int = 10, output_dir: str = "diff_output"):
+    def __init__(self, context_lines: int = 10, output_dir: str = "diff_output",
+                 chunked: bool = False, max_chunk_bytes: int = 200_000, max_workers: int = 4,
+                 cache: Optional[ReviewCache] = None, stream: bool = False,
+                 transport: Optional[EndpointTransport] = None, packer: Optional[DiffPacker] = None,
+                 prefilter: Optional[SecurityPrefilter] = None, prefilter_mode: str = "report",
+                 base: Optional[str] = None, head: Optional[str] = None, commit_range: Optional[str] = None,
+                 commits_per_request: int = 5, compact_json: bool = False, inline_diff: bool = False,
+                 tracer: Optional[Tracer] = None, record_dir: Optional[str] = None,
+                 replay_dir: Optional[str] = None, pipelined: bool = False, repo_path: Optional[str] = None,
+                 exclusions: Optional[ExclusionRules] = None, stream_response: bool = False,
+                 deduplicator: Optional[HunkDeduplicator] = None, catalog_index: Optional[CatalogIndex] = None,
+                 retrieval_k: int = DEFAULT_TOP_K, findings_stream: Optional[FindingsStream] = None,
+                 deadline: Optional[float] = None, local_fallback: bool = False, merge_base: bool = False):
         self.context_lines = context_lines
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.chunked = chunked
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_workers = max_workers
+        self.cache = cache
+        self.cache_lookups = {"cache_hits": 0, "cache_misses": 0}
+        self._cache_lock = threading.Lock()
+        self.stream = stream
+        self.packer = packer
+        self.prefilter = prefilter
+        self.prefilter_mode = prefilter_mode
+        self.exclusions = exclusions
+        self.stream_response = stream_response
+        self.deduplicator = deduplicator
+        self.catalog_index = catalog_index
+        self.retrieval_k = retrieval_k
+        self.findings_stream = findings_stream
+        self.deadline_seconds = deadline
+        self.deadline: Optional[Deadline] = None
+        # Diffs the endpoint could not review get a review from the local pattern scan instead
+        self.local_prefilter = (prefilter or SecurityPrefilter.from_catalog()) if local_fallback else None
+        self.fallback_reasons: Counter = Counter()
+        self._fallback_lock = threading.Lock()
+        self.commit_range = commit_range
+        if commit_range:
+            base, head = commit_range.split('..', 1)
+        self.base = base or None
+        self.head = head or None
+        self.merge_base = merge_base
+        self.commits_per_request = commits_per_request
+        # Whether the endpoint answers multi-row requests per row; None until a batch tells
+        self.row_predictions: Optional[bool] = None
+        self.compact_json = compact_json
+        self.pipelined = pipelined
+        self.inline_diff = inline_diff
+        self.tracer = tracer or Tracer()
+        self.git = GitBackend(repo_path, tracer=self.tracer)
+        self.transport = transport or EndpointTransport(
+            os.environ.get('DATABRICKS_ENDPOINT_URL', DATABRICKS_ENDPOINT_URL)
+        )
+        if deadline is not None and not isinstance(self.transport, HedgedTransport):
+            # The hedging wrapper enforces the deadline, here without hedging
+            self.transport = HedgedTransport(self.transport, percentile=None)
+        if record_dir or replay_dir:
+            self.transport = RecordReplayTransport(self.transport, record_dir=record_dir, replay_dir=replay_dir)
+        if self.transport.tracer is None:
+            self.transport.tracer = self.tracer
         
-    def run_git_command(self, command: List[str]) -> Tuple[str, int]:
-        """Run a git command and return output and return code."""
-        try:
-            result = subprocess.run(
-                command, 
-                capture_output=True, 
-                text=True, 
-                check=True
-            )
-            return result.stdout.strip(), result.returncode
-        except subprocess.CalledProcessError as e:
-            print(f"Git command failed: {' '.join(command)}")
-            print(f"Error: {e.stderr}")
-            return e.stderr, e.returncode
-    
-    def check_commit_exists(self, commit_ref: str) -> bool:
-        """Check if a commit reference exists."""
-        _, return_code = self.run_git_command(["git", "rev-parse", "--verify", commit_ref])
-        return return_code == 0
-    
     def get_commit_info(self) -> Dict[str, str]:
-        """Get information about current and previous commits."""
-        # Get current commit
-        current_commit, _ = self.run_git_command(["git", "rev-parse", "HEAD"])
-        
-        # Check if previous commit exists
-        if self.check_commit_exists("HEAD~1"):
-            # Get previous commit
-            prev_commit, _ = self.run_git_command(["git", "rev-parse", "HEAD~1"])
-            
-            # Get commit messages
-            current_msg, _ = self.run_git_command(["git", "log", "-1", "--pretty=format:%s"])
-            prev_msg, _ = self.run_git_command(["git", "log", "-1", "--pretty=format:%s", "HEAD~1"])
+        """
+        Get information about current and previous commits.
+        
+        Only the head and base commits have to be present, so a clone of
+        depth 2 (or a shallow clone plus a fetch of the base SHA) suffices.
+        A head without a parent is only diffed against the empty tree when
+        it really is a root commit, not when a shallow clone cut off its
+        parent.
+        
+        Raises:
+            ValueError: If a commit is missing, with the fetch depth or
+                command that would make it available
+        """
+        head = self.head or "HEAD"
+        shallow = self.git.is_shallow()
+        if self.base:
+            # Explicit base and head, from a single git log call
+            entries = self.git.show_entries([head, self.base])
+            if len(entries) < 2:
+                raise ValueError(self._missing_commits_message([head, self.base], shallow))
+            if self.merge_base:
+                entries[1] = self._merge_base_entry(entries[0], entries[1], shallow)
         else:
-            # Only one commit exists - use empty tree as previous
-            prev_commit = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"  # Git empty tree
-            current_msg, _ = self.run_git_command(["git", "log", "-1", "--pretty=format:%s"])
-            prev_msg = "Initial commit (empty tree)"
+            # Head and its first parent, from a single git log call
+            entries = self.git.log_entries(head, 2)
+            if not entries:
+                raise ValueError(self._missing_commits_message([head], shallow))
+            if len(entries) < 2 and shallow and entries[0]["hash"] in self.git.shallow_boundary():
+                raise ValueError(
+                    f"The parent of {head} ({entries[0]['hash'][:12]}) is not in this shallow clone. "
+                    f"Check out with a fetch depth of at least 2 (actions/checkout: fetch-depth: 2), "
+                    f"run `git fetch --deepen=1`, or pass --base"
+                )
+        current = entries[0]
         
-        # Get author info
-        author, _ = self.run_git_command(["git", "log", "-1", "--pretty=format:%an"])
+        if len(entries) > 1:
+            prev_commit = entries[1]["hash"]
+            prev_msg = entries[1]["message"]
+        else:
+            # A root commit - use empty tree as previous
+            prev_commit = EMPTY_TREE
+            prev_msg = "Initial commit (empty tree)"
         
         return {
-            "current_commit": current_commit,
+            "current_commit": current["hash"],
             "previous_commit": prev_commit,
-            "current_message": current_msg,
+            "current_message": current["message"],
             "previous_message": prev_msg,
-            "author": author,
+            "author": current["author"],
             "timestamp": datetime.now().isoformat(),
-            "is_initial_commit": not self.check_commit_exists("HEAD~1")
+            "is_initial_commit": len(entries) < 2,
+            "is_shallow": shallow
         }
     
-    def generate_diff(self, prev_commit: str, current_commit: str) -> str:
-        """Generate diff with specified context lines."""
-        diff_cmd = [
-            "git", "diff", 
-            f"-U{self.context_lines}", 
-            prev_commit, 
-            current_commit
-        ]
+    def _merge_base_entry(self, head_entry: Dict[str, str], base_entry: Dict[str, str],
+                          shallow: bool) -> Dict[str, str]:
+        """The merge base of base and head, as a pull request diff uses it."""
+        merge_base = self.git.merge_base(base_entry["hash"], head_entry["hash"])
+        if merge_base is None:
+            message = f"No merge base of {self.base} and {self.head or 'HEAD'}"
+            if shallow:
+                depth = self.git.history_depth(head_entry["hash"])
+                message += (
+                    f" within the {depth} commit{'s' if depth != 1 else ''} of history in this shallow clone. "
+                    f"Deepen the clone until one is found (`git fetch --deepen=N`), "
+                    f"or drop --merge-base to diff against the base directly"
+                )
+            raise ValueError(message)
+        if merge_base == base_entry["hash"]:
+            return base_entry
+        print(f"🔀 Diffing against the merge base {merge_base[:12]} of {self.base} and {self.head or 'HEAD'}")
+        return self.git.show_entries([merge_base])[0]
+    
+    def _missing_commits_message(self, refs: List[str], shallow: bool) -> str:
+        """Name the refs that are not present and, in a shallow clone, how to fetch them."""
+        missing = [ref for ref in dict.fromkeys(refs) if self.git.resolve(f"{ref}^{{commit}}") is None]
+        message = f"Could not resolve {', '.join(repr(ref) for ref in missing) or ' and '.join(refs)}"
+        if not shallow or not missing:
+            return message
+        depth = self.git.history_depth()
+        return (
+            f"{message} in this shallow clone ({depth} commit{'s' if depth != 1 else ''} of history). "
+            f"Fetch the commit directly (`git fetch --depth=1 origin {missing[0]}`) "
+            f"or check out with a fetch depth greater than {depth}"
+        )
+    
+    def generate_diff_with_files(self, prev_commit: str, current_commit: str,
+                                 excluded: Optional[List[Dict]] = None) -> Tuple[str, List[Dict]]:
+        """
+        Generate the diff and per-file records with a single ``git diff``.
+        
+        With exclusion rules, the patch is filtered as it streams from git,
+        so excluded files are never held in memory.
+        
+        Args:
+            prev_commit: Old side of the diff
+            current_commit: New side of the diff
+            excluded: Receives the files the exclusion rules dropped or truncated
+            
+        Returns:
+            Tuple of (diff text, file records with path,
+            old path, status, additions, deletions, binary flag and sizes)
+        """
+        if self.exclusions is not None:
+            files: List[Dict] = []
+            lines = self.git.iter_diff_with_files(prev_commit, current_commit, self.context_lines, files)
+            filtered = self.exclusions.filter_diff(lines, files, excluded if excluded is not None else [])
+            return ''.join(filtered).rstrip('\n'), files
         
-        diff_output, return_code = self.run_git_command(diff_cmd)
+        diff_output, files, return_code = self.git.diff_with_files(prev_commit, current_commit, self.context_lines)
         
         if return_code != 0:
             print(f"Warning: Git diff returned code {return_code}")
             if "fatal: ambiguous argument" in diff_output:
                 print("This might be the first commit in the repository.")
         
-        return diff_output
+        return diff_output, files
     
-    def get_changed_files_stats(self, prev_commit: str, current_commit: str) -> str:
-        """Get statistics about changed files."""
-        stat_cmd = ["git", "diff", "--stat", prev_commit, current_commit]
-        stats, return_code = self.run_git_command(stat_cmd)
+    def format_files_stats(self, files: List[Dict]) -> str:
+        """
+        Render per-file records the way ``git diff --stat`` does.
         
-        if return_code != 0:
-            return "No statistics available (possibly initial commit)"
+        Args:
+            files: File records from ``generate_diff_with_files``
+            
+        Returns:
+            Stat text with one line per file and a summary line
+        """
+        if not files:
+            return ""
+        
+        names = [
+            f"{record['old_path']} => {record['path']}" if record['status'] in "RC" else record['path']
+            for record in files
+        ]
+        changes = [(record['additions'] or 0) + (record['deletions'] or 0) for record in files]
+        name_width = max(len(name) for name in names)
+        count_width = max(len(str(count)) for count in changes)
+        if any(record['binary'] for record in files):
+            count_width = max(count_width, len("Bin"))
+        scale = min(1.0, STAT_GRAPH_WIDTH / max(max(changes), 1))
+        
+        lines = []
+        for name, count, record in zip(names, changes, files):
+            if record['binary']:
+                detail = f"{'Bin':>{count_width}} {record['old_size']} -> {record['size']} bytes"
+            else:
+                graph = '+' * math.ceil(record['additions'] * scale) + '-' * math.ceil(record['deletions'] * scale)
+                detail = f"{count:>{count_width}} {graph}".rstrip()
+            lines.append(f" {name:<{name_width}} | {detail}")
         
-        return stats
+        additions = sum(record['additions'] or 0 for record in files)
+        deletions = sum(record['deletions'] or 0 for record in files)
+        summary = f" {len(files)} file{'' if len(files) == 1 else 's'} changed"
+        if additions or not deletions:
+            summary += f", {additions} insertion{'' if additions == 1 else 's'}(+)"
+        if deletions or not additions:
+            summary += f", {deletions} deletion{'' if deletions == 1 else 's'}(-)"
+        lines.append(summary)
+        return '\n'.join(lines)
     
     def call_databricks_api(self, diff_content: str) -> Optional[Dict]:
         """
@@ -111,39 +306,48 @@ class DiffGenerator:
         Returns:
             API response as dictionary or None if failed
         """
-        url = "https://dbc-477bce68-f9e4.cloud.databricks.com/serving-endpoints/agents_workspace-default-secureguard/invocations"
-        token = os.environ.get('DATABRICKS_TOKEN')
+        return self.call_databricks_api_batch([diff_content])
+    
+    def call_databricks_api_batch(self, diff_contents: List[str]) -> Optional[Dict]:
+        """
+        Call the endpoint once with one ``dataframe_split`` row per diff.
         
-        if not token:
-            print("❌ DATABRICKS_TOKEN not found in environment variables")
-            print("Please set the DATABRICKS_TOKEN environment variable or GitHub secret")
+        Args:
+            diff_contents: Diffs to analyze, one request row each
+            
+        Returns:
+            API response as dictionary or None if failed
+        """
+        url = self.transport.url
+        headers = self._request_headers()
+        if headers is None:
             return None
         
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
-        
         # Create the correct dataframe_split format with proper message structure
         try:
-            # Create a data structure with proper message objects
-            data = {
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': diff_content
+            # Create a data structure with proper message objects, one row per diff
+            rows = [
+                {
+                    'messages': [
+                        {
+                            'role': 'user',
+                            'content': diff_content
+                        }
+                    ],
+                    'context': {
+                        'conversation_id': 'code_review_session',
+                        'user_id': 'github_actions'
                     }
-                ],
-                'context': {
-                    'conversation_id': 'code_review_session',
-                    'user_id': 'github_actions'
                 }
-            }
+                for diff_content in diff_contents
+            ]
+            for row, diff_content in zip(rows, diff_contents):
+                self._attach_catalog_examples(row, diff_content)
             
             # Convert to dataframe_split format
             ds_dict = {
                 'dataframe_split': {
-                    'data': [data]
+                    'data': rows
                 }
             }
             
@@ -153,10 +357,10 @@ class DiffGenerator:
             print(f"📤 Sending payload to Databricks API:")
             print(f"   URL: {url}")
             print(f"   Payload format: dataframe_split")
-            print(f"   Messages count: {len(data['messages'])}")
+            print(f"   Rows count: {len(rows)}")
             print(f"   Payload size: {len(data_json)} characters")
             
-            response = requests.post(url, headers=headers, data=data_json, timeout=30)
+            response = self.transport.post(data_json, headers)
             
             if response.status_code == 200:
                 result = response.json()
@@ -175,19 +379,499 @@ class DiffGenerator:
             print(f"❌ Exception calling Databricks endpoint: {e}")
             return None
     
-    def create_pr_comment(self, ai_review: Dict, diff_content: str, commit_info: Dict[str, str]) -> str:
+    def _attach_catalog_examples(self, request: Dict, diff_content: str):
         """
-        Create a PR comment with the AI review results.
+        Add the catalog examples most similar to each hunk as ``custom_inputs``.
+        
+        With the examples in the request, the endpoint has its retrieval
+        context already and can skip the vector database search.
+        """
+        if self.catalog_index is None:
+            return
+        examples = self.catalog_index.examples_for_diff(diff_content, self.retrieval_k)
+        if examples is not None:
+            request.setdefault('custom_inputs', {}).update(examples)
+    
+    def _request_headers(self) -> Optional[Dict[str, str]]:
+        """Endpoint request headers, or None (after explaining why) when the token is missing."""
+        token = os.environ.get('DATABRICKS_TOKEN')
+        
+        # Replaying recorded responses needs no token
+        if not token and self.transport.requires_token:
+            print("❌ DATABRICKS_TOKEN not found in environment variables")
+            print("Please set the DATABRICKS_TOKEN environment variable or GitHub secret")
+            return None
+        
+        return {
+            'Authorization': f'Bearer {token or ""}',
+            'Content-Type': 'application/json'
+        }
+    
+    def stream_databricks_review(self, diff_content: str, commit_info: Dict[str, str],
+                                 review_extras: Dict) -> Optional[Dict]:
+        """
+        Call the endpoint in streaming mode and publish findings as they complete.
+        
+        The request uses the chat format with ``"stream": true``. Every
+        finding the parser closes is appended to ``pr_comment.md.tmp`` right
+        away and ``ai_review.json`` is rewritten with the text received so
+        far, so the first issues are readable while the rest is still being
+        generated. Only a complete stream renames the comment to
+        ``pr_comment.md``; an interrupted one removes both files, so a
+        truncated review is never published. Time to first byte and to first
+        finding go to ``review_extras``.
         
         Args:
-            ai_review: The response from Databricks API
-            diff_content: The original diff content
+            diff_content: Diff to analyze
             commit_info: Commit information dictionary
+            review_extras: Receives the ``streaming`` statistics
             
         Returns:
-            Formatted comment text
+            The complete response in the non-streaming message shape, or None if failed
         """
-        # Extract AI review content from the response
+        headers = self._request_headers()
+        if headers is None:
+            return None
+        
+        request = {
+            'messages': [{'role': 'user', 'content': diff_content}],
+            'context': {
+                'conversation_id': 'code_review_session',
+                'user_id': 'github_actions'
+            },
+            'stream': True
+        }
+        self._attach_catalog_examples(request, diff_content)
+        data_json = json.dumps(request, allow_nan=True, ensure_ascii=False)
+        
+        print(f"📤 Streaming review from Databricks API:")
+        print(f"   URL: {self.transport.url}")
+        print(f"   Payload size: {len(data_json)} characters")
+        
+        start = self.tracer.now()
+        try:
+            response = self.transport.post(data_json, headers, stream=True)
+        except Exception as e:
+            print(f"❌ Exception calling Databricks endpoint: {e}")
+            return None
+        
+        if response.status_code != 200:
+            print(f"❌ Error calling Databricks endpoint: {response.status_code}")
+            print(f"Response: {response.text}")
+            response.close()
+            return None
+        
+        metrics = {
+            "first_byte_seconds": round(self.tracer.now() - start, 6),
+            "first_finding_seconds": None,
+            "total_seconds": None,
+            "deltas": 0,
+            "findings": 0
+        }
+        review_extras.setdefault("statistics", {})["streaming"] = metrics
+        parser = ReviewParser()
+        received: List[str] = []
+        head, tail = self._pr_comment_parts(commit_info)
+        comment_file = self.output_dir / "pr_comment.md"
+        temp_comment = self.output_dir / "pr_comment.md.tmp"
+        complete = False
+        
+        try:
+            with open(temp_comment, 'w', encoding='utf-8') as comment:
+                comment.write(head)
+                comment.flush()
+                
+                def publish(findings: List) -> None:
+                    if not findings:
+                        return
+                    findings = self._fan_out(findings, review_extras)
+                    if metrics["first_finding_seconds"] is None:
+                        metrics["first_finding_seconds"] = round(self.tracer.now() - start, 6)
+                        print(f"⚡ First finding after {metrics['first_finding_seconds']:.2f}s")
+                    for finding in findings:
+                        comment.write(('\n' if metrics["findings"] else '') + render_finding(finding))
+                        metrics["findings"] += 1
+                    comment.flush()
+                    self._write_partial_review(''.join(received), metrics["findings"])
+                
+                pending = ""
+                try:
+                    for text in iter_text(response):
+                        metrics["deltas"] += 1
+                        received.append(text)
+                        *lines, pending = (pending + text).split('\n')
+                        for line in lines:
+                            publish(parser.feed(line))
+                except Exception as e:
+                    print(f"❌ Review stream interrupted: {e}")
+                    return None
+                finally:
+                    response.close()
+                if pending:
+                    publish(parser.feed(pending))
+                publish(parser.close())
+                comment.write(tail)
+            os.replace(temp_comment, comment_file)
+            complete = True
+        finally:
+            if not complete:
+                self._discard_partial_review(temp_comment)
+        
+        metrics["total_seconds"] = round(self.tracer.now() - start, 6)
+        content = ''.join(received)
+        print(f"✅ Successfully received AI code review")
+        print(f"   Response size: {len(content)} characters in {metrics['deltas']} deltas")
+        return {'messages': [{'role': 'assistant', 'content': content}]}
+    
+    def _fallback_review(self, diff_content: str) -> Optional[Dict]:
+        """
+        Review a diff the endpoint could not review with the local pattern scan, if enabled.
+        
+        Returns:
+            A response in the endpoint's message shape, marked ``local_only``
+            with the ``reason``, or None without local fallback
+        """
+        if self.local_prefilter is None or not diff_content.strip():
+            return None
+        reason = self._degradation_reason()
+        hits = self.local_prefilter.find_hits(diff_content.splitlines(keepends=True))
+        with self._fallback_lock:
+            self.fallback_reasons[reason] += 1
+        print(f"🛟 Endpoint unavailable ({reason}) - local pattern scan found {len(hits)} matches")
+        
+        findings = [
+            LOCAL_FINDING_TEMPLATE.format(
+                attack_type=hit["attack_type"],
+                path=hit["path"],
+                line=hit["line"],
+                catalog_ids=", ".join(str(catalog_id) for catalog_id in hit["catalog_ids"]) or "none",
+                code=hit["code"].strip()
+            )
+            for hit in hits
+        ]
+        content = '\n'.join(findings) if findings else \
+            "The endpoint did not review this change and no catalog pattern matched its added lines."
+        return {
+            'messages': [{'role': 'assistant', 'content': content}],
+            'local_only': True,
+            'reason': reason
+        }
+    
+    def _degradation_reason(self) -> str:
+        """Why the endpoint could not review: the deadline, the circuit breaker or a failed call."""
+        if self.deadline is not None and self.deadline.expired():
+            return "deadline exceeded"
+        hedged = self._hedged_transport()
+        if hedged is not None and hedged.breaker is not None and hedged.breaker.state != "closed":
+            return "circuit breaker open"
+        return "endpoint call failed"
+    
+    def _hedged_transport(self) -> Optional[HedgedTransport]:
+        """The hedging wrapper in the transport chain, if any."""
+        transport = self.transport
+        if isinstance(transport, RecordReplayTransport):
+            transport = transport.transport
+        return transport if isinstance(transport, HedgedTransport) else None
+    
+    def _start_deadline(self):
+        """Start the run deadline when the run starts, not when the generator is built."""
+        if self.deadline_seconds is None:
+            return
+        self.deadline = Deadline(self.deadline_seconds)
+        hedged = self._hedged_transport()
+        if hedged is not None:
+            hedged.deadline = self.deadline
+    
+    def _write_partial_review(self, content: str, findings: int):
+        """Replace ``ai_review.json`` with the review received so far, atomically."""
+        partial = {
+            'messages': [{'role': 'assistant', 'content': content}],
+            'streaming': {'complete': False, 'findings': findings}
+        }
+        temp_file = self.output_dir / "ai_review.json.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(partial, f, indent=2, ensure_ascii=False)
+        os.replace(temp_file, self.output_dir / "ai_review.json")
+    
+    def _discard_partial_review(self, temp_comment: Path):
+        """Remove what an interrupted stream wrote, so no truncated review is published."""
+        for path in (temp_comment, self.output_dir / "ai_review.json", self.output_dir / "ai_review.json.tmp"):
+            path.unlink(missing_ok=True)
+    
+    def iter_diff_units(self, diff_lines: Iterable[str]) -> Iterator[str]:
+        """
+        Split a diff into reviewable units at file and hunk boundaries.
+        
+        Each file section (starting at a ``diff --git`` line) is yielded whole
+        when it fits in ``max_chunk_bytes``. Larger sections are split at their
+        ``@@`` hunk headers, and every piece repeats the file header so the
+        endpoint still knows which file it is looking at. A single hunk larger
+        than the limit is yielded as-is rather than cut mid-hunk.
+        
+        Args:
+            diff_lines: Diff lines, with or without trailing newlines
+            
+        Returns:
+            Iterator over diff text units
+        """
+        for header, hunks in iter_file_diffs(diff_lines):
+            header_text = ''.join(header)
+            hunk_texts = [''.join(hunk) for hunk in hunks]
+            if len(header_text) + sum(len(h) for h in hunk_texts) <= self.max_chunk_bytes:
+                yield header_text + ''.join(hunk_texts)
+                continue
+            piece = ""
+            for hunk_text in hunk_texts:
+                if piece and len(header_text) + len(piece) + len(hunk_text) > self.max_chunk_bytes:
+                    yield header_text + piece
+                    piece = ""
+                piece += hunk_text
+            if piece or not hunk_texts:
+                yield header_text + piece
+    
+    def pack_diff_chunks(self, units: Iterable[str]) -> Iterator[str]:
+        """Greedily pack diff units, in order, into chunks of at most ``max_chunk_bytes``."""
+        current = ""
+        for unit in units:
+            if current and len(current) + len(unit) > self.max_chunk_bytes:
+                yield current
+                current = ""
+            current += unit
+        if current:
+            yield current
+    
+    def _map_concurrently(self, func, items: Iterable) -> Iterator:
+        """
+        Apply ``func`` to ``items`` on a thread pool and yield results in order.
+        
+        At most ``2 * max_workers`` items are in flight at once, so a lazy
+        ``items`` iterator is never materialized in full.
+        """
+        window = 2 * self.max_workers
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            for item in items:
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(func, item))
+            while pending:
+                yield pending.popleft().result()
+    
+    def review_diff_chunks(self, chunks: Iterable[str]) -> Optional[Dict]:
+        """
+        Review diff chunks concurrently and merge the results.
+        
+        Chunks are sent through a thread pool of ``max_workers`` threads, so
+        the wall time tracks the slowest chunk rather than the sum of all of
+        them.
+        
+        Args:
+            chunks: Diff chunks as produced by ``pack_diff_chunks``
+            
+        Returns:
+            Merged review in the endpoint's response shape, or None if every chunk failed
+        """
+        print(f"🧩 Reviewing diff chunks with {self.max_workers} workers")
+        sizes: List[int] = []
+        
+        def review(chunk: str) -> Optional[Dict]:
+            return self.call_databricks_api(chunk) or self._fallback_review(chunk)
+        
+        def sized(chunks_iter: Iterable[str]) -> Iterator[str]:
+            for chunk in chunks_iter:
+                sizes.append(len(chunk))
+                yield chunk
+        
+        reviews = list(self._map_concurrently(review, sized(chunks)))
+        return self._merge_chunk_reviews(sizes, reviews)
+    
+    def iter_diff_hunks(self, units: Iterable[str]) -> Iterator[str]:
+        """
+        Split diff units into one unit per hunk, each repeating its file header.
+        
+        A file section without hunks (a mode change, a binary file) is
+        yielded as its header alone.
+        """
+        for unit in units:
+            for header, hunks in iter_file_diffs(unit.splitlines(keepends=True)):
+                header_text = ''.join(header)
+                if not hunks:
+                    yield header_text
+                for hunk in hunks:
+                    yield header_text + ''.join(hunk)
+    
+    def review_diff_cached(self, units: Iterable[str]) -> Optional[Dict]:
+        """
+        Review a diff hunk by hunk, only calling the endpoint for unseen hunks.
+        
+        Every hunk, with its file header, is looked up in the review cache by
+        its normalized hash, so editing one hunk of a file leaves the cached
+        reviews of its other hunks valid. Misses are reviewed concurrently,
+        one request per hunk so that each review can be cached on its own,
+        and all hunk reviews are merged in diff order.
+        
+        Args:
+            units: Diff units: the whole diff text in a list, or what ``iter_diff_units`` yields
+            
+        Returns:
+            Merged review in the endpoint's response shape, or None if nothing could be reviewed
+        """
+        identity = f"{self.transport.url}|{REVIEW_PROMPT_VERSION}"
+        if self.catalog_index is not None:
+            # Reviews made with attached examples may differ from those made without
+            identity += f"|catalog:{self.catalog_index.digest[:16]}:{self.retrieval_k}"
+        sizes: List[int] = []
+        
+        def review(unit: str) -> Optional[Dict]:
+            key = self.cache.make_key(unit, identity)
+            cached = self.cache.get(key)
+            # Counted here rather than read off the cache, which other runs may share
+            with self._cache_lock:
+                self.cache_lookups["cache_hits" if cached is not None else "cache_misses"] += 1
+            if cached is not None:
+                return cached
+            fresh = self.call_databricks_api(unit)
+            if fresh is None:
+                # Local-only reviews are never cached
+                return self._fallback_review(unit)
+            self.cache.put(key, fresh)
+            return fresh
+        
+        def sized(units_iter: Iterable[str]) -> Iterator[str]:
+            for unit in units_iter:
+                sizes.append(len(unit))
+                yield unit
+        
+        reviews = list(self._map_concurrently(review, sized(self.iter_diff_hunks(units))))
+        print(f"🗃️  Review cache: {self.cache_lookups['cache_hits']} hits, "
+              f"{self.cache_lookups['cache_misses']} misses")
+        return self._merge_chunk_reviews(sizes, reviews)
+    
+    def _split_batch_review(self, result: Optional[Dict], count: int) -> Optional[List[Optional[Dict]]]:
+        """
+        Split a multi-row response into one review per request row.
+        
+        The endpoint answers a multi-row request either with a ``predictions``
+        list or a bare list, one entry per row. Anything else (such as the
+        chat agent's single ``messages`` answer) cannot be attributed to a
+        row, and None is returned so the rows can be re-sent one by one.
+        """
+        if result is None:
+            return [None] * count
+        if count == 1:
+            return [result]
+        
+        predictions = result.get('predictions') if isinstance(result, dict) else result
+        if isinstance(predictions, list) and len(predictions) == count:
+            return [prediction if isinstance(prediction, dict) else {'response': prediction}
+                    for prediction in predictions]
+        return None
+    
+    def _batch_commits(self, commits: List[Dict]) -> List[List[Dict]]:
+        """Group commits into request batches bounded by count and ``max_chunk_bytes``."""
+        batches: List[List[Dict]] = []
+        size = 0
+        for commit in commits:
+            if batches and len(batches[-1]) < self.commits_per_request \
+                    and size + len(commit["diff"]) <= self.max_chunk_bytes:
+                batches[-1].append(commit)
+                size += len(commit["diff"])
+            else:
+                batches.append([commit])
+                size = len(commit["diff"])
+        return batches
+    
+    def review_commit_range(self, commit_range: str) -> Tuple[Optional[Dict], List[Dict]]:
+        """
+        Review every commit of a range individually, several commits per request.
+        
+        The per-commit patches are collected from a single ``git log -p`` call,
+        packed ``commits_per_request`` rows at a time into ``dataframe_split``
+        requests, and the requests are sent concurrently. An endpoint that
+        answers a multi-row request with a single review is not asked for
+        batches again: that batch and the rest go one commit per request, so
+        no finding is attributed to a commit it was not found in.
+        
+        Args:
+            commit_range: Revision range such as ``main..feature``
+            
+        Returns:
+            Tuple of (merged review of all commits, per-commit review records)
+        """
+        commits = [dict(entry, diff=diff) for entry, diff in self.git.iter_range_patches(commit_range, self.context_lines)]
+        reviewable = [commit for commit in commits if commit["diff"].strip()]
+        batches = self._batch_commits(reviewable)
+        print(f"🧮 Reviewing {len(reviewable)} of {len(commits)} commits in {len(batches)} requests")
+        
+        def review(batch: List[Dict]) -> List[Optional[Dict]]:
+            if len(batch) > 1 and self.row_predictions is not False:
+                result = self.call_databricks_api_batch([commit["diff"] for commit in batch])
+                reviews = self._split_batch_review(result, len(batch))
+                if reviews is not None:
+                    if result is not None:
+                        self.row_predictions = True
+                    return reviews
+                self.row_predictions = False
+                print(f"↩️  The endpoint answered {len(batch)} commits with one review, "
+                      f"re-sending them one commit per request")
+            return [self.call_databricks_api_batch([commit["diff"]]) for commit in batch]
+        
+        for batch, reviews in zip(batches, self._map_concurrently(review, batches)):
+            for commit, commit_review in zip(batch, reviews):
+                commit["review"] = commit_review or self._fallback_review(commit["diff"])
+        
+        commit_reviews = []
+        sections = []
+        for commit in commits:
+            commit_review = commit.get("review")
+            parsed = self.parse_ai_review(commit_review) if commit_review else None
+            commit_reviews.append({
+                "hash": commit["hash"],
+                "short_hash": commit["hash"][:8],
+                "author": commit["author"],
+                "message": commit["message"],
+                "diff_lines": len(commit["diff"].split('\n')) if commit["diff"] else 0,
+                "reviewed": commit_review is not None,
+                "local_only": bool(commit_review and commit_review.get('local_only')),
+                "findings": [finding.to_dict() for finding in parsed.findings] if parsed else [],
+                "ai_review": commit_review
+            })
+            if commit_review:
+                sections.append(f"# Commit {commit['hash'][:8]}: {commit['message']}\n\n"
+                                f"{self._extract_ai_content(commit_review)}")
+        
+        if not sections:
+            return None, commit_reviews
+        merged = {'messages': [{'role': 'assistant', 'content': '\n\n---\n\n'.join(sections)}]}
+        return merged, commit_reviews
+    
+    def _merge_chunk_reviews(self, sizes: List[int], reviews: List[Optional[Dict]]) -> Optional[Dict]:
+        """Merge per-chunk responses into a single response with one assistant message."""
+        if not any(reviews):
+            return None
+        
+        contents = [self._extract_ai_content(review) for review in reviews if review]
+        return {
+            'messages': [
+                {
+                    'role': 'assistant',
+                    'content': '\n\n---\n\n'.join(content for content in contents if content)
+                }
+            ],
+            'chunks': [
+                {
+                    'index': index,
+                    'size': size,
+                    'succeeded': review is not None,
+                    'local_only': bool(review and review.get('local_only')),
+                    'response': review
+                }
+                for index, (size, review) in enumerate(zip(sizes, reviews))
+            ]
+        }
+    
+    def _extract_ai_content(self, ai_review) -> str:
+        """Extract the review text from an endpoint response."""
         ai_content = ""
         if isinstance(ai_review, dict):
             # Try to extract the review content from the response
@@ -204,32 +888,69 @@ class DiffGenerator:
                 ai_content = str(ai_review)
         else:
             ai_content = str(ai_review)
+        return ai_content
+    
+    def create_pr_comment(self, ai_review: Dict, diff_content: str, commit_info: Dict[str, str],
+                          parsed: Optional[ReviewParser] = None) -> str:
+        """
+        Create a PR comment with the AI review results.
+        
+        Args:
+            ai_review: The response from Databricks API
+            diff_content: The original diff content
+            commit_info: Commit information dictionary
+            parsed: Already parsed review, if available
+            
+        Returns:
+            Formatted comment text
+        """
+        # Extract AI review content from the response
+        ai_content = self._extract_ai_content(ai_review)
         
         # Parse and format the AI content for better readability
-        formatted_review = self._format_ai_review(ai_content)
+        formatted_review = self._format_ai_review(ai_content, parsed)
         
         # Create the comment
-        comment = f"""## 🤖 AI Security Code Review - Databricks SecureGuard
+        head, tail = self._pr_comment_parts(commit_info, self._review_source(ai_review))
+        return head + formatted_review + tail
+    
+    def _review_source(self, ai_review: Dict) -> str:
+        """Name what produced the review, calling out local-only fallback reviews."""
+        if ai_review.get('local_only'):
+            return f"Local pattern scan only (endpoint unavailable: {ai_review.get('reason')})"
+        chunks = ai_review.get('chunks', [])
+        local = sum(1 for chunk in chunks if chunk.get('local_only'))
+        if local and local == len(chunks):
+            return "Local pattern scan only (endpoint unavailable)"
+        if local:
+            return f"Databricks Model Serving Endpoint, local pattern scan for {local} of {len(chunks)} chunks"
+        return "Databricks Model Serving Endpoint"
+    
+    def _pr_comment_parts(self, commit_info: Dict[str, str],
+                          source: str = "Databricks Model Serving Endpoint") -> Tuple[str, str]:
+        """Split the PR comment around the review, so findings can be written between the parts as they arrive."""
+        head = f"""## 🤖 AI Security Code Review - Databricks SecureGuard
 
 ### Review Summary
 **Previous Commit:** `{commit_info['previous_commit'][:8]}`
 **Current Commit:** `{commit_info['current_commit'][:8]}`
 **Context Lines:** ±{self.context_lines}
-**Review Source:** Databricks Model Serving Endpoint
+**Review Source:** {source}
 
-{formatted_review}
+"""
+        tail = """
 
 ---
 *AI analysis provided by Databricks SecureGuard AI*"""
-        
-        return comment
+        return head, tail
     
-    def _format_ai_review(self, ai_content: str) -> str:
+    def _format_ai_review(self, ai_content: str, parsed: Optional[ReviewParser] = None) -> str:
         """
         Format the AI review content to be simple, readable and developer-friendly.
         
         Args:
             ai_content: Raw AI review content
+            parsed: Already parsed review, to avoid parsing ``ai_content`` again
             
         Returns:
             Formatted review content
@@ -237,131 +958,27 @@ class DiffGenerator:
         if not ai_content:
             return "❌ No AI review content available"
         
-        # Simple, clean formatting
-        formatted_parts = []
-        
-        # Extract basic vulnerability info
-        if "Path Traversal Vulnerability" in ai_content:
-            formatted_parts.append("## 🚨 Security Issue: Path Traversal")
-            formatted_parts.append("")
-        
-        # Extract location
-        location = ""
-        for line in ai_content.split('\n'):
-            if "File:" in line:
-                location = line.replace("File:", "").strip()
-                break
-        
-        if location:
-            formatted_parts.append(f"**File:** {location}")
-        
-        # Extract severity
-        severity = "High"
-        for line in ai_content.split('\n'):
-            if "Severity:" in line:
-                severity = line.replace("Severity:", "").strip()
-                break
-        
-        formatted_parts.append(f"**Severity:** {severity}")
-        formatted_parts.append("")
-        
-        # Extract CWE
-        cwe = ""
-        for line in ai_content.split('\n'):
-            if "CWE-ID:" in line:
-                cwe = line.replace("CWE-ID:", "").strip()
-                break
-        
-        if cwe:
-            formatted_parts.append(f"**CWE:** {cwe}")
-            formatted_parts.append("")
-        
-        # Extract description (first meaningful paragraph)
-        description = ""
-        lines = ai_content.split('\n')
-        for i, line in enumerate(lines):
-            if "Vulnerability Description:" in line:
-                # Get the next meaningful line
-                for j in range(i + 1, len(lines)):
-                    if lines[j].strip() and not lines[j].strip().startswith('###'):
-                        description = lines[j].strip()
-                        break
-                break
-        
-        if description:
-            formatted_parts.append("**Issue:** " + description)
-            formatted_parts.append("")
-        
-        # Extract vulnerable code
-        vulnerable_code = ""
-        start_idx = ai_content.find("```python")
-        if start_idx != -1:
-            end_idx = ai_content.find("```", start_idx + 9)
-            if end_idx != -1:
-                vulnerable_code = ai_content[start_idx:end_idx + 3]
-        
-        if vulnerable_code:
-            formatted_parts.append("**Vulnerable Code:**")
-            formatted_parts.append(vulnerable_code)
-            formatted_parts.append("")
-        
-        # Extract secure code
-        secure_code = ""
-        secure_start = ai_content.find("Secure Code:")
-        if secure_start != -1:
-            start_idx = ai_content.find("```python", secure_start)
-            if start_idx != -1:
-                end_idx = ai_content.find("```", start_idx + 9)
-                if end_idx != -1:
-                    secure_code = ai_content[start_idx:end_idx + 3]
-        
-        if secure_code:
-            formatted_parts.append("**Secure Code:**")
-            formatted_parts.append(secure_code)
-            formatted_parts.append("")
-        
-        # Extract key recommendations
-        recommendations = []
-        in_recs = False
-        for line in ai_content.split('\n'):
-            if "Recommendations:" in line:
-                in_recs = True
-                continue
-            elif in_recs and line.strip().startswith('###'):
-                break
-            elif in_recs and line.strip().startswith('1.') or line.strip().startswith('-'):
-                rec = line.strip()
-                if rec.startswith('1.'):
-                    rec = rec[2:].strip()
-                elif rec.startswith('-'):
-                    rec = rec[1:].strip()
-                if rec and len(rec) > 10:
-                    recommendations.append(rec)
-        
-        if recommendations:
-            formatted_parts.append("**Key Fixes:**")
-            for i, rec in enumerate(recommendations[:3], 1):  # Limit to 3
-                formatted_parts.append(f"{i}. {rec}")
-            formatted_parts.append("")
-        
-        # If no structured content found, provide a simple summary
-        if len(formatted_parts) <= 3:
-            formatted_parts = []
-            formatted_parts.append("## 🔍 AI Security Review")
-            formatted_parts.append("")
-            formatted_parts.append("The AI has analyzed your code changes and identified potential security considerations.")
-            formatted_parts.append("")
-            formatted_parts.append("**Recommendation:** Review the changes for security best practices and ensure proper input validation.")
-        
-        return '\n'.join(formatted_parts)
+        if parsed is None:
+            parsed = parse_review(ai_content)
+        
+        return render_findings(parsed.findings, clean=parsed.clean)
+    
+    def parse_ai_review(self, ai_review: Dict) -> ReviewParser:
+        """Parse an endpoint response into structured findings."""
+        return parse_review(self._extract_ai_content(ai_review))
     
     def create_markdown_summary(self, commit_info: Dict[str, str], diff_content: str, stats: str) -> str:
         """Create a formatted markdown summary."""
+        head, tail = self._markdown_summary_parts(commit_info, stats)
+        return head + diff_content + tail
+    
+    def _markdown_summary_parts(self, commit_info: Dict[str, str], stats: str) -> Tuple[str, str]:
+        """Return the markdown summary text before and after the detailed diff."""
         initial_commit_note = ""
         if commit_info.get("is_initial_commit", False):
             initial_commit_note = "\n> **Note:** This appears to be the initial commit in the repository."
         
-        summary = f"""# Code Diff Summary
+        head = f"""# Code Diff Summary
 
 ## Commit Information
 - **Previous Commit:** `{commit_info['previous_commit'][:8]}`
@@ -381,30 +998,41 @@ class DiffGenerator:
 
 ## Detailed Diff
 ```diff
-{diff_content}
+"""
+        tail = """
 ```
 
 ---
 *Generated by Python Diff Generator Script*
 """
-        return summary
+        return head, tail
     
-    def create_json_report(self, commit_info: Dict[str, str], diff_content: str, stats: str) -> Dict:
-        """Create a JSON report with metadata."""
+    def create_json_report(self, commit_info: Dict[str, str], diff_content: str, stats: str,
+                           diff_lines: Optional[int] = None, diff_ref: Optional[Dict] = None,
+                           files: Optional[List[Dict]] = None, excluded: Optional[List[Dict]] = None) -> Dict:
+        """
+        Create a JSON report with metadata.
+        
+        The diff is referenced by path, size and hash under ``diff``; it is
+        embedded as ``diff_content`` only when ``inline_diff`` is set. The
+        per-file records from ``generate_diff_with_files`` are listed under
+        ``files`` and give the file and line counts; files the exclusion rules
+        dropped or truncated are listed under ``exclusions``.
+        """
         # Count lines in diff
-        diff_lines = len(diff_content.split('\n'))
+        if diff_lines is None:
+            diff_lines = len(diff_content.split('\n'))
         
-        # Parse stats to get file count
-        stat_lines = stats.strip().split('\n')
-        changed_files = len([line for line in stat_lines if '|' in line])
+        files = files or []
         
-        return {
+        report = {
             "metadata": {
                 "generator": "Python Diff Generator",
                 "version": "1.0.0",
                 "timestamp": commit_info['timestamp'],
                 "context_lines": self.context_lines,
-                "is_initial_commit": commit_info.get("is_initial_commit", False)
+                "is_initial_commit": commit_info.get("is_initial_commit", False),
+                "is_shallow": commit_info.get("is_shallow", False)
             },
             "commits": {
                 "previous": {
@@ -421,14 +1049,59 @@ class DiffGenerator:
             "author": commit_info['author'],
             "statistics": {
                 "total_diff_lines": diff_lines,
-                "changed_files": changed_files,
+                "changed_files": len(files),
+                "additions": sum(record['additions'] for record in files),
+                "deletions": sum(record['deletions'] for record in files),
+                "binary_files": sum(1 for record in files if record['binary']),
                 "context_lines": self.context_lines
             },
             "files_stats": stats,
-            "diff_content": diff_content
+            "files": files,
+            "diff": diff_ref or self._diff_reference(diff_content)
+        }
+        if self.exclusions is not None:
+            report["statistics"]["excluded_files"] = sum(1 for entry in excluded or [] if entry["action"] == "excluded")
+            report["statistics"]["truncated_files"] = sum(1 for entry in excluded or [] if entry["action"] == "truncated")
+            report["exclusions"] = excluded or []
+        if self.inline_diff:
+            report["diff_content"] = diff_content
+        return report
+    
+    def _diff_reference(self, diff_content: str) -> Dict:
+        """Describe ``code_diff.txt`` by path (relative to the report), byte size and SHA-256."""
+        data = diff_content.encode('utf-8')
+        return {
+            "path": "code_diff.txt",
+            "size": len(data),
+            "sha256": hashlib.sha256(data).hexdigest()
         }
     
-    def save_files(self, diff_content: str, markdown_summary: str, json_report: Dict):
+    def _json_options(self) -> Dict:
+        """Serialization options for the report: indented, or compact with ``compact_json``."""
+        if self.compact_json:
+            return {"separators": (',', ':'), "ensure_ascii": False}
+        return {"indent": 2, "ensure_ascii": False}
+    
+    def write_json_report(self, json_report: Dict, diff_file: Optional[Path] = None) -> Path:
+        """
+        Serialize ``diff_report.json`` once, after every stage has added its data.
+        
+        Args:
+            json_report: The complete report
+            diff_file: Diff to copy into an inline ``diff_content`` placeholder block by block
+            
+        Returns:
+            Path of the written report
+        """
+        json_file = self.output_dir / "diff_report.json"
+        if diff_file is not None and self.inline_diff:
+            self._write_streamed_report(json_report, diff_file, json_file)
+        else:
+            with open(json_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(json_report, **self._json_options()))
+        return json_file
+    
+    def save_files(self, diff_content: str, markdown_summary: str):
         """Save all output files."""
         # Save raw diff
         diff_file = self.output_dir / "code_diff.txt"
@@ -440,79 +1113,457 @@ class DiffGenerator:
         with open(summary_file, 'w', encoding='utf-8') as f:
             f.write(markdown_summary)
         
-        # Save JSON report
-        json_file = self.output_dir / "diff_report.json"
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(json_report, f, indent=2, ensure_ascii=False)
+        print(f"📁 Files saved to: {self.output_dir}")
+        print(f"  - {diff_file}")
+        print(f"  - {summary_file}")
+    
+    def stream_diff_to_file(self, prev_commit: str, current_commit: str, diff_file: Path,
+                            excluded: Optional[List[Dict]] = None) -> Tuple[int, Dict, List[Dict]]:
+        """
+        Stream ``git diff`` output straight into ``diff_file``.
+        
+        Lines are counted and hashed on the fly and the trailing newline is
+        dropped, so the file matches what ``generate_diff_with_files`` would
+        return. The per-file records come from the same ``git diff`` process,
+        and the exclusion rules, if any, are applied before a line is written.
+        
+        Returns:
+            Tuple of (diff line count, diff reference as in ``_diff_reference``, file records)
+        """
+        files: List[Dict] = []
+        lines = self.git.iter_diff_with_files(prev_commit, current_commit, self.context_lines, files)
+        if self.exclusions is not None:
+            lines = self.exclusions.filter_diff(lines, files, excluded if excluded is not None else [])
+        line_count = 0
+        size = 0
+        digest = hashlib.sha256()
+        pending = ""
+        with open(diff_file, 'w', encoding='utf-8') as f:
+            for line in lines:
+                if pending:
+                    f.write(pending)
+                    data = pending.encode('utf-8')
+                    size += len(data)
+                    digest.update(data)
+                pending = line
+                line_count += 1
+            pending = pending.rstrip('\n')
+            f.write(pending)
+            data = pending.encode('utf-8')
+            size += len(data)
+            digest.update(data)
+        diff_ref = {"path": diff_file.name, "size": size, "sha256": digest.hexdigest()}
+        return max(line_count, 1), diff_ref, files
+    
+    def _iter_file_lines(self, path: Path) -> Iterator[str]:
+        """Yield the lines of a text file without reading it whole."""
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from f
+    
+    def _write_streamed_report(self, json_report: Dict, diff_file: Path, json_file: Path):
+        """Write ``json_report`` with ``diff_content`` copied from ``diff_file`` block by block."""
+        serialized = json.dumps(json_report, **self._json_options())
+        before, after = serialized.split(json.dumps(STREAMED_DIFF_PLACEHOLDER), 1)
+        with open(json_file, 'w', encoding='utf-8') as out, open(diff_file, 'r', encoding='utf-8') as src:
+            out.write(before)
+            out.write('"')
+            for block in iter(lambda: src.read(STREAM_BLOCK_SIZE), ''):
+                out.write(json.dumps(block, ensure_ascii=False)[1:-1])
+            out.write('"')
+            out.write(after)
+    
+    def generate_streaming(self) -> Dict:
+        """
+        Generate the diff analysis without holding the diff in memory.
+        
+        ``git diff`` is streamed into ``code_diff.txt``; the markdown summary,
+        the AI review chunks and ``diff_report.json`` are then produced from
+        that file block by block. The review always runs in chunked mode here,
+        since a single request would need the whole diff in memory.
+        
+        Returns:
+            The JSON report, without ``diff_content`` even in inline mode
+        """
+        print(f"🔍 Streaming diff with ±{self.context_lines} context lines...")
+        
+        with self.tracer.span("commit_info"):
+            commit_info = self.get_commit_info()
+        print(f"📝 Previous commit: {commit_info['previous_commit'][:8]}")
+        print(f"📝 Current commit: {commit_info['current_commit'][:8]}")
+        
+        if commit_info.get("is_initial_commit", False):
+            print("ℹ️  This appears to be the initial commit - comparing against empty tree")
+        
+        diff_file = self.output_dir / "code_diff.txt"
+        excluded: List[Dict] = []
+        with self.tracer.span("diff"):
+            diff_lines, diff_ref, files = self.stream_diff_to_file(
+                commit_info['previous_commit'],
+                commit_info['current_commit'],
+                diff_file,
+                excluded
+            )
+        self._print_exclusions(excluded)
+        
+        review_extras: Dict = {}
+        if self.commit_range:
+            review_units = None
+        else:
+            with self.tracer.span("prepare"):
+                review_diff = self.prepare_review_diff(lambda: self._iter_file_lines(diff_file), review_extras, files)
+            if review_diff is not None:
+                review_units = self.iter_diff_units(review_diff.splitlines(keepends=True))
+            else:
+                review_units = self.iter_diff_units(self._iter_file_lines(diff_file))
+        
+        def write_summaries() -> Tuple[Dict, Path]:
+            with self.tracer.span("stats"):
+                stats = self.format_files_stats(files)
+            
+            summary_file = self.output_dir / "diff_summary.md"
+            with self.tracer.span("render"):
+                head, tail = self._markdown_summary_parts(commit_info, stats)
+                with open(summary_file, 'w', encoding='utf-8') as out, open(diff_file, 'r', encoding='utf-8') as src:
+                    out.write(head)
+                    shutil.copyfileobj(src, out, STREAM_BLOCK_SIZE)
+                    out.write(tail)
+                
+                json_report = self.create_json_report(commit_info, STREAMED_DIFF_PLACEHOLDER, stats,
+                                                      diff_lines=diff_lines, diff_ref=diff_ref,
+                                                      files=files, excluded=excluded)
+            return json_report, summary_file
+        
+        # The review units are read lazily, so the review also reads the diff back from disk
+        json_report, summary_file, published = self._run_stages(
+            write_summaries,
+            lambda: self._review_and_publish(review_units, review_extras, "", commit_info)
+        )
+        self._merge_review(json_report, review_extras, published)
+        
+        self._add_transport_stats(json_report)
+        self._add_retrieval_stats(json_report)
+        self._add_degradation(json_report)
+        json_report["statistics"]["git_processes"] = self.git.process_count
+        json_report["timings"] = self.tracer.summary()
+        with self.tracer.span("report"):
+            json_file = self.write_json_report(json_report, diff_file)
+        json_report.pop("diff_content", None)
+        self._append_findings(json_report)
         
         print(f"📁 Files saved to: {self.output_dir}")
         print(f"  - {diff_file}")
         print(f"  - {summary_file}")
         print(f"  - {json_file}")
+        print(f"📊 Diff analysis complete!")
+        print(f"   Total diff lines: {diff_lines}")
+        print(f"   Diff size: {diff_ref['size']} bytes")
+        print(f"   Context lines: ±{self.context_lines}")
+        print(f"   Git processes spawned: {self.git.process_count}")
+        print(f"   Elapsed: {self.tracer.now():.2f}s")
+        if published:
+            print(f"   AI review: ✅ Generated")
+        
+        return json_report
+    
+    def _run_stages(self, write_summaries: Callable[[], Tuple], review: Callable[[], Dict]) -> Tuple:
+        """
+        Run the summary stage and the review stage, overlapped in pipelined mode.
+        
+        In pipelined mode the review (and the PR comment it produces) runs on
+        its own thread while this thread computes stats and writes the
+        summaries, so the run takes roughly as long as the slower of the two.
+        
+        Returns:
+            The results of ``write_summaries`` followed by the result of ``review``
+        """
+        if not self.pipelined:
+            summaries = write_summaries()
+            return (*summaries, review())
+        
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="review") as pipeline:
+            pending_review = pipeline.submit(review)
+            summaries = write_summaries()
+            return (*summaries, pending_review.result())
+    
+    def _review_and_publish(self, review_input, review_extras: Dict, diff_content: str,
+                            commit_info: Dict[str, str]) -> Dict:
+        """
+        Review the diff and write ``ai_review.json`` and ``pr_comment.md`` as soon as the response lands.
+        
+        Args:
+            review_input: Diff text, or an iterator of diff units to review in chunks
+            review_extras: Receives review-side report data (cache statistics, commit reviews)
+            diff_content: The original diff content
+            commit_info: Commit information dictionary
+            
+        Returns:
+            The ``ai_review``, ``pr_comment`` and ``findings`` report entries, or {} without a review
+        """
+        with self.tracer.span("api"):
+            if self.commit_range:
+                ai_review, review_extras["commit_reviews"] = self.review_commit_range(self.commit_range)
+            elif self.cache is not None:
+                units = [review_input] if isinstance(review_input, str) else review_input
+                ai_review = self.review_diff_cached(units)
+                review_extras.setdefault("statistics", {}).update(self.cache_lookups)
+            elif self.chunked or not isinstance(review_input, str):
+                units = review_input if not isinstance(review_input, str) else \
+                    self.iter_diff_units(review_input.splitlines(keepends=True))
+                ai_review = self.review_diff_chunks(self.pack_diff_chunks(units))
+            elif review_input and self.stream_response:
+                ai_review = self.stream_databricks_review(review_input, commit_info, review_extras) or \
+                    self._fallback_review(review_input)
+            elif review_input:
+                ai_review = self.call_databricks_api(review_input) or self._fallback_review(review_input)
+            else:
+                print("ℹ️  Nothing left to review - skipping AI review")
+                ai_review = None
+        
+        if not ai_review:
+            return {}
+        
+        # Parse findings and create PR comment
+        with self.tracer.span("format"):
+            parsed = self.parse_ai_review(ai_review)
+            parsed.findings = self._fan_out(parsed.findings, review_extras)
+            pr_comment = self.create_pr_comment(ai_review, diff_content, commit_info, parsed)
+        
+        # Save AI review and comment
+        ai_review_file = self.output_dir / "ai_review.json"
+        with open(ai_review_file, 'w', encoding='utf-8') as f:
+            json.dump(ai_review, f, indent=2, ensure_ascii=False)
+        
+        pr_comment_file = self.output_dir / "pr_comment.md"
+        with open(pr_comment_file, 'w', encoding='utf-8') as f:
+            f.write(pr_comment)
+        
+        print(f"  - {ai_review_file}")
+        print(f"  - {pr_comment_file}")
+        
+        return {
+            "ai_review": ai_review,
+            "pr_comment": pr_comment,
+            "findings": [finding.to_dict() for finding in parsed.findings]
+        }
+    
+    def _fan_out(self, findings: List, review_extras: Dict) -> List:
+        """Copy findings on deduplicated hunks to every location sharing the hunk."""
+        dedup = review_extras.get("dedup")
+        if not dedup or not dedup["groups"]:
+            return findings
+        return HunkDeduplicator.fan_out(findings, dedup["groups"])
+    
+    def _merge_review(self, json_report: Dict, review_extras: Dict, published: Dict):
+        """Add the review-side entries to the report; statistics are merged rather than replaced."""
+        json_report["statistics"].update(review_extras.pop("statistics", {}))
+        json_report.update(review_extras)
+        json_report.update(published)
+    
+    def prepare_review_diff(self, diff_lines: Callable[[], Iterable[str]], json_report: Dict,
+                            files: Optional[List[Dict]] = None) -> Optional[str]:
+        """
+        Apply hunk deduplication, the local prefilter and the token budget to the diff sent for review.
+        
+        Prefilter modes:
+            report  - scan and record hits, review the whole diff
+            flagged - review only the hunks the prefilter flagged
+            gate    - review the whole diff only if anything was flagged
+        
+        Args:
+            diff_lines: Callable returning a fresh iterable of diff lines
+            json_report: Report that receives the ``dedup``, ``prefilter`` and ``packing`` blocks
+            files: Per-file records of the diff, passed on to the packer
+            
+        Returns:
+            The diff to review, or None when it is the unmodified input
+        """
+        review_diff: Optional[str] = None
+        
+        if self.deduplicator is not None:
+            deduped, dedup = self.deduplicator.dedupe(diff_lines())
+            json_report["dedup"] = dedup
+            print(f"♻️  Deduplicated hunks: {dedup['unique_hunks']}/{dedup['total_hunks']} unique, "
+                  f"{dedup['bytes_saved']} bytes and {dedup['dropped_files']} files dropped")
+            if dedup["duplicate_hunks"]:
+                review_diff = deduped
+                diff_lines = lambda: deduped.splitlines(keepends=True)
+        
+        if self.prefilter is not None:
+            flagged_diff, scan = self.prefilter.scan_diff(diff_lines(), keep_flagged=self.prefilter_mode == "flagged")
+            scan["mode"] = self.prefilter_mode
+            json_report["prefilter"] = scan
+            print(f"🔎 Prefilter: {scan['flagged_hunks']}/{scan['total_hunks']} hunks flagged "
+                  f"({scan['hit_count']} hits, mode: {self.prefilter_mode})")
+            if self.prefilter_mode == "flagged":
+                review_diff = flagged_diff
+            elif self.prefilter_mode == "gate" and not scan["flagged_hunks"]:
+                review_diff = ""
+        
+        if self.packer is not None and review_diff != "":
+            source = diff_lines if review_diff is None else (lambda: review_diff.splitlines(keepends=True))
+            review_diff, json_report["packing"] = self.packer.pack(source, files)
+            self._print_packing(json_report["packing"])
+        
+        return review_diff
+    
+    def _print_exclusions(self, excluded: List[Dict]):
+        """Print the files the exclusion rules dropped or truncated."""
+        for entry in excluded:
+            print(f"🚫 {entry['action'].capitalize()} {entry['path']}: {entry['reason']}")
+    
+    def _print_packing(self, packing: Dict):
+        """Print a one-line summary of the token budget packing."""
+        print(f"📦 Packed {packing['packed_tokens']}/{packing['estimated_tokens']} estimated tokens "
+              f"(budget {packing['token_budget']}): {len(packing['included'])} included, "
+              f"{len(packing['trimmed'])} trimmed, {len(packing['skipped'])} skipped")
+    
+    def _add_transport_stats(self, json_report: Dict):
+        """Add record/replay, hedging and shared rate limiter counters to the report statistics."""
+        transport = self.transport
+        if isinstance(transport, RecordReplayTransport):
+            stats = transport.stats()
+            json_report["statistics"]["recordings"] = stats
+            print(f"📼 Responses replayed: {stats['replayed']}, recorded: {stats['recorded']}, "
+                  f"missing: {stats['missed']}")
+            transport = transport.transport
+        
+        if isinstance(transport, HedgedTransport):
+            stats = transport.stats()
+            json_report["statistics"]["hedging"] = stats
+            if stats["hedge_delay_seconds"] is not None:
+                print(f"🪁 Hedged {stats['hedged']} of {stats['calls']} calls, {stats['hedge_wins']} won by the hedge "
+                      f"(hedge delay now {stats['hedge_delay_seconds']}s)")
+            if "circuit_breaker" in stats:
+                breaker = stats["circuit_breaker"]
+                print(f"🔌 Circuit breaker {breaker['state']}: {breaker['trips']} trips, {breaker['rejected']} calls rejected")
+            transport = transport.transport
+        
+        limiter = getattr(transport, "limiter", None)
+        if isinstance(limiter, SharedRateLimiter):
+            stats = limiter.stats()
+            json_report["statistics"]["rate_limiter"] = stats
+            print(f"🚦 Endpoint queue wait: {stats['wait_seconds']:.2f}s over {stats['acquired']} calls "
+                  f"(max {stats['max_wait_seconds']:.2f}s, {stats['throttled']} throttled, "
+                  f"shared limit now {stats['concurrency_limit']})")
+    
+    def _add_degradation(self, json_report: Dict):
+        """Record the local-only fallback reviews, if any, under ``degraded``."""
+        with self._fallback_lock:
+            reasons = dict(self.fallback_reasons)
+        if not reasons:
+            return
+        ai_review = json_report.get("ai_review", {})
+        chunks = ai_review.get("chunks", [])
+        local_only = ai_review.get("local_only") or (chunks and all(chunk["local_only"] for chunk in chunks))
+        json_report["degraded"] = {
+            "local_only": bool(local_only),
+            "fallback_reviews": sum(reasons.values()),
+            "reasons": reasons
+        }
+    
+    def _add_retrieval_stats(self, json_report: Dict):
+        """Add the catalog index size and query timings to the report statistics."""
+        if self.catalog_index is None:
+            return
+        stats = self.catalog_index.stats()
+        json_report["statistics"]["retrieval"] = stats
+        average = stats["query_seconds"] / stats["hunks_queried"] if stats["hunks_queried"] else 0.0
+        print(f"📚 Catalog examples: {stats['hunks_matched']}/{stats['hunks_queried']} hunks matched, "
+              f"{average * 1000:.3f}ms per hunk (index {'built' if stats['built'] else 'loaded'} "
+              f"in {stats['load_seconds'] * 1000:.1f}ms)")
+    
+    def _append_findings(self, json_report: Dict):
+        """Append the run's findings and summary line to the NDJSON findings stream."""
+        if self.findings_stream is None:
+            return
+        # In CI the checkout path says little; the GitHub repository name identifies the run
+        repo = os.path.abspath(self.git.repo_path) if self.git.repo_path else \
+            os.environ.get('GITHUB_REPOSITORY') or os.getcwd()
+        count = self.findings_stream.write_run(json_report, repo)
+        target = "stdout" if self.findings_stream.target == "-" else self.findings_stream.target
+        print(f"🧾 Appended {count} findings and a run summary to {target}")
+    
+    def close(self):
+        """Release long-lived resources such as the git batch process and HTTP pool."""
+        self.git.close()
+        self.transport.close()
     
     def generate(self) -> Dict:
         """Main method to generate the complete diff analysis."""
+        self._start_deadline()
+        if self.stream:
+            return self.generate_streaming()
+        
         print(f"🔍 Generating diff with ±{self.context_lines} context lines...")
         
         # Get commit information
-        commit_info = self.get_commit_info()
+        with self.tracer.span("commit_info"):
+            commit_info = self.get_commit_info()
         print(f"📝 Previous commit: {commit_info['previous_commit'][:8]}")
         print(f"📝 Current commit: {commit_info['current_commit'][:8]}")
         
         if commit_info.get("is_initial_commit", False):
             print("ℹ️  This appears to be the initial commit - comparing against empty tree")
         
-        # Generate diff
-        diff_content = self.generate_diff(
-            commit_info['previous_commit'], 
-            commit_info['current_commit']
-        )
-        
-        # Get file statistics
-        stats = self.get_changed_files_stats(
-            commit_info['previous_commit'], 
-            commit_info['current_commit']
-        )
-        
-        # Create summaries
-        markdown_summary = self.create_markdown_summary(commit_info, diff_content, stats)
-        json_report = self.create_json_report(commit_info, diff_content, stats)
+        # Generate the diff and per-file records in one git pass, minus excluded files
+        excluded: List[Dict] = []
+        with self.tracer.span("diff"):
+            diff_content, files = self.generate_diff_with_files(
+                commit_info['previous_commit'], 
+                commit_info['current_commit'],
+                excluded
+            )
+        self._print_exclusions(excluded)
         
-        # Save files
-        self.save_files(diff_content, markdown_summary, json_report)
+        # Narrow the review payload with the prefilter and token budget, if enabled
+        review_extras: Dict = {}
+        with self.tracer.span("prepare"):
+            review_diff = self.prepare_review_diff(lambda: diff_content.splitlines(keepends=True), review_extras, files)
+        if review_diff is None:
+            review_diff = diff_content
         
-        # Call Databricks API for AI review
-        ai_review = self.call_databricks_api(diff_content)
-        if ai_review:
-            # Create PR comment
-            pr_comment = self.create_pr_comment(ai_review, diff_content, commit_info)
-            
-            # Save AI review and comment
-            ai_review_file = self.output_dir / "ai_review.json"
-            with open(ai_review_file, 'w', encoding='utf-8') as f:
-                json.dump(ai_review, f, indent=2, ensure_ascii=False)
-            
-            pr_comment_file = self.output_dir / "pr_comment.md"
-            with open(pr_comment_file, 'w', encoding='utf-8') as f:
-                f.write(pr_comment)
+        def write_summaries() -> Tuple[Dict]:
+            # Render file statistics from the per-file records
+            with self.tracer.span("stats"):
+                stats = self.format_files_stats(files)
             
-            print(f"  - {ai_review_file}")
-            print(f"  - {pr_comment_file}")
+            # Create summaries
+            with self.tracer.span("render"):
+                markdown_summary = self.create_markdown_summary(commit_info, diff_content, stats)
+                json_report = self.create_json_report(commit_info, diff_content, stats,
+                                                      files=files, excluded=excluded)
             
-            # Add AI review to JSON report
-            json_report["ai_review"] = ai_review
-            json_report["pr_comment"] = pr_comment
-            
-            # Update JSON file with AI review
-            with open(self.output_dir / "diff_report.json", 'w', encoding='utf-8') as f:
-                json.dump(json_report, f, indent=2, ensure_ascii=False)
+            # Save files
+            with self.tracer.span("save"):
+                self.save_files(diff_content, markdown_summary)
+            return (json_report,)
+        
+        # Call Databricks API for AI review, overlapping the summaries in pipelined mode
+        json_report, published = self._run_stages(
+            write_summaries,
+            lambda: self._review_and_publish(review_diff, review_extras, diff_content, commit_info)
+        )
+        self._merge_review(json_report, review_extras, published)
+        
+        # Write the JSON report once every stage has contributed to it
+        self._add_transport_stats(json_report)
+        self._add_retrieval_stats(json_report)
+        self._add_degradation(json_report)
+        json_report["statistics"]["git_processes"] = self.git.process_count
+        json_report["timings"] = self.tracer.summary()
+        with self.tracer.span("report"):
+            json_file = self.write_json_report(json_report)
+        print(f"  - {json_file}")
+        self._append_findings(json_report)
         
         # Print summary
         diff_lines = len(diff_content.split('\n'))
         print(f"📊 Diff analysis complete!")
         print(f"   Total diff lines: {diff_lines}")
         print(f"   Context lines: ±{self.context_lines}")
-        if ai_review:
+        print(f"   Git processes spawned: {self.git.process_count}")
+        print(f"   Elapsed: {self.tracer.now():.2f}s")
+        if published:
             print(f"   AI review: ✅ Generated")
         
         return json_report
@@ -537,6 +1588,293 @@ def main():
         action="store_true",
         help="Output only JSON report to stdout"
     )
+    parser.add_argument(
+        "--findings-ndjson",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Append one JSON line per finding and one run summary line to this file; "
+             "'-' writes them to stdout and moves progress output to stderr"
+    )
+    parser.add_argument(
+        "--compact-json",
+        action="store_true",
+        help="Write diff_report.json without indentation"
+    )
+    parser.add_argument(
+        "--inline-diff",
+        action="store_true",
+        help="Embed the full diff in diff_report.json as diff_content (default: reference code_diff.txt)"
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        help="Export stage, git and HTTP spans to this file in Chrome trace (Perfetto) format"
+    )
+    parser.add_argument(
+        "--record",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="Save every successful endpoint response in DIR, keyed by request fingerprint"
+    )
+    parser.add_argument(
+        "--replay",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="Answer requests from responses recorded in DIR, offline; combine with --record "
+             "to fetch and record the missing ones"
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Start the AI review as soon as the diff exists and write the summaries while it runs"
+    )
+    parser.add_argument(
+        "--chunked",
+        action="store_true",
+        help="Split the diff at file/hunk boundaries and review the chunks concurrently"
+    )
+    parser.add_argument(
+        "--max-chunk-bytes",
+        type=int,
+        default=200_000,
+        help="Maximum size of a review chunk in chunked mode (default: 200000)"
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=4,
+        help="Number of concurrent review requests in chunked mode (default: 4)"
+    )
+    parser.add_argument(
+        "--endpoint-url",
+        type=str,
+        default=os.environ.get('DATABRICKS_ENDPOINT_URL', DATABRICKS_ENDPOINT_URL),
+        help="Model serving endpoint URL (default: $DATABRICKS_ENDPOINT_URL or the SecureGuard endpoint)"
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=10,
+        help="Maximum pooled keep-alive connections to the endpoint (default: 10)"
+    )
+    parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=5.0,
+        help="Endpoint connect timeout in seconds (default: 5)"
+    )
+    parser.add_argument(
+        "--read-timeout",
+        type=float,
+        default=30.0,
+        help="Endpoint read timeout in seconds (default: 30)"
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="Retries for timeouts, connection errors and 429/5xx responses (default: 3)"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        action="store_true",
+        help="Share an adaptive limit on endpoint calls with every other run on this host"
+    )
+    parser.add_argument(
+        "--rate-limit-db",
+        type=str,
+        default=None,
+        help=f"SQLite database holding the shared limit; implies --rate-limit (default: {DEFAULT_DB_PATH})"
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=8,
+        help="Upper bound of the shared concurrent call limit, adapted down on 429s and slow responses (default: 8)"
+    )
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=None,
+        help="Shared cap on endpoint requests per second (default: no cap)"
+    )
+    parser.add_argument(
+        "--target-latency",
+        type=float,
+        default=None,
+        help="Response time in seconds above which the shared limit backs off (default: 3x the fastest seen)"
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        help="Seconds the whole run may take; endpoint calls still pending then are abandoned"
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=None,
+        help="Send a duplicate request when a call takes longer than this percentile of recent calls "
+             "and use whichever response arrives first"
+    )
+    parser.add_argument(
+        "--hedge-after",
+        type=float,
+        default=10.0,
+        help="Hedge delay in seconds until enough calls have been seen for the percentile (default: 10)"
+    )
+    parser.add_argument(
+        "--breaker-failures",
+        type=int,
+        default=None,
+        help="Stop calling the endpoint after this many consecutive failed calls"
+    )
+    parser.add_argument(
+        "--breaker-reset",
+        type=float,
+        default=30.0,
+        help="Seconds before a tripped circuit breaker lets a probe call through (default: 30)"
+    )
+    parser.add_argument(
+        "--local-fallback",
+        action="store_true",
+        help="Review diffs the endpoint could not review with the local pattern scan instead"
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Send gzip-compressed request bodies"
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=None,
+        help="Fit the review payload into this many estimated tokens, security-relevant files first"
+    )
+    parser.add_argument(
+        "--min-context",
+        type=int,
+        default=3,
+        help="Context lines kept when trimming files to fit the token budget (default: 3)"
+    )
+    parser.add_argument(
+        "--prefilter",
+        choices=["off", "report", "flagged", "gate"],
+        default="off",
+        help="Local pattern scan of added lines: record hits (report), send only flagged hunks "
+             "(flagged) or skip the endpoint when nothing is flagged (gate) (default: off)"
+    )
+    parser.add_argument(
+        "--prefilter-rules",
+        type=str,
+        default=None,
+        help="JSON file with extra prefilter rules ([{\"pattern\": ..., \"attack_type\": ...}])"
+    )
+    parser.add_argument(
+        "--catalog-examples",
+        type=int,
+        default=0,
+        metavar="K",
+        help="Attach the K catalog examples most similar to each hunk to the request, "
+             "so the endpoint can skip its vector database search (default: 0, off)"
+    )
+    parser.add_argument(
+        "--catalog-index",
+        type=str,
+        default=DEFAULT_INDEX_PATH,
+        help="Catalog similarity index file, rebuilt when the catalog changes (default: in the temp directory)"
+    )
+    parser.add_argument(
+        "--exclude",
+        action="store_true",
+        help="Drop lock files, vendored, generated, minified and binary changes from the diff "
+             "(built-in rules plus the repository's .gitattributes)"
+    )
+    parser.add_argument(
+        "--exclude-rules",
+        type=str,
+        default=None,
+        help="File of gitattributes-style exclusion rules (\"pattern exclude|truncate[=N]|include\"); implies --exclude"
+    )
+    parser.add_argument(
+        "--max-file-lines",
+        type=int,
+        default=None,
+        help="With --exclude, truncate files no rule matches to this many changed lines"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream the diff to disk and review it in chunks with bounded memory"
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Review each distinct hunk once and copy its findings to every file repeating it"
+    )
+    parser.add_argument(
+        "--stream-response",
+        action="store_true",
+        help="Request a streamed review and write findings to pr_comment.md as they arrive "
+             "(single-request reviews; chunked and range reviews are not streamed)"
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse AI reviews of previously seen file hunks from an on-disk cache"
+    )
+    parser.add_argument(
+        "--cache-path",
+        type=str,
+        default=None,
+        help="Review cache database (default: <output-dir>/review_cache.sqlite)"
+    )
+    parser.add_argument(
+        "--cache-max-bytes",
+        type=int,
+        default=64 * 1024 * 1024,
+        help="Evict least recently used reviews beyond this size (default: 64 MiB)"
+    )
+    parser.add_argument(
+        "--cache-ttl-hours",
+        type=float,
+        default=168,
+        help="Expire cached reviews after this many hours (default: 168)"
+    )
+    parser.add_argument(
+        "--base",
+        type=str,
+        default=None,
+        help="Base revision of the diff (default: first parent of the head)"
+    )
+    parser.add_argument(
+        "--head",
+        type=str,
+        default=None,
+        help="Head revision of the diff (default: HEAD)"
+    )
+    parser.add_argument(
+        "--merge-base",
+        action="store_true",
+        help="Diff the head against the merge base of --base and --head, as a pull request shows it"
+    )
+    parser.add_argument(
+        "--range",
+        type=str,
+        default=None,
+        dest="commit_range",
+        help="Review every commit of BASE..HEAD individually, several commits per request"
+    )
+    parser.add_argument(
+        "--commits-per-request",
+        type=int,
+        default=5,
+        help="Commits sent in one request in --range mode (default: 5)"
+    )
     
     args = parser.parse_args()
     
@@ -545,24 +1883,192 @@ def main():
         print("❌ Context lines must be non-negative")
         sys.exit(1)
     
+    if args.max_chunk_bytes <= 0 or args.max_workers <= 0:
+        print("❌ --max-chunk-bytes and --max-workers must be positive")
+        sys.exit(1)
+    
+    if args.pool_size <= 0 or args.max_retries < 0:
+        print("❌ --pool-size must be positive and --max-retries non-negative")
+        sys.exit(1)
+    
+    if args.commit_range:
+        if args.base or args.head:
+            print("❌ --range cannot be combined with --base/--head")
+            sys.exit(1)
+        if '...' in args.commit_range or '..' not in args.commit_range:
+            print("❌ --range must have the form BASE..HEAD")
+            sys.exit(1)
+    
+    if args.merge_base and not args.base:
+        print("❌ --merge-base requires --base")
+        sys.exit(1)
+    
+    if args.findings_ndjson == "-" and args.json_only:
+        print("❌ --findings-ndjson - cannot be combined with --json-only")
+        sys.exit(1)
+    
+    if args.commits_per_request <= 0:
+        print("❌ --commits-per-request must be positive")
+        sys.exit(1)
+    
+    if args.connect_timeout <= 0 or args.read_timeout <= 0:
+        print("❌ --connect-timeout and --read-timeout must be positive")
+        sys.exit(1)
+    
+    if args.max_concurrency <= 0:
+        print("❌ --max-concurrency must be positive")
+        sys.exit(1)
+    
+    if (args.requests_per_second is not None and args.requests_per_second <= 0) or \
+            (args.target_latency is not None and args.target_latency <= 0):
+        print("❌ --requests-per-second and --target-latency must be positive")
+        sys.exit(1)
+    
+    if args.deadline is not None and args.deadline <= 0:
+        print("❌ --deadline must be positive")
+        sys.exit(1)
+    
+    if args.hedge_percentile is not None and not 0 < args.hedge_percentile < 100:
+        print("❌ --hedge-percentile must be between 0 and 100")
+        sys.exit(1)
+    
+    if args.hedge_after < 0:
+        print("❌ --hedge-after must be non-negative")
+        sys.exit(1)
+    
+    if (args.breaker_failures is not None and args.breaker_failures <= 0) or args.breaker_reset < 0:
+        print("❌ --breaker-failures must be positive and --breaker-reset non-negative")
+        sys.exit(1)
+    
+    if (args.token_budget is not None and args.token_budget <= 0) or args.min_context < 0:
+        print("❌ --token-budget must be positive and --min-context non-negative")
+        sys.exit(1)
+    
+    if args.max_file_lines is not None and args.max_file_lines <= 0:
+        print("❌ --max-file-lines must be positive")
+        sys.exit(1)
+    
+    if args.catalog_examples < 0:
+        print("❌ --catalog-examples must be non-negative")
+        sys.exit(1)
+    
+    if args.cache_max_bytes <= 0 or args.cache_ttl_hours <= 0:
+        print("❌ --cache-max-bytes and --cache-ttl-hours must be positive")
+        sys.exit(1)
+    
     # Check if we're in a git repository
     if not os.path.exists(".git"):
         print("❌ Not in a git repository")
         sys.exit(1)
     
+    cache = None
+    if args.cache or args.cache_path:
+        cache_path = args.cache_path or os.path.join(args.output_dir, "review_cache.sqlite")
+        cache = ReviewCache(cache_path, args.cache_max_bytes, int(args.cache_ttl_hours * 3600))
+    
+    limiter = None
+    if args.rate_limit or args.rate_limit_db:
+        limiter = SharedRateLimiter(
+            args.endpoint_url,
+            args.rate_limit_db or DEFAULT_DB_PATH,
+            max_concurrency=args.max_concurrency,
+            requests_per_second=args.requests_per_second,
+            target_latency=args.target_latency
+        )
+    
+    transport = EndpointTransport(
+        args.endpoint_url,
+        pool_size=args.pool_size,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        gzip_body=args.gzip,
+        max_retries=args.max_retries,
+        limiter=limiter
+    )
+    
+    if args.hedge_percentile is not None or args.breaker_failures is not None:
+        breaker = None
+        if args.breaker_failures is not None:
+            breaker = CircuitBreaker(args.breaker_failures, args.breaker_reset)
+        transport = HedgedTransport(transport, percentile=args.hedge_percentile,
+                                    initial_delay=args.hedge_after, breaker=breaker)
+    
+    packer = None
+    if args.token_budget is not None:
+        packer = DiffPacker(args.token_budget, min_context=min(args.min_context, args.context_lines))
+    
+    prefilter = None
+    if args.prefilter != "off":
+        prefilter = SecurityPrefilter.from_catalog(extra_rules_path=args.prefilter_rules)
+    
+    catalog_index = None
+    if args.catalog_examples:
+        try:
+            catalog_index = CatalogIndex.load_or_build(index_path=args.catalog_index)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not load the catalog index: {e}")
+            sys.exit(1)
+    
+    exclusions = None
+    if args.exclude or args.exclude_rules:
+        try:
+            exclusions = ExclusionRules.load(args.exclude_rules, max_file_lines=args.max_file_lines)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not load exclusion rules: {e}")
+            sys.exit(1)
+    
     # Generate diff
-    generator = DiffGenerator(args.context_lines, args.output_dir)
+    generator = DiffGenerator(
+        args.context_lines,
+        args.output_dir,
+        chunked=args.chunked,
+        max_chunk_bytes=args.max_chunk_bytes,
+        max_workers=args.max_workers,
+        cache=cache,
+        stream=args.stream,
+        transport=transport,
+        packer=packer,
+        prefilter=prefilter,
+        prefilter_mode=args.prefilter,
+        exclusions=exclusions,
+        stream_response=args.stream_response,
+        deduplicator=HunkDeduplicator() if args.dedupe else None,
+        catalog_index=catalog_index,
+        retrieval_k=args.catalog_examples,
+        findings_stream=FindingsStream(args.findings_ndjson) if args.findings_ndjson else None,
+        deadline=args.deadline,
+        local_fallback=args.local_fallback,
+        base=args.base,
+        head=args.head,
+        merge_base=args.merge_base,
+        commit_range=args.commit_range,
+        commits_per_request=args.commits_per_request,
+        compact_json=args.compact_json,
+        inline_diff=args.inline_diff,
+        record_dir=args.record,
+        replay_dir=args.replay,
+        pipelined=args.pipeline
+    )
     
-    try:
-        result = generator.generate()
-        
-        if args.json_only:
-            # Output only JSON to stdout
-            print(json.dumps(result, indent=2))
-        
-    except Exception as e:
-        print(f"❌ Error generating diff: {e}")
-        sys.exit(1)
+    # Keep stdout for the NDJSON lines when they are streamed there
+    progress = redirect_stdout(sys.stderr) if args.findings_ndjson == "-" else nullcontext()
+    with progress:
+        try:
+            result = generator.generate()
+            
+            if args.json_only:
+                # Output only JSON to stdout, copied from the report already on disk
+                with open(generator.output_dir / "diff_report.json", 'r', encoding='utf-8') as f:
+                    shutil.copyfileobj(f, sys.stdout, STREAM_BLOCK_SIZE)
+                print()
+            
+        except Exception as e:
+            print(f"❌ Error generating diff: {e}")
+            sys.exit(1)
+        finally:
+            generator.close()
+            if args.trace:
+                generator.tracer.write_chrome_trace(args.trace)
 
 
 if __name__ == "__main__":
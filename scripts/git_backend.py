@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Git Backend
+Single entry point for every git invocation made by the diff generator.
+
+Commit metadata is fetched with one formatted ``git log`` call and object
+lookups go through a persistent ``git cat-file --batch-check`` process, so a
+run spawns a handful of processes instead of one per question. Every spawn is
+counted so the total can be reported, and timed when a tracer is attached.
+"""
+
+import os
+import threading
+import subprocess
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from tracing import Tracer, describe_command
+
+
+# Git's well-known empty tree object, used as the base of an initial commit.
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+# Field and record separators for formatted ``git log`` output.
+FIELD_SEP = "\x1f"
+RECORD_SEP = "\x1e"
+
+# Object name git uses for the missing side of an added or deleted file.
+NULL_OID = "0" * 40
+
+# Object lookups written to the batch process before reading the replies.
+BATCH_WINDOW = 256
+
+
+class GitBackend:
+    def __init__(self, repo_path: Optional[str] = None, tracer: Optional[Tracer] = None):
+        self.repo_path = repo_path
+        self.tracer = tracer
+        self.process_count = 0
+        self._lock = threading.Lock()
+        self._batch: Optional[subprocess.Popen] = None
+
+    def _spawned(self):
+        with self._lock:
+            self.process_count += 1
+        if self.tracer is not None:
+            self.tracer.count("git_processes")
+
+    def _traced(self, command: List[str], start: float, returncode: int):
+        if self.tracer is not None:
+            self.tracer.record(command[1] if len(command) > 1 else "git", start, self.tracer.now(), "git",
+                               command=describe_command(command), returncode=returncode)
+
+    def run(self, command: List[str]) -> Tuple[str, int]:
+        """Run a git command and return output and return code."""
+        self._spawned()
+        start = self.tracer.now() if self.tracer is not None else 0.0
+        try:
+            result = subprocess.run(
+                command,
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=self.repo_path
+            )
+            self._traced(command, start, result.returncode)
+            return result.stdout.strip(), result.returncode
+        except subprocess.CalledProcessError as e:
+            self._traced(command, start, e.returncode)
+            print(f"Git command failed: {' '.join(command)}")
+            print(f"Error: {e.stderr}")
+            return e.stderr, e.returncode
+
+    def iter_lines(self, command: List[str]) -> Iterator[str]:
+        """
+        Run a git command and yield its stdout line by line.
+
+        The output is never held in memory as a whole, so arbitrarily large
+        diffs can be processed with bounded memory. Undecodable bytes are
+        replaced rather than failing the run. The traced duration runs from
+        spawn to exit, so it includes the time the caller spends per line.
+        """
+        self._spawned()
+        start = self.tracer.now() if self.tracer is not None else 0.0
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=self.repo_path)
+        try:
+            for raw_line in process.stdout:
+                yield raw_line.decode('utf-8', errors='replace')
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read().decode('utf-8', errors='replace')
+            process.stderr.close()
+            return_code = process.wait()
+            self._traced(command, start, return_code)
+            if return_code != 0:
+                print(f"Git command failed: {' '.join(command)}")
+                print(f"Error: {stderr}")
+
+    def _batch_process(self) -> subprocess.Popen:
+        """The persistent ``git cat-file --batch-check`` process; call with the lock held."""
+        if self._batch is None or self._batch.poll() is not None:
+            self.process_count += 1
+            if self.tracer is not None:
+                self.tracer.count("git_processes")
+            self._batch = subprocess.Popen(
+                ["git", "cat-file", "--batch-check"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                cwd=self.repo_path
+            )
+        return self._batch
+
+    def resolve(self, ref: str) -> Optional[str]:
+        """
+        Resolve a revision to an object name via the persistent batch process.
+
+        Returns:
+            The full object name, or None if the revision does not exist
+        """
+        with self._lock:
+            batch = self._batch_process()
+            batch.stdin.write(ref + "\n")
+            batch.stdin.flush()
+            reply = batch.stdout.readline().split()
+
+        if len(reply) == 3 and reply[1] != "missing":
+            return reply[0]
+        return None
+
+    def object_sizes(self, oids: List[str]) -> Dict[str, int]:
+        """
+        Look up the size in bytes of many objects through the persistent batch process.
+
+        Requests are written ``BATCH_WINDOW`` at a time before reading the
+        replies, so a lookup costs a pipe round trip per window rather than
+        per object. Missing objects are left out of the result.
+        """
+        sizes: Dict[str, int] = {}
+        wanted = [oid for oid in dict.fromkeys(oids) if oid and oid != NULL_OID]
+        with self._lock:
+            batch = self._batch_process()
+            for offset in range(0, len(wanted), BATCH_WINDOW):
+                window = wanted[offset:offset + BATCH_WINDOW]
+                batch.stdin.write(''.join(oid + "\n" for oid in window))
+                batch.stdin.flush()
+                for oid in window:
+                    reply = batch.stdout.readline().split()
+                    if len(reply) == 3 and reply[1] != "missing":
+                        sizes[oid] = int(reply[2])
+        return sizes
+
+    def _diff_command(self, prev_commit: str, current_commit: str, context_lines: int) -> List[str]:
+        # --raw and --numstat records come first, NUL-terminated, followed by an
+        # empty record and the patch, so one tree walk yields both. Renames and
+        # copies are detected, so pure moves carry no content.
+        return [
+            "git", "diff", "--raw", "--numstat", "-z", "--no-abbrev", "-M", "-C",
+            f"-U{context_lines}", prev_commit, current_commit
+        ]
+
+    def diff_with_files(self, prev_commit: str, current_commit: str,
+                        context_lines: int) -> Tuple[str, List[Dict], int]:
+        """
+        Produce the patch and per-file records from a single ``git diff``.
+
+        Returns:
+            Tuple of (patch text, file records as in ``parse_file_records``, return code);
+            on failure the patch text is git's error output and there are no records
+        """
+        output, return_code = self.run(self._diff_command(prev_commit, current_commit, context_lines))
+        if return_code != 0:
+            return output, [], return_code
+        preamble, separator, patch = output.partition("\0\0")
+        if not separator:
+            # No changes at all, or only records without a patch
+            preamble, patch = output, ""
+        return patch, self._with_sizes(parse_file_records(preamble)), return_code
+
+    def iter_diff_with_files(self, prev_commit: str, current_commit: str, context_lines: int,
+                             files: List[Dict]) -> Iterator[str]:
+        """
+        Stream the patch of a single ``git diff`` line by line, filling ``files`` first.
+
+        The per-file records precede the patch in git's output, so ``files``
+        is complete by the time the first patch line is yielded.
+        """
+        lines = self.iter_lines(self._diff_command(prev_commit, current_commit, context_lines))
+        preamble = ""
+        for line in lines:
+            preamble += line
+            if "\0\0" in preamble:
+                break
+        preamble, _, rest = preamble.partition("\0\0")
+        files.extend(self._with_sizes(parse_file_records(preamble)))
+        if rest:
+            yield rest
+        yield from lines
+
+    def _with_sizes(self, records: List[Dict]) -> List[Dict]:
+        """Fill in ``size`` and ``old_size`` from the blob names, then drop the names."""
+        sizes = self.object_sizes([oid for record in records for oid in (record["old_oid"], record["new_oid"])])
+        for record in records:
+            record["old_size"] = sizes.get(record.pop("old_oid"), 0)
+            record["size"] = sizes.get(record.pop("new_oid"), 0)
+        return records
+
+    def log_entries(self, ref: str = "HEAD", count: int = 2) -> List[Dict[str, str]]:
+        """
+        Fetch hash, parents, author and subject of ``ref`` and its first-parent ancestors.
+
+        One ``git log`` call returns up to ``count`` entries, newest first.
+        """
+        output, return_code = self.run([
+            "git", "log", f"-{count}", "--first-parent",
+            f"--pretty=format:%H{FIELD_SEP}%P{FIELD_SEP}%an{FIELD_SEP}%s{RECORD_SEP}",
+            ref, "--"
+        ])
+        if return_code != 0:
+            return []
+        return self._parse_entries(output)
+
+    def show_entries(self, refs: List[str]) -> List[Dict[str, str]]:
+        """
+        Fetch hash, parents, author and subject of each ref, in the given order, with one call.
+
+        Refs naming the same commit each get an entry, although ``git log``
+        shows the commit once. Returns an empty list if any ref does not
+        resolve to a commit present in the repository.
+        """
+        hashes = [self.resolve(f"{ref}^{{commit}}") for ref in refs]
+        if None in hashes:
+            return []
+        output, return_code = self.run([
+            "git", "log", "--no-walk=unsorted",
+            f"--pretty=format:%H{FIELD_SEP}%P{FIELD_SEP}%an{FIELD_SEP}%s{RECORD_SEP}",
+            *dict.fromkeys(hashes), "--"
+        ])
+        if return_code != 0:
+            return []
+        by_hash = {entry["hash"]: entry for entry in self._parse_entries(output)}
+        if len(by_hash) != len(set(hashes)):
+            return []
+        return [dict(by_hash[commit]) for commit in hashes]
+
+    def merge_base(self, first: str, second: str) -> Optional[str]:
+        """The best common ancestor of two commits, or None if none is present in the repository."""
+        # Exit status 1 with no output just means no common ancestor, so this is not a failure to report
+        command = ["git", "merge-base", first, second]
+        self._spawned()
+        start = self.tracer.now() if self.tracer is not None else 0.0
+        result = subprocess.run(command, capture_output=True, text=True, cwd=self.repo_path)
+        self._traced(command, start, result.returncode)
+        return result.stdout.strip() or None
+
+    def is_shallow(self) -> bool:
+        """Whether the repository is a shallow clone, with history cut off at some commits."""
+        output, return_code = self.run(["git", "rev-parse", "--is-shallow-repository"])
+        return return_code == 0 and output == "true"
+
+    def shallow_boundary(self) -> List[str]:
+        """Commits whose parents were not fetched, as recorded in ``.git/shallow``."""
+        output, return_code = self.run(["git", "rev-parse", "--git-path", "shallow"])
+        if return_code != 0:
+            return []
+        path = os.path.join(self.repo_path or os.getcwd(), output)
+        try:
+            with open(path) as f:
+                return [line.strip() for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def history_depth(self, ref: str = "HEAD") -> int:
+        """Number of first-parent commits present from ``ref`` back to the root or the shallow boundary."""
+        output, return_code = self.run(["git", "rev-list", "--count", "--first-parent", ref, "--"])
+        return int(output) if return_code == 0 and output.isdigit() else 0
+
+    def _parse_entries(self, output: str) -> List[Dict[str, str]]:
+        entries = []
+        for record in output.split(RECORD_SEP):
+            fields = record.strip("\n").split(FIELD_SEP)
+            if len(fields) != 4:
+                continue
+            entries.append({
+                "hash": fields[0],
+                "parents": fields[1],
+                "author": fields[2],
+                "message": fields[3]
+            })
+        return entries
+
+    def iter_range_patches(self, commit_range: str, context_lines: int) -> Iterator[Tuple[Dict[str, str], str]]:
+        """
+        Yield every commit of ``commit_range`` with its patch, oldest first.
+
+        All commits come from a single ``git log -p`` process. Merge commits
+        yield an empty patch.
+
+        Yields:
+            Tuples of (commit metadata, patch text)
+        """
+        command = [
+            "git", "log", "--reverse", "-p", "-M", "-C", f"-U{context_lines}",
+            f"--pretty=format:{RECORD_SEP}%H{FIELD_SEP}%P{FIELD_SEP}%an{FIELD_SEP}%s",
+            commit_range, "--"
+        ]
+        entry: Optional[Dict[str, str]] = None
+        patch: List[str] = []
+        for line in self.iter_lines(command):
+            if line.startswith(RECORD_SEP):
+                if entry is not None:
+                    yield entry, ''.join(patch).strip('\n')
+                fields = line[1:].rstrip('\n').split(FIELD_SEP)
+                entry = {
+                    "hash": fields[0],
+                    "parents": fields[1],
+                    "author": fields[2],
+                    "message": fields[3] if len(fields) > 3 else ""
+                }
+                patch = []
+            elif entry is not None:
+                patch.append(line)
+        if entry is not None:
+            yield entry, ''.join(patch).strip('\n')
+
+    def close(self):
+        """Stop the persistent batch process, if one was started."""
+        with self._lock:
+            if self._batch is not None:
+                self._batch.stdin.close()
+                self._batch.wait()
+                self._batch.stdout.close()
+                self._batch = None
+
+
+def parse_file_records(preamble: str) -> List[Dict]:
+    """
+    Parse the ``--raw --numstat -z`` part of ``git diff`` output into per-file records.
+
+    Returns:
+        One dict per file with ``path``, ``old_path`` (None for added files),
+        ``status`` (A, M, D, R, C or T), ``similarity`` (renames and copies),
+        ``additions``, ``deletions``, ``binary`` and the blob names
+        ``old_oid``/``new_oid``
+    """
+    fields = preamble.split("\0")
+    records: List[Dict] = []
+    index = 0
+    while index < len(fields) and fields[index].startswith(":"):
+        meta = fields[index][1:].split(" ")
+        status = meta[4]
+        if status[0] in "RC":
+            old_path, path = fields[index + 1], fields[index + 2]
+            index += 3
+        else:
+            old_path = path = fields[index + 1]
+            index += 2
+        record = {
+            "path": path,
+            "old_path": None if status[0] == "A" else old_path,
+            "status": status[0],
+            "additions": 0,
+            "deletions": 0,
+            "binary": False,
+            "old_oid": meta[2],
+            "new_oid": meta[3]
+        }
+        if len(status) > 1:
+            record["similarity"] = int(status[1:])
+        records.append(record)
+
+    # --numstat lists the same files in the same order
+    for record in records:
+        if index >= len(fields) or "\t" not in fields[index]:
+            break
+        additions, deletions, path = fields[index].split("\t", 2)
+        index += 3 if path == "" else 1
+        if additions == "-":
+            record["binary"] = True
+        else:
+            record["additions"] = int(additions)
+            record["deletions"] = int(deletions)
+    return records
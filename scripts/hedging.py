@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Hedging
+Hedged endpoint calls, a run deadline and a circuit breaker.
+
+Endpoint latency has a long tail: most reviews return in seconds, a few hang
+until the read timeout. ``HedgedTransport`` wraps a transport and, once a
+call has taken longer than a percentile of the recent successful calls,
+sends the same request again and takes whichever response arrives first;
+the other is closed when it lands. Until enough calls have been seen, a
+fixed delay stands in for the percentile.
+
+A ``Deadline`` bounds the whole run: calls waiting past it are abandoned and
+new calls fail at once with ``DeadlineExceeded``. A ``CircuitBreaker`` opens
+after several consecutive failed calls and rejects further calls with
+``CircuitOpenError`` until a cool-down has passed, when a single probe call
+decides whether it closes again. A 401, 403 or 404 response counts as a
+failed call, as the endpoint cannot serve the run. Both errors are
+``requests`` exceptions, so callers treat them as any failed call; the
+generator can then fall back to a local-only review.
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Deque, Dict, List, Optional
+
+import requests
+
+from http_transport import RETRY_STATUSES
+
+
+# Successful calls needed before their latency percentile replaces the initial hedge delay.
+MIN_LATENCY_SAMPLES = 10
+
+# Recent successful calls the percentile is computed over.
+LATENCY_WINDOW = 200
+
+# Shortest hedge delay, so a burst of fast calls never doubles every request.
+MIN_HEDGE_DELAY = 0.5
+
+# Statuses not worth retrying that still count as failures for the breaker:
+# a bad token, missing access or a wrong URL will not fix itself.
+BREAKER_FAILURE_STATUSES = {401, 403, 404}
+
+
+class DeadlineExceeded(requests.Timeout):
+    """The run's deadline passed before the call completed."""
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """The circuit breaker rejected the call without contacting the endpoint."""
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self):
+        """Raise ``DeadlineExceeded`` once the deadline has passed."""
+        if self.expired():
+            raise DeadlineExceeded(f"Run deadline of {self.seconds:g}s exceeded")
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        """
+        Args:
+            failure_threshold: Consecutive failed calls that open the circuit
+            reset_seconds: Time the circuit stays open before a probe call is let through
+        """
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.trips = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if self.probing or self._cooled_down() else "open"
+
+    def _cooled_down(self) -> bool:
+        return time.monotonic() - self.opened_at >= self.reset_seconds
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; while half-open, only one probe at a time."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self.probing and self._cooled_down():
+                self.probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success: bool):
+        with self._lock:
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                self.probing = False
+                return
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                # A failed probe re-opens the circuit for another cool-down
+                if self.opened_at is None:
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def stats(self) -> Dict:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self.failures,
+                "trips": self.trips,
+                "rejected": self.rejected
+            }
+
+
+class HedgedTransport:
+    def __init__(self, transport, percentile: Optional[float] = 95.0, initial_delay: float = 10.0,
+                 breaker: Optional[CircuitBreaker] = None, deadline: Optional[Deadline] = None):
+        """
+        Args:
+            transport: Transport sending the actual requests (``EndpointTransport``)
+            percentile: Latency percentile after which a call is hedged; None disables hedging
+            initial_delay: Hedge delay used until ``MIN_LATENCY_SAMPLES`` calls have succeeded
+            breaker: Circuit breaker consulted before and fed after every call
+            deadline: Deadline of the run; may be set later, when the run starts
+        """
+        if percentile is not None and not 0 < percentile < 100:
+            raise ValueError("percentile must be between 0 and 100")
+        self.transport = transport
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.breaker = breaker
+        self.deadline = deadline
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return self.transport.url
+
+    @property
+    def requires_token(self) -> bool:
+        return self.transport.requires_token
+
+    @property
+    def retry_count(self) -> int:
+        return self.transport.retry_count
+
+    @property
+    def limiter(self):
+        return getattr(self.transport, "limiter", None)
+
+    @property
+    def tracer(self):
+        return self.transport.tracer
+
+    @tracer.setter
+    def tracer(self, tracer):
+        self.transport.tracer = tracer
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which an unanswered call is duplicated, or None when hedging is off."""
+        if self.percentile is None:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return self.initial_delay
+        rank = min(len(samples) - 1, int(round(self.percentile / 100.0 * (len(samples) - 1))))
+        return max(MIN_HEDGE_DELAY, samples[rank])
+
+    def post(self, body: str, headers: Dict[str, str], stream: bool = False):
+        """
+        POST through the wrapped transport, hedging slow calls within the deadline.
+
+        Returns:
+            The first acceptable response (any status the wrapped transport
+            does not retry), else the last response received
+
+        Raises:
+            DeadlineExceeded: If the deadline passed first
+            CircuitOpenError: If the circuit breaker is open
+            requests.RequestException: If every attempt failed without a response
+        """
+        if self.deadline is not None:
+            self.deadline.check()
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError("Endpoint circuit breaker is open")
+        with self._lock:
+            self.calls += 1
+
+        start = time.monotonic()
+        delay = self.hedge_delay()
+        pending: List[Future] = [self._launch(body, headers, stream)]
+        hedge: Optional[Future] = None
+        hedged_at = start
+        fallback = None
+        error: Optional[BaseException] = None
+
+        while pending:
+            timeout = self.deadline.remaining() if self.deadline is not None else None
+            if hedge is None and delay is not None:
+                until_hedge = max(0.0, delay - (time.monotonic() - start))
+                timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if self.deadline is not None and self.deadline.expired():
+                    self._abandon(pending)
+                    if fallback is not None:
+                        fallback.close()
+                    with self._lock:
+                        self.deadline_exceeded += 1
+                    self._record(False)
+                    raise DeadlineExceeded(f"Run deadline of {self.deadline.seconds:g}s exceeded")
+                print(f"🪁 No response after {delay:.1f}s, sending a hedged request")
+                hedge = self._launch(body, headers, stream)
+                hedged_at = time.monotonic()
+                pending.append(hedge)
+                with self._lock:
+                    self.hedged += 1
+                if self.tracer is not None:
+                    self.tracer.count("http_hedges")
+                continue
+
+            for future in done:
+                pending.remove(future)
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                response = future.result()
+                if response.status_code in RETRY_STATUSES:
+                    # Keep the failure in case the other request fails too
+                    if fallback is not None:
+                        fallback.close()
+                    fallback = response
+                    continue
+                self._abandon(pending)
+                if fallback is not None:
+                    fallback.close()
+                if response.status_code in BREAKER_FAILURE_STATUSES:
+                    # Returned as is, but a quick rejection is neither a success nor a latency sample
+                    self._record(False)
+                    return response
+                # The winner's own duration; a hedge's includes none of the delay before it was sent
+                latency = time.monotonic() - (start if future is not hedge else hedged_at)
+                with self._lock:
+                    self._latencies.append(latency)
+                    if future is hedge:
+                        self.hedge_wins += 1
+                self._record(True)
+                return response
+
+        self._record(False)
+        if fallback is not None:
+            return fallback
+        raise error
+
+    def _launch(self, body: str, headers: Dict[str, str], stream: bool) -> Future:
+        """Send the request on a daemon thread, so an abandoned call never delays exit."""
+        future: Future = Future()
+
+        def run():
+            try:
+                future.set_result(self.transport.post(body, headers, stream=stream))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="hedged-post", daemon=True).start()
+        return future
+
+    @staticmethod
+    def _abandon(futures: List[Future]):
+        """Close the responses of calls that lost the race once they arrive."""
+        def close(future: Future):
+            if future.exception() is None:
+                future.result().close()
+        for future in futures:
+            future.add_done_callback(close)
+
+    def _record(self, success: bool):
+        if self.breaker is not None:
+            self.breaker.record(success)
+
+    def stats(self) -> Dict:
+        delay = self.hedge_delay()
+        with self._lock:
+            stats = {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "deadline_exceeded": self.deadline_exceeded,
+                "hedge_delay_seconds": round(delay, 3) if delay is not None else None,
+                "latency_samples": len(self._latencies)
+            }
+        if self.breaker is not None:
+            stats["circuit_breaker"] = self.breaker.stats()
+        return stats
+
+    def close(self):
+        self.transport.close()
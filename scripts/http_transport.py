@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+HTTP Transport
+Pooled, retrying HTTP client for the model-serving endpoint.
+
+With a tracer attached, every attempt is recorded with its status, payload
+and response sizes, and the request, retry and byte counters are updated.
+Time spent waiting for the limiter, if any, is recorded as queue wait.
+"""
+
+import copy
+import gzip
+import time
+import random
+import threading
+from contextlib import contextmanager, nullcontext
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import SharedRateLimiter
+from tracing import Tracer
+
+
+# Statuses worth retrying: throttling and transient server-side failures.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class EndpointTransport:
+    # Every request reaches the live endpoint, so callers must supply a token.
+    requires_token = True
+
+    def __init__(self, url: str, pool_size: int = 10, connect_timeout: float = 5.0,
+                 read_timeout: float = 30.0, gzip_body: bool = False, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, tracer: Optional[Tracer] = None,
+                 limiter=None):
+        self.url = url
+        self.tracer = tracer
+        # Optional context manager (e.g. a semaphore shared between processes)
+        # held around every attempt to cap concurrent endpoint calls, or a
+        # SharedRateLimiter, which also learns from each attempt's outcome.
+        self.limiter = limiter
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.gzip_body = gzip_body
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_count = 0
+        self._lock = threading.Lock()
+        self._owns_session = True
+
+        # One keep-alive pool shared by every request (and every worker thread).
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, body: str, headers: Dict[str, str], stream: bool = False) -> requests.Response:
+        """
+        POST a JSON body, retrying transient failures.
+
+        Connection errors, timeouts and retryable statuses are retried up to
+        ``max_retries`` times with jittered exponential backoff. A
+        ``Retry-After`` header on the response takes precedence over the
+        computed delay. With ``stream``, the call returns once the headers
+        arrive and the caller reads the body as it comes in.
+
+        Returns:
+            The last response received
+
+        Raises:
+            requests.RequestException: If the final attempt failed without a response
+        """
+        data = body.encode('utf-8')
+        headers = dict(headers)
+        if self.gzip_body:
+            data = gzip.compress(data)
+            headers['Content-Encoding'] = 'gzip'
+        self._count("http_requests")
+
+        attempt = 0
+        while True:
+            start = self.tracer.now() if self.tracer is not None else 0.0
+            self._count("http_attempts")
+            self._count("payload_bytes", len(data))
+            try:
+                with self._slot() as outcome:
+                    response = self.session.post(
+                        self.url,
+                        headers=headers,
+                        data=data,
+                        timeout=(self.connect_timeout, self.read_timeout),
+                        stream=stream
+                    )
+                    outcome["status"] = response.status_code
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._trace_attempt(start, attempt, len(data), error=e.__class__.__name__)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"⚠️  Request failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            else:
+                self._trace_attempt(start, attempt, len(data), response=response, streamed=stream)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                print(f"⚠️  Endpoint returned {response.status_code}, retrying in {delay:.1f}s")
+                response.close()
+
+            attempt += 1
+            with self._lock:
+                self.retry_count += 1
+            self._count("http_retries")
+            time.sleep(delay)
+
+    @contextmanager
+    def _slot(self) -> Iterator[Dict]:
+        """
+        Hold the limiter for one attempt, recording the wait for it as a span.
+
+        Yields a dict that receives the attempt's ``status``, which a
+        ``SharedRateLimiter`` uses to adapt its concurrency limit.
+        """
+        start = self.tracer.now() if self.tracer is not None else 0.0
+        if isinstance(self.limiter, SharedRateLimiter):
+            slot = self.limiter.attempt()
+        else:
+            slot = self.limiter or nullcontext()
+        with slot as outcome:
+            if self.limiter is not None and self.tracer is not None:
+                self.tracer.record("queue_wait", start, self.tracer.now(), "limiter")
+            yield outcome if isinstance(outcome, dict) else {}
+
+    def _count(self, key: str, amount: int = 1):
+        if self.tracer is not None:
+            self.tracer.count(key, amount)
+
+    def _trace_attempt(self, start: float, attempt: int, payload_bytes: int,
+                       response: Optional[requests.Response] = None, error: Optional[str] = None,
+                       streamed: bool = False):
+        """Record one attempt; ``response.content`` is read only when the body is not streamed."""
+        if self.tracer is None:
+            return
+        attributes = {"attempt": attempt, "payload_bytes": payload_bytes}
+        if response is not None:
+            attributes["status"] = response.status_code
+            self.tracer.count_status(response.status_code)
+            if not streamed:
+                attributes["response_bytes"] = len(response.content)
+                self.tracer.count("response_bytes", attributes["response_bytes"])
+        else:
+            attributes["error"] = error
+        self.tracer.record("POST", start, self.tracer.now(), "http", **attributes)
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with jitter in [50%, 100%] of the nominal delay."""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _retry_after(self, response: requests.Response) -> Optional[float]:
+        """Parse a ``Retry-After`` header given in seconds or as an HTTP date."""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(self.backoff_max, max(0.0, delay))
+
+    def shared_view(self) -> "EndpointTransport":
+        """
+        Return a transport that shares this one's connection pool.
+
+        The view has its own tracer and retry counter, so concurrent runs can
+        be measured separately, and closing it leaves the pool open.
+        """
+        view = copy.copy(self)
+        view.tracer = None
+        view.retry_count = 0
+        view._lock = threading.Lock()
+        view._owns_session = False
+        return view
+
+    def close(self):
+        if self._owns_session:
+            self.session.close()
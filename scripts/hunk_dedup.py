@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Hunk Dedup
+Reviews each distinct hunk of a diff once, however many files it appears in.
+
+Codemods and mass refactors repeat the same hunk across many files. Every
+hunk is hashed after normalization (its ``@@`` line numbers dropped and
+trailing whitespace stripped, so the same change at different offsets
+matches); only the first occurrence stays in the diff sent for review, and
+files left without hunks are dropped entirely. The groups of occurrences are
+kept so findings reported for the reviewed copy can be fanned back out to
+every other location, with line numbers shifted by the hunks' offset.
+"""
+
+import re
+import hashlib
+from dataclasses import replace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from diff_packer import HUNK_HEADER_RE, file_path, iter_file_diffs
+from review_parser import Finding
+
+
+# Hunks shorter than this (header excluded) are too generic to stand for each other.
+MIN_DEDUP_LINES = 3
+
+LINE_NUMBER_RE = re.compile(r'\d+')
+
+
+def hunk_key(hunk: List[str]) -> str:
+    """Hash of a hunk's body, independent of where in which file it sits."""
+    digest = hashlib.sha256()
+    for line in hunk[1:]:
+        if line.startswith('\\'):
+            continue
+        digest.update(line.rstrip().encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def hunk_location(path: str, hunk: List[str]) -> Dict:
+    """Path plus the new-side start and length of a hunk."""
+    match = HUNK_HEADER_RE.match(hunk[0].rstrip('\n'))
+    start = int(match.group(3)) if match else 0
+    count = int(match.group(4)) if match and match.group(4) is not None else 1
+    return {"path": path, "start": start, "lines": count}
+
+
+class HunkDeduplicator:
+    def __init__(self, min_lines: int = MIN_DEDUP_LINES):
+        self.min_lines = min_lines
+
+    def dedupe(self, diff_lines: Iterable[str]) -> Tuple[str, Dict]:
+        """
+        Drop repeated hunks from a diff.
+
+        Args:
+            diff_lines: Diff lines
+
+        Returns:
+            Tuple of (diff with each distinct hunk once, dedup report with the
+            ``groups`` of locations sharing a reviewed hunk)
+        """
+        first: Dict[str, Dict] = {}
+        groups: Dict[str, Dict] = {}
+        parts: List[str] = []
+        total = duplicates = saved_bytes = dropped_files = 0
+
+        for header, hunks in iter_file_diffs(diff_lines):
+            path = file_path(header)
+            kept: List[List[str]] = []
+            for hunk in hunks:
+                total += 1
+                if len(hunk) - 1 < self.min_lines:
+                    kept.append(hunk)
+                    continue
+                key = hunk_key(hunk)
+                location = hunk_location(path, hunk)
+                if key not in first:
+                    first[key] = location
+                    kept.append(hunk)
+                    continue
+                duplicates += 1
+                saved_bytes += sum(len(line.encode('utf-8')) for line in hunk)
+                group = groups.setdefault(key, {"reviewed": first[key], "duplicates": []})
+                group["duplicates"].append(location)
+            if hunks and not kept:
+                # Every hunk is reviewed elsewhere; the header alone says nothing
+                dropped_files += 1
+                saved_bytes += sum(len(line.encode('utf-8')) for line in header)
+                continue
+            parts.append(''.join(header))
+            parts.extend(''.join(hunk) for hunk in kept)
+
+        report = {
+            "total_hunks": total,
+            "unique_hunks": total - duplicates,
+            "duplicate_hunks": duplicates,
+            "dropped_files": dropped_files,
+            "bytes_saved": saved_bytes,
+            "groups": list(groups.values())
+        }
+        return ''.join(parts), report
+
+    @staticmethod
+    def fan_out(findings: List[Finding], groups: List[Dict]) -> List[Finding]:
+        """
+        Copy each finding to every location that shares the hunk it points into.
+
+        A finding matches a reviewed hunk when its file is the hunk's path and
+        its first line number falls inside the hunk; each copy gets the
+        duplicate's path, the line shifted by the hunks' offset and
+        ``duplicate_of`` naming the reviewed location.
+
+        Returns:
+            The findings with their copies inserted right after each original
+        """
+        by_path: Dict[str, List[Dict]] = {}
+        for group in groups:
+            by_path.setdefault(group["reviewed"]["path"], []).append(group)
+
+        result: List[Finding] = []
+        for finding in findings:
+            result.append(finding)
+            line = _first_line_number(finding.line)
+            if line is None:
+                continue
+            for group in _groups_for(by_path, finding.file.strip('` ')):
+                reviewed = group["reviewed"]
+                if not reviewed["start"] <= line < reviewed["start"] + max(reviewed["lines"], 1):
+                    continue
+                for duplicate in group["duplicates"]:
+                    shifted = line - reviewed["start"] + duplicate["start"]
+                    result.append(replace(
+                        finding,
+                        file=duplicate["path"],
+                        line=LINE_NUMBER_RE.sub(lambda m: str(int(m.group(0)) - line + shifted), finding.line),
+                        recommendations=list(finding.recommendations),
+                        duplicate_of=f"{reviewed['path']}:{line}"
+                    ))
+        return result
+
+
+def _groups_for(by_path: Dict[str, List[Dict]], file: str) -> List[Dict]:
+    """Groups reviewed in ``file``; reviews often name a path relative to a subdirectory."""
+    if not file:
+        return []
+    if file in by_path:
+        return by_path[file]
+    return [group for path, path_groups in by_path.items() if path.endswith('/' + file) for group in path_groups]
+
+
+def _first_line_number(text: str) -> Optional[int]:
+    match = LINE_NUMBER_RE.search(text or "")
+    return int(match.group(0)) if match else None
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Mock Endpoint
+Local stand-in for the SecureGuard model-serving endpoint.
+
+Answers every ``dataframe_split`` request with a canned review after a
+configurable delay, padded with findings to a configurable response size.
+Multi-row requests get one prediction per row, and chat-format requests with
+``"stream": true`` get the review as server-sent events, a line per event,
+spread over the latency; with a stream cutoff the connection is dropped
+after that many events, as a failing endpoint would. With a capacity set, requests
+beyond that many in flight are answered 429 at once, like an overloaded
+serving endpoint. Used by the benchmark suite and handy for running the diff
+generator offline::
+
+    python scripts/mock_endpoint.py --port 8080 --latency 0.5
+    python scripts/generate_diff.py --endpoint-url http://127.0.0.1:8080/invocations
+"""
+
+import gzip
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+FINDING_TEMPLATE = """## 🔴 High SQL Injection {index}
+
+### **Location:**
+- **File:** `app/db.py`
+- **Line:** {line}
+- **Function/Method:** `find_user`
+
+### **Vulnerability Description:**
+User input is interpolated into a SQL statement without parameterization.
+
+### **CWE Reference:**
+- **CWE-ID:** CWE-89
+
+### **Vulnerable Code:**
+```python
+cursor.execute(f"SELECT * FROM users WHERE name = '{{name}}'")
+```
+
+### **Secure Code:**
+```python
+cursor.execute("SELECT * FROM users WHERE name = %s", (name,))
+```
+
+### **Recommendations:**
+1. Use parameterized queries
+"""
+
+
+def build_review(response_bytes: int) -> str:
+    """Build a review with as many findings as needed to reach ``response_bytes``."""
+    findings: List[str] = []
+    size = 0
+    while not findings or size < response_bytes:
+        finding = FINDING_TEMPLATE.format(index=len(findings) + 1, line=10 + len(findings))
+        findings.append(finding)
+        size += len(finding.encode('utf-8'))
+    return '\n'.join(findings)
+
+
+class MockEndpoint:
+    def __init__(self, port: int = 0, latency: float = 0.0, response_bytes: int = 2000,
+                 host: str = "127.0.0.1", capacity: Optional[int] = None,
+                 stream_cutoff: Optional[int] = None):
+        self.latency = latency
+        self.capacity = capacity
+        self.stream_cutoff = stream_cutoff
+        self.review = build_review(response_bytes)
+        self.request_count = 0
+        self.bytes_received = 0
+        self.throttled_count = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/invocations"
+
+    def _handler(self):
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                endpoint._count(len(body))
+                request = json.loads(body)
+                rows = request.get('dataframe_split', {}).get('data', [])
+
+                if not endpoint._enter():
+                    out = b'{"error_code": "REQUEST_LIMIT_EXCEEDED"}'
+                    self.send_response(429)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(out)))
+                    self.end_headers()
+                    self.wfile.write(out)
+                    return
+                try:
+                    if request.get('stream'):
+                        self._stream_review()
+                        return
+                    if endpoint.latency:
+                        time.sleep(endpoint.latency)
+                finally:
+                    endpoint._leave()
+
+                out = json.dumps(endpoint.respond(len(rows))).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def _stream_review(self):
+                """
+                Send the review as chat-agent delta events, one HTTP chunk each.
+
+                The connection closes after ``[DONE]``, or without the final
+                chunk once ``stream_cutoff`` events have been sent.
+                """
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+                pieces = endpoint.review.splitlines(keepends=True)
+                for index, piece in enumerate(pieces):
+                    if endpoint.stream_cutoff is not None and index >= endpoint.stream_cutoff:
+                        return
+                    if endpoint.latency:
+                        time.sleep(endpoint.latency / len(pieces))
+                    event = {'delta': {'role': 'assistant', 'content': piece}}
+                    self._chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+
+            def _chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def _count(self, size: int):
+        with self._lock:
+            self.request_count += 1
+            self.bytes_received += size
+
+    def _enter(self) -> bool:
+        """Admit a request unless ``capacity`` requests are already in flight."""
+        with self._lock:
+            if self.capacity is not None and self.in_flight >= self.capacity:
+                self.throttled_count += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def respond(self, rows: int) -> Dict:
+        """Response for a request with ``rows`` dataframe rows."""
+        message = {'messages': [{'role': 'assistant', 'content': self.review}]}
+        if rows > 1:
+            return {'predictions': [message] * rows}
+        return message
+
+    def start(self) -> "MockEndpoint":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve canned SecureGuard reviews locally")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering (default: 0)")
+    parser.add_argument("--response-bytes", type=int, default=2000, help="Approximate review size (default: 2000)")
+    parser.add_argument("--capacity", type=int, default=None,
+                        help="Requests served at once; more get a 429 (default: unlimited)")
+    parser.add_argument("--stream-cutoff", type=int, default=None,
+                        help="Drop streamed responses after this many events (default: never)")
+    args = parser.parse_args()
+
+    endpoint = MockEndpoint(args.port, args.latency, args.response_bytes, capacity=args.capacity,
+                            stream_cutoff=args.stream_cutoff)
+    print(f"🧪 Mock endpoint listening on {endpoint.url}")
+    try:
+        endpoint.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        endpoint.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter
+Host-wide limit on endpoint calls, shared by every process through SQLite.
+
+All processes using the same database file and endpoint share one token
+bucket (an optional requests-per-second cap) and one concurrency limit.
+Each call holds a lease row while in flight; leases of processes that died
+are reclaimed, so a crashed job never leaks capacity.
+
+The concurrency limit adapts AIMD-style, as TCP congestion control does: a
+successful call adds ``1/limit`` (about one slot per round of calls), while
+a 429/503/504, a failed call or a latency far above the baseline halves it
+(or cuts it by a fifth for latency), at most once per cooldown. Many CI jobs
+starting at once therefore converge on what the endpoint can serve instead
+of overloading it, backing off and idling in turns.
+"""
+
+import os
+import time
+import random
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+
+DEFAULT_DB_PATH = os.path.join(tempfile.gettempdir(), "secureguard_rate_limit.sqlite")
+
+# Statuses that mean the endpoint is overloaded.
+THROTTLE_STATUSES = {429, 503, 504}
+
+# Multiplicative decrease on throttling or errors, and on excess latency.
+THROTTLE_DECREASE = 0.5
+LATENCY_DECREASE = 0.8
+
+# Latency above this multiple of the baseline counts as congestion.
+LATENCY_TOLERANCE = 3.0
+
+# Per-sample drift that lets the baseline latency rise when the endpoint gets slower for good.
+LATENCY_DRIFT = 0.02
+
+# Longest sleep between attempts to get a slot.
+POLL_INTERVAL = 0.05
+
+# Leases older than this are reclaimed even if their process still runs.
+LEASE_TIMEOUT = 600.0
+
+
+class SharedRateLimiter:
+    def __init__(self, key: str, path: str = DEFAULT_DB_PATH, max_concurrency: int = 8,
+                 min_concurrency: int = 1, requests_per_second: Optional[float] = None,
+                 burst: Optional[float] = None, target_latency: Optional[float] = None):
+        """
+        Args:
+            key: Name of the shared limit, normally the endpoint URL
+            path: SQLite database shared by the cooperating processes
+            max_concurrency: Upper bound of the adaptive concurrency limit (and its start value)
+            min_concurrency: Lower bound of the adaptive concurrency limit
+            requests_per_second: Token bucket refill rate; None for no rate cap
+            burst: Token bucket capacity (default: one second of requests, at least 1)
+            target_latency: Latency in seconds above which calls count as congested;
+                None to use a multiple of the lowest latency observed
+        """
+        if min_concurrency < 1 or max_concurrency < min_concurrency:
+            raise ValueError("Concurrency bounds must satisfy 1 <= min_concurrency <= max_concurrency")
+        if requests_per_second is not None and requests_per_second <= 0:
+            raise ValueError("requests_per_second must be positive")
+        self.key = key
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = burst if burst is not None else max(1.0, requests_per_second or 1.0)
+        self.target_latency = target_latency
+        self.acquired = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._lock = threading.Lock()
+        # Transactions are managed explicitly, with BEGIN IMMEDIATE serializing the processes
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " key TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " refilled_at REAL NOT NULL,"
+            " concurrency REAL NOT NULL,"
+            " base_latency REAL,"
+            " decreased_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " key TEXT NOT NULL,"
+            " pid INTEGER NOT NULL,"
+            " acquired_at REAL NOT NULL)"
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _bucket(self, conn: sqlite3.Connection, now: float) -> Tuple[float, float, float, Optional[float], float]:
+        conn.execute(
+            "INSERT OR IGNORE INTO buckets (key, tokens, refilled_at, concurrency, base_latency, decreased_at) "
+            "VALUES (?, ?, ?, ?, NULL, 0)",
+            (self.key, self.burst, now, float(self.max_concurrency))
+        )
+        return conn.execute(
+            "SELECT tokens, refilled_at, concurrency, base_latency, decreased_at FROM buckets WHERE key = ?",
+            (self.key,)
+        ).fetchone()
+
+    def _live_leases(self, conn: sqlite3.Connection, now: float) -> int:
+        """Count the leases in flight, reclaiming those of dead processes or past ``LEASE_TIMEOUT``."""
+        live = 0
+        for lease_id, pid, acquired_at in conn.execute(
+                "SELECT id, pid, acquired_at FROM leases WHERE key = ?", (self.key,)).fetchall():
+            if now - acquired_at > LEASE_TIMEOUT or not _process_alive(pid):
+                conn.execute("DELETE FROM leases WHERE id = ?", (lease_id,))
+            else:
+                live += 1
+        return live
+
+    def _try_acquire(self) -> Tuple[Optional[int], float]:
+        """
+        Take a slot if the concurrency limit and the token bucket allow it.
+
+        Returns:
+            Tuple of (lease id or None, seconds to wait before trying again)
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            tokens, refilled_at, concurrency, _, _ = self._bucket(conn, now)
+            if self.requests_per_second is not None:
+                tokens = min(self.burst, tokens + (now - refilled_at) * self.requests_per_second)
+            if self._live_leases(conn, now) >= int(concurrency):
+                return None, POLL_INTERVAL
+            if self.requests_per_second is not None and tokens < 1.0:
+                conn.execute("UPDATE buckets SET tokens = ?, refilled_at = ? WHERE key = ?", (tokens, now, self.key))
+                return None, min(POLL_INTERVAL, (1.0 - tokens) / self.requests_per_second)
+            if self.requests_per_second is not None:
+                tokens -= 1.0
+            conn.execute("UPDATE buckets SET tokens = ?, refilled_at = ? WHERE key = ?", (tokens, now, self.key))
+            cursor = conn.execute("INSERT INTO leases (key, pid, acquired_at) VALUES (?, ?, ?)",
+                                  (self.key, os.getpid(), now))
+            return cursor.lastrowid, 0.0
+
+    def acquire(self) -> int:
+        """
+        Wait for a slot.
+
+        Returns:
+            The lease id to pass to ``release``
+        """
+        start = time.perf_counter()
+        while True:
+            lease, delay = self._try_acquire()
+            if lease is not None:
+                break
+            # Jitter keeps the waiting processes from polling in lockstep
+            time.sleep(delay * random.uniform(0.5, 1.0))
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.acquired += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return lease
+
+    def release(self, lease: int, latency: float, status: Optional[int] = None):
+        """
+        Return a slot and feed the call's outcome into the concurrency limit.
+
+        Args:
+            lease: Lease id from ``acquire``
+            latency: Duration of the call in seconds
+            status: HTTP status, or None if the call failed without a response
+        """
+        now = time.time()
+        congested = status is None or status in THROTTLE_STATUSES
+        if congested:
+            with self._lock:
+                self.throttled += 1
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE id = ?", (lease,))
+            _, _, concurrency, base_latency, decreased_at = self._bucket(conn, now)
+            target = self.target_latency
+            if target is None and base_latency is not None:
+                target = base_latency * LATENCY_TOLERANCE
+            slow = not congested and target is not None and latency > target
+
+            if congested or slow:
+                # One decrease per round trip, not one per call caught in the same overload
+                cooldown = base_latency if base_latency is not None else latency
+                if now - decreased_at >= cooldown:
+                    factor = THROTTLE_DECREASE if congested else LATENCY_DECREASE
+                    concurrency = max(float(self.min_concurrency), concurrency * factor)
+                    decreased_at = now
+            elif status < 500:
+                concurrency = min(float(self.max_concurrency), concurrency + 1.0 / concurrency)
+
+            if not congested and status < 500:
+                if base_latency is None:
+                    base_latency = latency
+                else:
+                    base_latency = min(latency, base_latency * (1.0 + LATENCY_DRIFT))
+            conn.execute(
+                "UPDATE buckets SET concurrency = ?, base_latency = ?, decreased_at = ? WHERE key = ?",
+                (concurrency, base_latency, decreased_at, self.key)
+            )
+
+    @contextmanager
+    def attempt(self) -> Iterator[Dict]:
+        """
+        Hold a slot for one call.
+
+        Yields a dict in which the caller sets ``status`` once the response
+        arrives; a call that raises, or never sets it, counts as failed.
+        """
+        lease = self.acquire()
+        outcome: Dict = {}
+        start = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            self.release(lease, time.perf_counter() - start, outcome.get("status"))
+
+    def stats(self) -> Dict:
+        """Counters of this process plus the current shared limit."""
+        with self._lock:
+            row = self._conn.execute("SELECT concurrency FROM buckets WHERE key = ?", (self.key,)).fetchone()
+            return {
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "wait_seconds": round(self.wait_seconds, 6),
+                "max_wait_seconds": round(self.max_wait_seconds, 6),
+                "concurrency_limit": round(row[0], 2) if row else float(self.max_concurrency)
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Response Recorder
+Record endpoint responses to disk and replay them without the network.
+
+Every request body is fingerprinted (SHA-256 of the exact JSON sent), and
+successful responses are stored as ``<fingerprint>.json`` in the record
+directory. In replay mode a request whose fingerprint has a recording is
+answered from disk instantly, without a token or a connection; a request
+without one gets a 404 response, or goes to the live endpoint (and is
+recorded) when a record directory is configured too.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from tracing import Tracer
+
+
+class RecordedResponse:
+    """Minimal stand-in for ``requests.Response`` built from a recording."""
+
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+
+    @property
+    def content(self) -> bytes:
+        return self.text.encode('utf-8')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def close(self):
+        pass
+
+
+class RecordReplayTransport:
+    def __init__(self, transport=None, record_dir: Optional[str] = None, replay_dir: Optional[str] = None):
+        """
+        Args:
+            transport: Live transport (``EndpointTransport``); needed unless replaying only
+            record_dir: Directory that receives responses from the live transport
+            replay_dir: Directory of recordings served instead of calling the endpoint
+        """
+        if transport is None and record_dir:
+            raise ValueError("Recording requires a live transport")
+        self.transport = transport
+        self.record_dir = Path(record_dir) if record_dir else None
+        self.replay_dir = Path(replay_dir) if replay_dir else None
+        if self.record_dir is not None:
+            self.record_dir.mkdir(parents=True, exist_ok=True)
+        self.replayed = 0
+        self.recorded = 0
+        self.missed = 0
+        self._tracer: Optional[Tracer] = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        if self.transport is not None:
+            return self.transport.url
+        return f"replay://{self.replay_dir}"
+
+    @property
+    def requires_token(self) -> bool:
+        """A token is only needed when requests can reach the live endpoint."""
+        return self.replay_dir is None or self.record_dir is not None
+
+    @property
+    def retry_count(self) -> int:
+        return self.transport.retry_count if self.transport is not None else 0
+
+    @property
+    def tracer(self) -> Optional[Tracer]:
+        return self._tracer
+
+    @tracer.setter
+    def tracer(self, tracer: Optional[Tracer]):
+        self._tracer = tracer
+        if self.transport is not None and self.transport.tracer is None:
+            self.transport.tracer = tracer
+
+    @staticmethod
+    def fingerprint(body: str) -> str:
+        """Fingerprint of a request body; headers (and so the token) are not part of it."""
+        return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+    def post(self, body: str, headers: Dict[str, str], stream: bool = False):
+        """
+        Answer from a recording when replaying, otherwise POST through the live transport.
+
+        A streamed live response that is recorded is read whole first, so it
+        reaches the caller at once rather than as it arrives.
+
+        Returns:
+            A ``RecordedResponse`` for replayed or missing recordings, else the live response
+        """
+        key = self.fingerprint(body)
+
+        if self.replay_dir is not None:
+            recording = self._load(key)
+            if recording is not None:
+                self._bump("replayed")
+                if self._tracer is not None:
+                    self._tracer.count("replayed_responses")
+                return RecordedResponse(recording["status"], recording["body"])
+            self._bump("missed")
+            if self.record_dir is None:
+                print(f"⚠️  No recorded response for request {key[:12]}")
+                return RecordedResponse(404, f"No recorded response for request {key}")
+
+        response = self.transport.post(body, headers, stream=stream)
+        if self.record_dir is not None and response.status_code == 200:
+            self._save(key, body, response)
+            self._bump("recorded")
+        return response
+
+    def _bump(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _load(self, key: str) -> Optional[Dict]:
+        path = self.replay_dir / f"{key}.json"
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save(self, key: str, body: str, response):
+        """Write the recording atomically, so concurrent runs never see a partial file."""
+        recording = {
+            "fingerprint": key,
+            "url": self.transport.url,
+            "recorded_at": datetime.now().isoformat(),
+            "request_bytes": len(body.encode('utf-8')),
+            "status": response.status_code,
+            "body": response.text
+        }
+        fd, temp_path = tempfile.mkstemp(dir=self.record_dir, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(recording, f, ensure_ascii=False)
+        os.replace(temp_path, self.record_dir / f"{key}.json")
+
+    def stats(self) -> Dict[str, int]:
+        return {"replayed": self.replayed, "recorded": self.recorded, "missed": self.missed}
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Review Cache
+Content-addressed on-disk cache of AI reviews, keyed by normalized diff hunks.
+"""
+
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# Hunk headers carry line numbers that shift on every rebase; the body does not.
+HUNK_HEADER_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@')
+
+
+class ReviewCache:
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: int = 7 * 24 * 3600):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reviews ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS reviews_accessed_at ON reviews (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_unit(unit: str) -> str:
+        """
+        Normalize a diff unit so that re-runs and rebases hash identically.
+
+        Drops ``index`` lines (blob hashes), strips line numbers from hunk
+        headers and trailing whitespace from every line.
+        """
+        normalized = []
+        for line in unit.splitlines():
+            if line.startswith('index '):
+                continue
+            line = HUNK_HEADER_RE.sub('@@ @@', line)
+            normalized.append(line.rstrip())
+        return '\n'.join(normalized)
+
+    def make_key(self, unit: str, identity: str) -> str:
+        """Build a cache key from a diff unit and the prompt/endpoint identity."""
+        digest = hashlib.sha256()
+        digest.update(identity.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(self.normalize_unit(unit).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached review for a key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM reviews WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM reviews WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE reviews SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, review: Dict):
+        """Store a review and evict least recently used entries beyond ``max_bytes``."""
+        response = json.dumps(review, ensure_ascii=False)
+        size = len(response.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reviews (key, response, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used ones until under the size limit."""
+        self._conn.execute("DELETE FROM reviews WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM reviews").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM reviews ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM reviews WHERE key = ?", evicted)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counts for this run."""
+        return {"cache_hits": self.hits, "cache_misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Review Daemon
+Long-running review server that keeps the diff generator's machinery warm.
+
+Jobs (repository path plus base/head or a commit range) are accepted over a
+local HTTP API, on a TCP port or a Unix socket, and queued in a bounded
+queue. A pool of worker threads runs them with one shared keep-alive
+connection pool to the endpoint, one in-memory review cache and one compiled
+prefilter, so a review costs neither interpreter startup nor a TLS handshake.
+
+API::
+
+    POST /jobs        {"repo": "/path", "base": "...", "head": "...", "range": "A..B",
+                       "output_dir": "...", "wait": false}
+                      -> 202 with the job, 429 when the queue is full
+    GET  /jobs/<id>   -> the job: status, queue and run seconds, findings, report path
+    GET  /status      -> queue depth, workers, counters and per-job latency
+
+Example::
+
+    python scripts/review_daemon.py --unix-socket /tmp/review.sock --workers 8
+    curl --unix-socket /tmp/review.sock -d '{"repo": "'$PWD'", "wait": true}' http://localhost/jobs
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import socket
+import argparse
+import threading
+import statistics
+import socketserver
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from generate_diff import DATABRICKS_ENDPOINT_URL, DiffGenerator
+from http_transport import EndpointTransport
+from review_cache import ReviewCache
+from security_prefilter import SecurityPrefilter
+
+
+# Finished jobs kept for GET /jobs/<id>; older ones are forgotten.
+MAX_JOB_HISTORY = 1000
+
+# Recent jobs whose latency is listed in /status.
+RECENT_JOBS = 50
+
+
+@dataclass
+class ReviewJob:
+    id: str
+    repo: str
+    base: Optional[str] = None
+    head: Optional[str] = None
+    commit_range: Optional[str] = None
+    output_dir: Optional[str] = None
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    ai_review: bool = False
+    findings: int = 0
+    report: Optional[str] = None
+    error: Optional[str] = None
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def queue_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return round(self.started_at - self.submitted_at, 6)
+
+    @property
+    def run_seconds(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return round(self.finished_at - self.started_at, 6)
+
+    def to_dict(self) -> Dict:
+        data = {item.name: getattr(self, item.name) for item in fields(self) if item.name != "done"}
+        data["queue_seconds"] = self.queue_seconds
+        data["run_seconds"] = self.run_seconds
+        return data
+
+
+class ReviewDaemon:
+    def __init__(self, transport: EndpointTransport, workers: int = 4, queue_size: int = 64,
+                 cache: Optional[ReviewCache] = None, prefilter: Optional[SecurityPrefilter] = None,
+                 generator_options: Optional[Dict] = None):
+        """
+        Args:
+            transport: Endpoint transport whose connection pool every job shares
+            workers: Jobs run concurrently
+            queue_size: Jobs waiting beyond the running ones before submissions are rejected
+            cache: Review cache shared by every job
+            prefilter: Prefilter shared by every job
+            generator_options: Further ``DiffGenerator`` keyword arguments (context_lines, chunked...)
+        """
+        self.transport = transport
+        self.cache = cache
+        self.prefilter = prefilter
+        self.generator_options = generator_options or {}
+        self.workers = workers
+        self.started_at = time.time()
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._queue: "queue.Queue[Optional[ReviewJob]]" = queue.Queue(maxsize=queue_size)
+        self._jobs: "OrderedDict[str, ReviewJob]" = OrderedDict()
+        self._recent: deque = deque(maxlen=RECENT_JOBS)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"review-worker-{index}", daemon=True)
+            for index in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, spec: Dict) -> ReviewJob:
+        """
+        Validate a job request and queue it.
+
+        Raises:
+            ValueError: If the request is invalid
+            queue.Full: If the queue is full
+        """
+        if not isinstance(spec, dict):
+            raise ValueError("Job request must be a JSON object")
+        repo = spec.get("repo")
+        if not repo or not os.path.exists(os.path.join(repo, ".git")):
+            raise ValueError(f"Not a git repository: {repo}")
+        commit_range = spec.get("range")
+        if commit_range and (spec.get("base") or spec.get("head")):
+            raise ValueError("'range' cannot be combined with 'base'/'head'")
+        if commit_range and ('...' in commit_range or '..' not in commit_range):
+            raise ValueError("'range' must have the form BASE..HEAD")
+
+        job = ReviewJob(
+            id=uuid.uuid4().hex[:12],
+            repo=os.path.abspath(repo),
+            base=spec.get("base"),
+            head=spec.get("head"),
+            commit_range=commit_range,
+            output_dir=spec.get("output_dir")
+        )
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise
+        with self._lock:
+            self.counters["submitted"] += 1
+            self._jobs[job.id] = job
+            while len(self._jobs) > MAX_JOB_HISTORY:
+                self._jobs.popitem(last=False)
+        return job
+
+    def job(self, job_id: str) -> Optional[ReviewJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self._active += 1
+            try:
+                self._run(job)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._recent.append(job)
+                job.done.set()
+
+    def _run(self, job: ReviewJob):
+        job.status = "running"
+        job.started_at = time.time()
+        print(f"🧵 Job {job.id}: reviewing {job.repo}")
+
+        output_dir = job.output_dir or os.path.join(job.repo, "diff_output")
+        generator = None
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            generator = DiffGenerator(
+                output_dir=output_dir,
+                transport=self.transport.shared_view(),
+                cache=self.cache,
+                prefilter=self.prefilter,
+                base=job.base,
+                head=job.head,
+                commit_range=job.commit_range,
+                repo_path=job.repo,
+                **self.generator_options
+            )
+            report = generator.generate()
+            job.ai_review = "ai_review" in report
+            job.findings = len(report.get("findings", []))
+            job.report = os.path.join(output_dir, "diff_report.json")
+            job.status = "done"
+            with self._lock:
+                self.counters["completed"] += 1
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"❌ Job {job.id} failed: {e}")
+            with self._lock:
+                self.counters["failed"] += 1
+        finally:
+            if generator is not None:
+                generator.close()
+            job.finished_at = time.time()
+
+        print(f"✅ Job {job.id}: {job.status} in {job.run_seconds:.2f}s")
+
+    def status(self) -> Dict:
+        """Queue depth, worker usage, counters and latency of recent jobs."""
+        with self._lock:
+            recent = list(self._recent)
+            counters = dict(self.counters)
+            active = self._active
+        run_times = [job.run_seconds for job in recent if job.run_seconds is not None]
+        queue_times = [job.queue_seconds for job in recent if job.queue_seconds is not None]
+
+        def percentile(values: List[float], fraction: float) -> Optional[float]:
+            if not values:
+                return None
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 6)
+
+        status = {
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "workers": self.workers,
+            "active_jobs": active,
+            "counters": counters,
+            "latency": {
+                "run_seconds_p50": round(statistics.median(run_times), 6) if run_times else None,
+                "run_seconds_p95": percentile(run_times, 0.95),
+                "queue_seconds_p50": round(statistics.median(queue_times), 6) if queue_times else None,
+                "queue_seconds_p95": percentile(queue_times, 0.95)
+            },
+            "recent_jobs": [
+                {
+                    "id": job.id,
+                    "repo": job.repo,
+                    "status": job.status,
+                    "queue_seconds": job.queue_seconds,
+                    "run_seconds": job.run_seconds
+                }
+                for job in recent
+            ]
+        }
+        if self.cache is not None:
+            status["cache"] = self.cache.stats()
+        return status
+
+    def shutdown(self):
+        """Finish queued jobs, stop the workers and release shared resources."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self.transport.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+def make_handler(daemon: ReviewDaemon):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/status":
+                self._reply(200, daemon.status())
+            elif self.path.startswith("/jobs/"):
+                job = daemon.job(self.path[len("/jobs/"):])
+                if job is None:
+                    self._reply(404, {"error": "Unknown job"})
+                else:
+                    self._reply(200, job.to_dict())
+            else:
+                self._reply(404, {"error": "Not found"})
+
+        def do_POST(self):
+            if self.path != "/jobs":
+                self._reply(404, {"error": "Not found"})
+                return
+            try:
+                spec = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                job = daemon.submit(spec)
+            except (ValueError, json.JSONDecodeError) as e:
+                self._reply(400, {"error": str(e)})
+                return
+            except queue.Full:
+                self._reply(429, {"error": "Job queue is full"}, {"Retry-After": "1"})
+                return
+
+            if spec.get("wait"):
+                job.done.wait()
+                self._reply(200, job.to_dict())
+            else:
+                self._reply(202, job.to_dict())
+
+    return Handler
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        socketserver.TCPServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve code reviews from a warm, long-running process")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--unix-socket", type=str, default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=4, help="Jobs run concurrently (default: 4)")
+    parser.add_argument("--queue-size", type=int, default=64, help="Queued jobs before submissions are rejected (default: 64)")
+    parser.add_argument("--context-lines", "-c", type=int, default=10, help="Number of context lines (default: 10)")
+    parser.add_argument("--chunked", action="store_true", help="Review diffs in concurrent chunks")
+    parser.add_argument("--max-chunk-bytes", type=int, default=200_000, help="Maximum size of a review chunk (default: 200000)")
+    parser.add_argument("--max-workers", type=int, default=4, help="Concurrent chunk requests per job (default: 4)")
+    parser.add_argument(
+        "--endpoint-url",
+        type=str,
+        default=os.environ.get('DATABRICKS_ENDPOINT_URL', DATABRICKS_ENDPOINT_URL),
+        help="Model serving endpoint URL (default: $DATABRICKS_ENDPOINT_URL or the SecureGuard endpoint)"
+    )
+    parser.add_argument("--pool-size", type=int, default=16, help="Pooled keep-alive connections shared by all jobs (default: 16)")
+    parser.add_argument("--read-timeout", type=float, default=30.0, help="Endpoint read timeout in seconds (default: 30)")
+    parser.add_argument("--max-retries", type=int, default=3, help="Retries for transient endpoint failures (default: 3)")
+    parser.add_argument("--gzip", action="store_true", help="Send gzip-compressed request bodies")
+    parser.add_argument(
+        "--cache-path",
+        type=str,
+        default=":memory:",
+        help="Review cache shared by all jobs (default: in memory)"
+    )
+    parser.add_argument("--cache-max-bytes", type=int, default=64 * 1024 * 1024, help="Review cache size limit (default: 64 MiB)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not cache reviews between jobs")
+    parser.add_argument("--prefilter", choices=["off", "report", "flagged", "gate"], default="off",
+                        help="Local pattern scan mode applied to every job (default: off)")
+    parser.add_argument("--prefilter-rules", type=str, default=None, help="JSON file with extra prefilter rules")
+    args = parser.parse_args()
+
+    if args.workers <= 0 or args.queue_size <= 0:
+        print("❌ --workers and --queue-size must be positive")
+        sys.exit(1)
+
+    transport = EndpointTransport(
+        args.endpoint_url,
+        pool_size=args.pool_size,
+        read_timeout=args.read_timeout,
+        gzip_body=args.gzip,
+        max_retries=args.max_retries
+    )
+    cache = None if args.no_cache else ReviewCache(args.cache_path, args.cache_max_bytes)
+    prefilter = None
+    if args.prefilter != "off":
+        prefilter = SecurityPrefilter.from_catalog(extra_rules_path=args.prefilter_rules)
+
+    daemon = ReviewDaemon(
+        transport,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        cache=cache,
+        prefilter=prefilter,
+        generator_options={
+            "context_lines": args.context_lines,
+            "chunked": args.chunked,
+            "max_chunk_bytes": args.max_chunk_bytes,
+            "max_workers": args.max_workers,
+            "prefilter_mode": args.prefilter
+        }
+    )
+
+    if args.unix_socket:
+        if os.path.exists(args.unix_socket):
+            os.unlink(args.unix_socket)
+        server = UnixHTTPServer(args.unix_socket, make_handler(daemon))
+        print(f"🛰️  Review daemon listening on {args.unix_socket}")
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(daemon))
+        print(f"🛰️  Review daemon listening on http://{args.host}:{server.server_address[1]}")
+    server.daemon_threads = True
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Shutting down, finishing queued jobs...")
+    finally:
+        server.server_close()
+        daemon.shutdown()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.unlink(args.unix_socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Review Parser
+Single-pass parser for SecureGuard review responses.
+
+Understands both layouts described in ``system_prompts/``: the long form with
+``### **Section:**`` headings and bullet fields, and the concise form with
+inline ``**Section**: value`` lines. Every ``## `` heading starts a new finding,
+so responses with many findings (or merged chunk reviews) keep all of them.
+"""
+
+import re
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+
+SEVERITIES = ("Critical", "High", "Medium", "Low", "Info")
+
+SECTION_HEADING_RE = re.compile(r'^#{3,}\s*(?:\*\*)?\s*([^*:]+?)\s*:?\s*(?:\*\*)?\s*:?\s*$')
+INLINE_SECTION_RE = re.compile(r'^\*\*([^*]+?)(?::\*\*|\*\*\s*:)\s*(.*)$')
+SEVERITY_PREFIX_RE = re.compile(r'^\[?(' + '|'.join(SEVERITIES) + r')\]?\s+', re.IGNORECASE)
+KEY_RE = re.compile(r'\*{0,2}\b(File|Line|Function/Method|Function|CWE-ID|Severity)\b\*{0,2}\s*:\s*\*{0,2}\s*')
+CWE_RE = re.compile(r'CWE-\d+')
+LIST_ITEM_RE = re.compile(r'^(?:[-*]|\d+[.)])\s+')
+RULE_RE = re.compile(r'^(?:-{3,}|\*{3,}|_{3,})$')
+
+# Section names as they appear in the prompts, mapped to the field they fill.
+SECTION_ALIASES = {
+    "location": "location",
+    "vulnerability description": "description",
+    "description": "description",
+    "cwe reference": "cwe",
+    "cwe": "cwe",
+    "risk assessment": "risk",
+    "risk": "risk",
+    "vulnerable code": "vulnerable_code",
+    "secure code": "secure_code",
+    "recommendations": "recommendations",
+    "additional recommendations": "recommendations",
+}
+
+# Sections whose lines may carry ``Key: value`` fields.
+FIELD_SECTIONS = {None, "location", "cwe", "risk"}
+
+# ``**Key**: value`` names that are fields of the current section, not sections of their own.
+FIELD_NAMES = {"file", "line", "function", "function/method", "cwe-id", "severity"}
+
+
+@dataclass
+class Finding:
+    title: str
+    severity: str = ""
+    cwe: str = ""
+    file: str = ""
+    line: str = ""
+    function: str = ""
+    description: str = ""
+    vulnerable_code: str = ""
+    vulnerable_code_language: str = ""
+    secure_code: str = ""
+    secure_code_language: str = ""
+    recommendations: List[str] = field(default_factory=list)
+    # "path:line" of the reviewed copy when this finding was fanned out to a duplicate hunk
+    duplicate_of: str = ""
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class ReviewParser:
+    """
+    Incremental line-oriented parser producing ``Finding`` records.
+
+    Feed lines with ``feed`` (or a whole text with ``feed_text``) and call
+    ``close`` to flush the last finding. Each line is looked at once, so the
+    cost is linear in the size of the response.
+    """
+
+    def __init__(self):
+        self.findings: List[Finding] = []
+        self.clean = False
+        self._current: Optional[Finding] = None
+        self._section: Optional[str] = None
+        self._description: List[str] = []
+        self._in_code = False
+        self._code_language = ""
+        self._code_lines: List[str] = []
+
+    def feed_text(self, text: str) -> List[Finding]:
+        """Feed a block of text; returns findings completed by it."""
+        completed = []
+        for line in text.splitlines():
+            completed.extend(self.feed(line))
+        return completed
+
+    def feed(self, line: str) -> List[Finding]:
+        """Feed one line; returns the findings completed by this line (usually none)."""
+        line = line.rstrip('\r\n')
+        stripped = line.strip()
+
+        if self._in_code:
+            if stripped.startswith('```'):
+                self._end_code()
+            else:
+                self._code_lines.append(line)
+            return []
+
+        if stripped.startswith('```'):
+            self._in_code = True
+            self._code_language = stripped[3:].strip()
+            self._code_lines = []
+            return []
+
+        if stripped.startswith('## ') or stripped == '##':
+            completed = self._finish()
+            self._start(stripped[2:].strip())
+            return completed
+
+        if self._current is None:
+            return []
+
+        heading = SECTION_HEADING_RE.match(stripped)
+        if stripped.startswith('###') and heading:
+            self._set_section(heading.group(1))
+            return []
+
+        inline = INLINE_SECTION_RE.match(stripped)
+        if inline and inline.group(1).strip().lower() not in FIELD_NAMES:
+            # Any other inline section ends the current one; unknown sections are ignored
+            self._set_section(inline.group(1))
+            stripped = inline.group(2).strip()
+            if not stripped:
+                return []
+
+        self._content(stripped)
+        return []
+
+    def close(self) -> List[Finding]:
+        """Flush any open code block and the last finding."""
+        if self._in_code:
+            self._end_code()
+        return self._finish()
+
+    def _start(self, heading: str):
+        title = heading.lstrip('🔴🟠🟡🟢🔵⚠️🚨✅ ').strip()
+        if heading.startswith('✅') or 'NO VULNERABILITIES' in heading.upper() or 'GOOD TO GO' in heading.upper():
+            self.clean = True
+            self._current = None
+            return
+
+        severity = ""
+        prefix = SEVERITY_PREFIX_RE.match(title)
+        if prefix:
+            severity = prefix.group(1).capitalize()
+            title = title[prefix.end():].strip()
+            if title.startswith('[') and title.endswith(']') and title.count('[') == 1:
+                title = title[1:-1].strip()
+        self._current = Finding(title=title, severity=severity)
+        self._section = None
+        self._description = []
+
+    def _finish(self) -> List[Finding]:
+        if self._current is None:
+            return []
+        finding = self._current
+        finding.description = ' '.join(self._description)
+        self._current = None
+        self._section = None
+        self._description = []
+        self.findings.append(finding)
+        return [finding]
+
+    def _set_section(self, name: str):
+        self._section = SECTION_ALIASES.get(name.strip().strip('*').strip().lower(), name.strip().lower())
+
+    def _end_code(self):
+        self._in_code = False
+        code = '\n'.join(self._code_lines)
+        finding = self._current
+        if finding is not None:
+            if self._section == "secure_code" and not finding.secure_code:
+                finding.secure_code = code
+                finding.secure_code_language = self._code_language
+            elif self._section != "secure_code" and not finding.vulnerable_code:
+                finding.vulnerable_code = code
+                finding.vulnerable_code_language = self._code_language
+        self._code_lines = []
+
+    def _content(self, text: str):
+        if not text or RULE_RE.match(text):
+            return
+        finding = self._current
+        section = self._section
+
+        if section in FIELD_SECTIONS:
+            self._fields(text)
+            if section == "cwe" and not finding.cwe:
+                match = CWE_RE.search(text)
+                if match:
+                    finding.cwe = match.group(0)
+        elif section == "description":
+            if not text.startswith('#'):
+                self._description.append(text)
+        elif section == "recommendations":
+            item = LIST_ITEM_RE.sub('', text).strip()
+            if item:
+                finding.recommendations.append(item)
+
+    def _fields(self, text: str):
+        finding = self._current
+        matches = list(KEY_RE.finditer(text))
+        for index, match in enumerate(matches):
+            end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+            value = text[match.end():end].split('|', 1)[0].strip(' ,*`-')
+            key = match.group(1)
+            if not value:
+                continue
+            if key == "File" and not finding.file:
+                finding.file = value
+            elif key == "Line" and not finding.line:
+                finding.line = value
+            elif key.startswith("Function") and not finding.function:
+                finding.function = value
+            elif key == "CWE-ID" and not finding.cwe:
+                cwe = CWE_RE.search(value)
+                finding.cwe = cwe.group(0) if cwe else value
+            elif key == "Severity" and not finding.severity:
+                finding.severity = value.strip('[]')
+
+
+def parse_review(text: str) -> ReviewParser:
+    """Parse a complete review text in one pass and return the closed parser."""
+    parser = ReviewParser()
+    parser.feed_text(text)
+    parser.close()
+    return parser
+
+
+def render_finding(finding: Finding) -> str:
+    """Render one finding as a compact, developer-friendly markdown block."""
+    parts = [f"## 🚨 Security Issue: {finding.title or 'Unnamed finding'}", ""]
+
+    if finding.file:
+        location = f"`{finding.file}`"
+        if finding.line:
+            location += f", line {finding.line}"
+        if finding.function:
+            location += f", in `{finding.function}`"
+        parts.append(f"**File:** {location}")
+
+    parts.append(f"**Severity:** {finding.severity or 'Unspecified'}")
+    if finding.duplicate_of:
+        parts.append(f"**Same change as:** `{finding.duplicate_of}`")
+    parts.append("")
+
+    if finding.cwe:
+        parts.append(f"**CWE:** {finding.cwe}")
+        parts.append("")
+
+    if finding.description:
+        parts.append("**Issue:** " + finding.description)
+        parts.append("")
+
+    if finding.vulnerable_code:
+        parts.append("**Vulnerable Code:**")
+        parts.append(f"```{finding.vulnerable_code_language}\n{finding.vulnerable_code}\n```")
+        parts.append("")
+
+    if finding.secure_code:
+        parts.append("**Secure Code:**")
+        parts.append(f"```{finding.secure_code_language}\n{finding.secure_code}\n```")
+        parts.append("")
+
+    if finding.recommendations:
+        parts.append("**Key Fixes:**")
+        for i, rec in enumerate(finding.recommendations[:3], 1):  # Limit to 3
+            parts.append(f"{i}. {rec}")
+        parts.append("")
+
+    return '\n'.join(parts)
+
+
+def render_findings(findings: List[Finding], clean: bool = False) -> str:
+    """Render all findings, or a clean/fallback summary when there are none."""
+    if findings:
+        return '\n'.join(render_finding(finding) for finding in findings)
+
+    if clean:
+        return '\n'.join([
+            "## ✅ No Security Issues Found",
+            "",
+            "The AI reviewed your code changes and found no vulnerabilities. Good to go!"
+        ])
+
+    return '\n'.join([
+        "## 🔍 AI Security Review",
+        "",
+        "The AI has analyzed your code changes and identified potential security considerations.",
+        "",
+        "**Recommendation:** Review the changes for security best practices and ensure proper input validation."
+    ])
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Review Stream
+Reads a streamed endpoint response as text deltas.
+
+Serving endpoints asked to ``"stream": true`` answer with server-sent events,
+one JSON chunk per ``data:`` line and ``data: [DONE]`` at the end. Chunks
+come in the chat-agent shape (``{"delta": {"content": ...}}``), the chat
+completions shape (``{"choices": [{"delta": {"content": ...}}]}``) or as
+whole messages; ``iter_text`` yields the text of each as it arrives. A
+response that turns out not to be an event stream (an endpoint without
+streaming support, or a replayed recording) is read whole and its message
+text yielded once, so callers need no separate non-streaming path.
+"""
+
+import json
+from itertools import chain
+from typing import Dict, Iterable, Iterator
+
+
+def extract_delta(chunk: Dict) -> str:
+    """Text carried by one streamed chunk, in any of the supported shapes."""
+    if not isinstance(chunk, dict):
+        return ""
+    if isinstance(chunk.get('delta'), dict):
+        return chunk['delta'].get('content') or ""
+    choices = chunk.get('choices')
+    if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+        delta = choices[0].get('delta') or choices[0].get('message') or {}
+        return delta.get('content') or ""
+    messages = chunk.get('messages')
+    if isinstance(messages, list) and messages and isinstance(messages[0], dict):
+        return messages[0].get('content') or ""
+    content = chunk.get('content')
+    return content if isinstance(content, str) else ""
+
+
+def iter_events(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Yield the data of each server-sent event.
+
+    Multi-line ``data:`` fields are joined with newlines as the event stream
+    format specifies; comments and other fields are skipped.
+    """
+    data = []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line:
+            if data:
+                yield '\n'.join(data)
+                data = []
+        elif line.startswith('data:'):
+            value = line[5:]
+            data.append(value[1:] if value.startswith(' ') else value)
+    if data:
+        yield '\n'.join(data)
+
+
+def iter_text(response) -> Iterator[str]:
+    """
+    Yield the review text of a response piece by piece as it arrives.
+
+    Args:
+        response: A ``requests.Response`` opened with ``stream=True``, or any
+            object with ``text`` (such as a replayed recording)
+    """
+    if hasattr(response, 'iter_lines'):
+        # Event streams are UTF-8; requests would assume Latin-1 without a charset
+        if response.encoding is None or response.encoding.lower() == 'iso-8859-1':
+            response.encoding = 'utf-8'
+        lines = response.iter_lines(decode_unicode=True)
+    else:
+        lines = iter(response.text.splitlines())
+
+    head = []
+    for line in lines:
+        head.append(line)
+        if line.strip():
+            break
+    first = head[-1].lstrip() if head else ""
+
+    if not first.startswith(('data:', 'event:', 'id:', ':')):
+        # Not an event stream: the whole body is one JSON response
+        body = '\n'.join(head + list(lines))
+        try:
+            yield extract_delta(json.loads(body))
+        except json.JSONDecodeError:
+            yield body
+        return
+
+    for data in iter_events(chain(head, lines)):
+        if data.strip() == '[DONE]':
+            return
+        try:
+            chunk = json.loads(data)
+        except json.JSONDecodeError:
+            yield data
+            continue
+        text = extract_delta(chunk)
+        if text:
+            yield text
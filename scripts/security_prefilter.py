@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Security Prefilter
+Fast local scan of added diff lines against patterns from security_vulnerabilities.json.
+
+Rules are derived from the catalog's ``bad_code`` examples: literal flags
+(``verify=False``, ``shell=True``, ``debug=True``), calls to risky APIs
+(``hashlib.md5(``, ``pickle.load(``, ``.extractall(``) and a few code shapes
+(SQL built with f-strings, hardcoded secrets, nested regex quantifiers). A
+candidate is kept only when it does not also appear in the entry's
+``good_code``, so the secure variant of an example never matches. Extra rules
+can be supplied as JSON.
+
+Each rule carries literal anchors (``verify``, ``hashlib.md5``, ``select``...)
+of which at least one must occur in a line for the rule to match. Lines are
+checked against the anchors with plain substring tests first, so the regular
+expressions only run on the rare lines that could match; a clean line costs a
+couple of microseconds.
+"""
+
+import re
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from diff_packer import HUNK_HEADER_RE, file_path, iter_file_diffs
+
+
+DEFAULT_CATALOG = Path(__file__).resolve().parent.parent / "security_vulnerabilities.json"
+
+LITERAL_ASSIGN_RE = re.compile(r'\b(\w+)\s*=\s*(True|False|None|(?:ssl\.)?CERT_NONE)\b')
+CALL_RE = re.compile(r'\b((?:\w+\.)*)(\w+)\s*\(')
+IMPORT_RE = re.compile(r'^\s*(?:import\s+([\w.]+)(?:\s+as\s+(\w+))?|from\s+[\w.]+\s+import\s+(.+))')
+
+# Calls too common to say anything about security on their own.
+GENERIC_CALLS = {
+    'get', 'read', 'write', 'close', 'open', 'run', 'route', 'print', 'len', 'str', 'int',
+    'dict', 'list', 'set', 'format', 'encode', 'decode', 'join', 'append', 'Flask',
+    'Exception', 'ValueError', 'writer', 'writerow', 'hexdigest', 'getroot', 'match'
+}
+
+# Code shapes that no single token captures, with their anchors; active only
+# if a catalog example exhibits them.
+SHAPES = [
+    (r'(?i:\bf(?:"[^"]*\b(?:select|insert|update|delete)\b[^"]*\{|\'[^\']*\b(?:select|insert|update|delete)\b[^\']*\{))',
+     ["select", "insert", "update", "delete"]),
+    (r'(?i:(?:passw(?:or)?d|secret|api_?key|token|private_?key)\w*\s*=\s*b?["\'][^"\'\s]{4,}["\'])',
+     ["passw", "secret", "api_key", "apikey", "token", "private_key", "privatekey"]),
+    (r'\bf(?:"//[^"]*\{|\'//[^\']*\{)', ['f"//', "f'//"]),
+    (r'\([^()]*[+*]\)[+*]', [")+", ")*"]),
+]
+
+# Keep reports readable on huge diffs.
+MAX_REPORTED_HITS = 200
+
+
+class SecurityPrefilter:
+    def __init__(self, rules: List[Dict]):
+        self.rules = rules
+        self._compiled = [re.compile(rule["pattern"]) for rule in rules]
+        # anchor -> indexes of the rules it unlocks; rules without anchors always run
+        self._anchors: Dict[str, List[int]] = {}
+        self._unanchored: List[int] = []
+        for index, rule in enumerate(rules):
+            if rule.get("anchors"):
+                for anchor in rule["anchors"]:
+                    self._anchors.setdefault(anchor.lower(), []).append(index)
+            else:
+                self._unanchored.append(index)
+
+    @classmethod
+    def from_catalog(cls, catalog_path: Optional[str] = None, extra_rules_path: Optional[str] = None) -> "SecurityPrefilter":
+        """
+        Build a prefilter from the vulnerability catalog plus optional user rules.
+
+        User rules are a JSON list of ``{"pattern": ..., "attack_type": ...}``
+        objects, where ``pattern`` is a Python regular expression. An optional
+        ``anchors`` list of lowercase literals lets the rule be skipped on
+        lines containing none of them.
+        """
+        with open(catalog_path or DEFAULT_CATALOG, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+
+        rules: Dict[str, Dict] = {}
+        for entry in catalog.get("vulnerabilities", []):
+            for pattern, anchors in derive_patterns(entry.get("bad_code", ""), entry.get("good_code", "")):
+                rule = rules.setdefault(pattern, {
+                    "pattern": pattern,
+                    "anchors": anchors,
+                    "attack_type": entry["attack_type"],
+                    "catalog_ids": []
+                })
+                rule["catalog_ids"].append(entry.get("id"))
+
+        if extra_rules_path:
+            with open(extra_rules_path, 'r', encoding='utf-8') as f:
+                for user_rule in json.load(f):
+                    re.compile(user_rule["pattern"])
+                    rules.setdefault(user_rule["pattern"], {
+                        "pattern": user_rule["pattern"],
+                        "anchors": user_rule.get("anchors", []),
+                        "attack_type": user_rule.get("attack_type", "Custom rule"),
+                        "catalog_ids": []
+                    })
+
+        return cls(list(rules.values()))
+
+    def scan_line(self, line: str) -> List[Dict]:
+        """Return the rules matching one line of code."""
+        lowered = line.lower()
+        candidates = set(self._unanchored)
+        for anchor, indexes in self._anchors.items():
+            if anchor in lowered:
+                candidates.update(indexes)
+        return [self.rules[index] for index in sorted(candidates) if self._compiled[index].search(line)]
+
+    def scan_diff(self, diff_lines: Iterable[str], keep_flagged: bool = False) -> Tuple[str, Dict]:
+        """
+        Scan the added lines of a diff, hunk by hunk.
+
+        Args:
+            diff_lines: Diff lines
+            keep_flagged: Also build a diff holding only the flagged hunks
+
+        Returns:
+            Tuple of (flagged-hunks diff, or "" unless ``keep_flagged``; scan report)
+        """
+        flagged_parts: List[str] = []
+        hits: List[Dict] = []
+        total_hunks = 0
+        flagged_hunks = 0
+        flagged_files = 0
+        hit_count = 0
+
+        for header, hunks in iter_file_diffs(diff_lines):
+            path = file_path(header)
+            kept = []
+            for hunk_index, hunk in enumerate(hunks):
+                total_hunks += 1
+                flagged = False
+                for line in hunk:
+                    if not line.startswith('+') or line.startswith('+++'):
+                        continue
+                    for rule in self.scan_line(line[1:]):
+                        flagged = True
+                        hit_count += 1
+                        if len(hits) < MAX_REPORTED_HITS:
+                            hits.append({
+                                "path": path,
+                                "hunk": hunk_index,
+                                "attack_type": rule["attack_type"],
+                                "pattern": rule["pattern"],
+                                "line": line[1:].strip()[:200]
+                            })
+                if flagged:
+                    flagged_hunks += 1
+                    kept.append(hunk)
+            if kept:
+                flagged_files += 1
+                if keep_flagged:
+                    flagged_parts.append(''.join(header) + ''.join(line for hunk in kept for line in hunk))
+
+        report = {
+            "rules": len(self.rules),
+            "total_hunks": total_hunks,
+            "flagged_hunks": flagged_hunks,
+            "flagged_files": flagged_files,
+            "hit_count": hit_count,
+            "hits": hits
+        }
+        return ''.join(flagged_parts), report
+
+    def find_hits(self, diff_lines: Iterable[str]) -> List[Dict]:
+        """
+        List every rule match on an added line, with its new-side line number.
+
+        Returns:
+            One dict per (line, rule) with ``path``, ``line``, ``code``,
+            ``attack_type`` and ``catalog_ids``, up to ``MAX_REPORTED_HITS``
+        """
+        hits: List[Dict] = []
+        for header, hunks in iter_file_diffs(diff_lines):
+            path = file_path(header)
+            for hunk in hunks:
+                match = HUNK_HEADER_RE.match(hunk[0].rstrip('\n'))
+                number = int(match.group(3)) if match else 0
+                for line in hunk[1:]:
+                    if line.startswith('+'):
+                        for rule in self.scan_line(line[1:]):
+                            hits.append({
+                                "path": path,
+                                "line": number,
+                                "code": line[1:].rstrip('\r\n'),
+                                "attack_type": rule["attack_type"],
+                                "catalog_ids": rule["catalog_ids"]
+                            })
+                            if len(hits) >= MAX_REPORTED_HITS:
+                                return hits
+                    if line[:1] in ' +':
+                        number += 1
+        return hits
+
+
+def derive_patterns(bad_code: str, good_code: str) -> List[Tuple[str, List[str]]]:
+    """
+    Derive regex patterns from one catalog example, skipping anything its secure variant also has.
+
+    Returns:
+        List of (pattern, anchors) pairs
+    """
+    imported = set()
+    for line in bad_code.splitlines():
+        match = IMPORT_RE.match(line)
+        if not match:
+            continue
+        if match.group(1):
+            imported.add(match.group(2) or match.group(1).split('.')[0])
+        else:
+            imported.update(name.strip().split(' as ')[-1] for name in match.group(3).split(','))
+
+    compact_good = re.sub(r'\s+', '', good_code)
+    patterns: List[Tuple[str, List[str]]] = []
+
+    def add(pattern: str, evidence: str, anchor: str):
+        if re.sub(r'\s+', '', evidence) not in compact_good and pattern not in [p for p, _ in patterns]:
+            patterns.append((pattern, [anchor.lower()]))
+
+    for line in bad_code.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#') or IMPORT_RE.match(line):
+            continue
+
+        for match in LITERAL_ASSIGN_RE.finditer(stripped):
+            name, value = match.group(1), match.group(2)
+            add(rf'\b{re.escape(name)}\s*=\s*{re.escape(value)}\b', f"{name}={value}", name)
+
+        for match in CALL_RE.finditer(stripped):
+            receiver, name = match.group(1), match.group(2)
+            if name in GENERIC_CALLS or name in ('if', 'for', 'while', 'return', 'with', 'def'):
+                continue
+            root = receiver.split('.')[0] if receiver else ""
+            if root and root in imported:
+                add(rf'\b{re.escape(receiver + name)}\s*\(', f"{receiver}{name}(", receiver + name)
+            elif receiver:
+                add(rf'\.{re.escape(name)}\s*\(', f".{name}(", "." + name)
+            elif name in imported:
+                add(rf'\b{re.escape(name)}\s*\(', f"{name}(", name)
+
+    for shape, anchors in SHAPES:
+        if re.search(shape, bad_code) and not re.search(shape, good_code):
+            patterns.append((shape, anchors))
+
+    return patterns
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tracing
+Lightweight span recorder for the diff generator.
+
+Stages of a run (commit info, diff, stats, render, save, API, format...),
+every git subprocess and every HTTP attempt are recorded as spans with
+their duration and a few attributes. ``summary`` condenses them for the
+``timings`` block of ``diff_report.json``; ``write_chrome_trace`` exports
+them in the Chrome trace event format, which chrome://tracing and Perfetto
+open directly.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+# Keep reports readable on runs with many subprocesses or requests.
+MAX_REPORTED_CALLS = 200
+
+
+class Tracer:
+    def __init__(self):
+        self.spans: List[Dict] = []
+        self.counters: Dict[str, int] = {}
+        self.statuses: Dict[str, int] = {}
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        """Seconds since the tracer was created."""
+        return time.perf_counter() - self._origin
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **attributes) -> Iterator[Dict]:
+        """
+        Record the enclosed block as a span.
+
+        Yields the span's attribute dict, so results known only at the end
+        (status codes, byte counts) can be added from inside the block.
+        """
+        start = self.now()
+        try:
+            yield attributes
+        finally:
+            self.record(name, start, self.now(), category, **attributes)
+
+    def record(self, name: str, start: float, end: float, category: str = "stage", **attributes):
+        """Record a span from ``start`` to ``end`` (both as returned by ``now``)."""
+        span = {
+            "name": name,
+            "category": category,
+            "start": start,
+            "seconds": end - start,
+            "thread": threading.get_ident(),
+            "attributes": attributes
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    def count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def count_status(self, status: int):
+        with self._lock:
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+    def summary(self) -> Dict:
+        """
+        Condense the spans into the ``timings`` block of the report.
+
+        Stage seconds are summed per name; git commands and HTTP attempts
+        are listed individually, up to ``MAX_REPORTED_CALLS`` each.
+        """
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+            statuses = dict(self.statuses)
+
+        stages: Dict[str, float] = {}
+        git_calls: List[Dict] = []
+        http_calls: List[Dict] = []
+        git_seconds = 0.0
+        http_seconds = 0.0
+        queue_waits: List[float] = []
+        for span in spans:
+            if span["category"] == "stage":
+                stages[span["name"]] = round(stages.get(span["name"], 0.0) + span["seconds"], 6)
+            elif span["category"] == "git":
+                git_seconds += span["seconds"]
+                if len(git_calls) < MAX_REPORTED_CALLS:
+                    git_calls.append(dict(span["attributes"], seconds=round(span["seconds"], 6)))
+            elif span["category"] == "http":
+                http_seconds += span["seconds"]
+                if len(http_calls) < MAX_REPORTED_CALLS:
+                    http_calls.append(dict(span["attributes"], seconds=round(span["seconds"], 6)))
+            elif span["category"] == "limiter":
+                queue_waits.append(span["seconds"])
+
+        return {
+            "total_seconds": round(self.now(), 6),
+            "stages": stages,
+            "git": {
+                "processes": counters.get("git_processes", 0),
+                "seconds": round(git_seconds, 6),
+                "commands": git_calls
+            },
+            "http": {
+                "requests": counters.get("http_requests", 0),
+                "attempts": counters.get("http_attempts", 0),
+                "retries": counters.get("http_retries", 0),
+                "payload_bytes": counters.get("payload_bytes", 0),
+                "response_bytes": counters.get("response_bytes", 0),
+                "statuses": statuses,
+                "seconds": round(http_seconds, 6),
+                "queue_wait_seconds": round(sum(queue_waits), 6),
+                "max_queue_wait_seconds": round(max(queue_waits, default=0.0), 6),
+                "calls": http_calls
+            }
+        }
+
+    def write_chrome_trace(self, path: str):
+        """Write every span as a complete ("X") event in Chrome trace event format."""
+        pid = os.getpid()
+        with self._lock:
+            events = [
+                {
+                    "name": span["name"],
+                    "cat": span["category"],
+                    "ph": "X",
+                    "ts": round(span["start"] * 1_000_000, 3),
+                    "dur": round(span["seconds"] * 1_000_000, 3),
+                    "pid": pid,
+                    "tid": span["thread"],
+                    "args": span["attributes"]
+                }
+                for span in self.spans
+            ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def describe_command(command: List[str], limit: int = 200) -> str:
+    """Command line as a single string, shortened for reports."""
+    text = ' '.join(command)
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
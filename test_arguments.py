@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts", "generate_diff.py")
+
+
+def run(tmp_path, *args):
+    return subprocess.run([sys.executable, SCRIPT, *args], cwd=tmp_path, capture_output=True, text=True,
+                          env=dict(os.environ, DATABRICKS_TOKEN="test"))
+
+
+@pytest.mark.parametrize("args, message", [
+    (["--deadline", "0"], "--deadline must be positive"),
+    (["--hedge-percentile", "100"], "--hedge-percentile must be between 0 and 100"),
+    (["--hedge-after", "-1"], "--hedge-after must be non-negative"),
+    (["--breaker-failures", "0"], "--breaker-failures must be positive"),
+    (["--max-concurrency", "0"], "--max-concurrency must be positive"),
+    (["--requests-per-second", "-2"], "--requests-per-second and --target-latency must be positive"),
+    (["--read-timeout", "0"], "--connect-timeout and --read-timeout must be positive"),
+    (["--token-budget", "0"], "--token-budget must be positive"),
+    (["--max-file-lines", "0"], "--max-file-lines must be positive"),
+    (["--catalog-examples", "-1"], "--catalog-examples must be non-negative"),
+])
+def test_numeric_flags_are_checked_before_anything_is_built(tmp_path, args, message):
+    limiter_db = tmp_path / "limits.sqlite"
+    result = run(tmp_path, "--rate-limit-db", str(limiter_db), *args)
+    assert result.returncode == 1
+    assert f"❌ {message}" in result.stdout
+    # Rejected before the rate limiter database (or the repository check) is reached
+    assert not limiter_db.exists()
+    assert "Not in a git repository" not in result.stdout
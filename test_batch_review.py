@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from batch_review import load_manifest, repo_output_dir
+
+
+def test_text_manifest_paths_are_relative_to_the_manifest(tmp_path, monkeypatch):
+    manifests = tmp_path / "manifests"
+    manifests.mkdir()
+    manifest = manifests / "repos.txt"
+    manifest.write_text("# services\nrepos/api\n\n/srv/git/web\n")
+    monkeypatch.chdir(tmp_path)
+    assert load_manifest(str(manifest)) == [{"repo": str(manifests / "repos" / "api")}, {"repo": "/srv/git/web"}]
+    assert load_manifest("manifests/repos.txt")[0] == {"repo": os.path.join("manifests", "repos", "api")}
+
+
+def test_json_manifest_keeps_job_options(tmp_path):
+    manifest = tmp_path / "repos.json"
+    manifest.write_text(json.dumps(["../api", {"repo": "web", "base": "main", "merge_base": True}]))
+    assert load_manifest(str(manifest)) == [
+        {"repo": str(tmp_path / ".." / "api")},
+        {"repo": str(tmp_path / "web"), "base": "main", "merge_base": True}
+    ]
+
+
+def test_output_dirs_keep_same_named_repositories_apart(tmp_path):
+    first = repo_output_dir("out", str(tmp_path / "a" / "service"))
+    second = repo_output_dir("out", str(tmp_path / "b" / "service"))
+    assert first != second
+    assert os.path.basename(first).startswith("service-")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from catalog_index import INDEX_MAGIC, CatalogIndex, tokenize
+
+CATALOG = {"vulnerabilities": [
+    {"id": 1, "attack_type": "Weak hash", "bad_code": "digest = hashlib.md5(password.encode()).hexdigest()",
+     "good_code": "digest = bcrypt.hashpw(password.encode(), bcrypt.gensalt())"},
+    {"id": 2, "attack_type": "Command injection", "bad_code": "subprocess.call(user_cmd, shell=True)",
+     "good_code": "subprocess.run(shlex.split(user_cmd))"},
+    {"id": 3, "attack_type": "Path traversal", "bad_code": "open(os.path.join(upload_dir, file_name)).read()",
+     "good_code": "safe_join(upload_dir, file_name)"},
+    {"id": 4, "attack_type": "Empty", "bad_code": ""}
+]}
+
+
+@pytest.fixture
+def catalog_path(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps(CATALOG))
+    return path
+
+
+def test_tokenize():
+    assert tokenize("hashlib.md5(file_path)") == ["hashlib.md5", "hashlib", "md5", "file_path", "file", "path"]
+    assert tokenize("return x if not y else None") == []
+
+
+def test_query_finds_each_example_from_its_own_code():
+    index = CatalogIndex.build(CATALOG, "digest")
+    assert [entry["id"] for entry in index.entries] == [1, 2, 3]
+    for number, entry in enumerate(index.entries):
+        ranked = index.query(entry["bad_code"])
+        assert ranked[0][0] == number and ranked[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert index.query("total = price * quantity") == []
+
+
+def test_save_load_round_trip(tmp_path):
+    index = CatalogIndex.build(CATALOG, "digest")
+    path = tmp_path / "index.bin"
+    index.save(str(path))
+    assert path.read_bytes().startswith(INDEX_MAGIC)
+    loaded = CatalogIndex.load(str(path))
+    assert (loaded.digest, loaded.terms, loaded.entries) == (index.digest, index.terms, index.entries)
+    assert list(loaded.offsets) == list(index.offsets) and list(loaded.postings) == list(index.postings)
+    assert list(loaded.weights) == list(index.weights) and list(loaded.idf) == list(index.idf)
+    assert not loaded.built
+    text = "cmd = request.args['c']\nsubprocess.call(cmd, shell=True)"
+    assert loaded.query(text) == index.query(text)
+
+
+def test_truncated_index_is_rejected(tmp_path):
+    path = tmp_path / "index.bin"
+    CatalogIndex.build(CATALOG, "digest").save(str(path))
+    path.write_bytes(path.read_bytes()[:-4])
+    with pytest.raises(ValueError, match="truncated"):
+        CatalogIndex.load(str(path))
+
+
+def test_index_is_rebuilt_when_the_catalog_changes(catalog_path, tmp_path):
+    index_path = str(tmp_path / "index.bin")
+    assert CatalogIndex.load_or_build(str(catalog_path), index_path).built
+    assert not CatalogIndex.load_or_build(str(catalog_path), index_path).built
+
+    changed = dict(CATALOG, vulnerabilities=CATALOG["vulnerabilities"][:2])
+    catalog_path.write_text(json.dumps(changed))
+    rebuilt = CatalogIndex.load_or_build(str(catalog_path), index_path)
+    assert rebuilt.built and len(rebuilt.entries) == 2
+
+    (tmp_path / "index.bin").write_bytes(b"garbage")
+    assert CatalogIndex.load_or_build(str(catalog_path), index_path).built
+
+
+def test_examples_for_diff():
+    index = CatalogIndex.build(CATALOG, "digest")
+    diff = (
+        "diff --git a/app.py b/app.py\n--- a/app.py\n+++ b/app.py\n"
+        "@@ -1,1 +1,2 @@\n import os\n+subprocess.call(user_cmd, shell=True)\n"
+        "@@ -20,1 +21,1 @@\n-x = 1\n+x = 2\n"
+    )
+    examples = index.examples_for_diff(diff)
+    assert [example["id"] for example in examples["catalog_examples"]] == [2]
+    assert examples["catalog_examples"][0]["good_code"] == "subprocess.run(shlex.split(user_cmd))"
+    assert examples["hunk_examples"] == [{"file": "app.py", "line": 1, "examples": [2]}]
+    assert index.examples_for_diff(diff.replace("subprocess.call(user_cmd, shell=True)", "y = 3")) is None
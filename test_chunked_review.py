@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from generate_diff import DiffGenerator
+from http_transport import EndpointTransport
+from mock_endpoint import MockEndpoint
+
+
+def file_diff(path: str, hunks: int, body_lines: int = 5) -> str:
+    text = f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n"
+    for index in range(hunks):
+        start = 1 + index * 100
+        text += f"@@ -{start},{body_lines} +{start},{body_lines} @@\n"
+        text += ''.join(f"+{path} hunk {index} line {line}\n" for line in range(body_lines))
+    return text
+
+
+def generator(tmp_path, monkeypatch, max_chunk_bytes: int, **kwargs) -> DiffGenerator:
+    monkeypatch.setenv("DATABRICKS_TOKEN", "test")
+    return DiffGenerator(output_dir=str(tmp_path / "out"), chunked=True, max_chunk_bytes=max_chunk_bytes, **kwargs)
+
+
+def test_large_files_split_at_hunks_with_the_header_repeated(tmp_path, monkeypatch):
+    small, large = file_diff("small.py", 1), file_diff("large.py", 4)
+    hunk_size = max(len(hunk) for hunk in large.split("@@ -")[1:]) + len("@@ -")
+    diff_generator = generator(tmp_path, monkeypatch, max_chunk_bytes=len(file_diff("large.py", 0)) + 2 * hunk_size)
+    units = list(diff_generator.iter_diff_units((small + large).splitlines(keepends=True)))
+    assert units[0] == small
+    assert len(units) == 3
+    assert all(unit.startswith("diff --git a/large.py b/large.py\n") for unit in units[1:])
+    assert [unit.count("@@ -") for unit in units[1:]] == [2, 2]
+    assert ''.join(unit.split("+++ b/large.py\n", 1)[1] for unit in units[1:]) == large.split("+++ b/large.py\n")[1]
+
+
+def test_oversized_hunk_is_kept_whole(tmp_path, monkeypatch):
+    large = file_diff("large.py", 1, body_lines=50)
+    units = list(generator(tmp_path, monkeypatch, max_chunk_bytes=100).iter_diff_units(large.splitlines(keepends=True)))
+    assert units == [large]
+
+
+def test_units_are_packed_in_order(tmp_path, monkeypatch):
+    diff_generator = generator(tmp_path, monkeypatch, max_chunk_bytes=10)
+    assert list(diff_generator.pack_diff_chunks(["aaaa", "bbbb", "cc", "dddddddddddd", "e"])) == \
+        ["aaaabbbbcc", "dddddddddddd", "e"]
+
+
+def test_chunks_are_reviewed_concurrently_and_merged_in_order(tmp_path, monkeypatch):
+    endpoint = MockEndpoint(latency=0.2).start()
+    try:
+        diff = ''.join(file_diff(f"f{index}.py", 1) for index in range(6))
+        diff_generator = generator(tmp_path, monkeypatch, max_chunk_bytes=len(file_diff("f0.py", 1)), max_workers=6,
+                                   transport=EndpointTransport(endpoint.url, max_retries=0))
+        chunks = list(diff_generator.pack_diff_chunks(diff_generator.iter_diff_units(diff.splitlines(keepends=True))))
+        assert len(chunks) == 6
+        review = diff_generator.review_diff_chunks(chunks)
+        assert endpoint.request_count == 6
+        assert [chunk["index"] for chunk in review["chunks"]] == list(range(6))
+        assert all(chunk["succeeded"] for chunk in review["chunks"])
+        assert review["messages"][0]["content"].count(endpoint.review) == 6
+    finally:
+        endpoint.stop()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from generate_diff import DiffGenerator
+from http_transport import EndpointTransport
+from mock_endpoint import MockEndpoint
+from response_recorder import RecordedResponse
+
+
+class SingleAnswerTransport:
+    """An endpoint that answers every request, however many rows, with one chat review."""
+
+    url = "https://example.test/serving-endpoints/review/invocations"
+    requires_token = True
+    retry_count = 0
+
+    def __init__(self):
+        self.tracer = None
+        self.rows = []
+
+    def post(self, body, headers, stream=False):
+        rows = json.loads(body)["dataframe_split"]["data"]
+        self.rows.append(len(rows))
+        return RecordedResponse(200, json.dumps({"messages": [{"role": "assistant", "content": "No issues found."}]}))
+
+    def close(self):
+        pass
+
+
+def git(repo, *args) -> str:
+    env = dict(os.environ, GIT_AUTHOR_NAME="Test", GIT_AUTHOR_EMAIL="test@example.com",
+               GIT_COMMITTER_NAME="Test", GIT_COMMITTER_EMAIL="test@example.com")
+    return subprocess.run(["git", *args], cwd=repo, env=env, capture_output=True, text=True, check=True).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "repo"
+    path.mkdir()
+    git(path, "init", "-q")
+    for index in range(6):
+        (path / f"module_{index}.py").write_text(f"VALUE = {index}\n")
+        git(path, "add", "-A")
+        git(path, "commit", "-q", "-m", f"commit {index}")
+    return path
+
+
+def generator(repo, tmp_path, monkeypatch, transport, **kwargs) -> DiffGenerator:
+    monkeypatch.setenv("DATABRICKS_TOKEN", "test")
+    return DiffGenerator(output_dir=str(tmp_path / "out"), repo_path=str(repo), commit_range="HEAD~5..HEAD",
+                         transport=transport, **kwargs)
+
+
+def test_range_is_reviewed_commit_by_commit_in_batches(repo, tmp_path, monkeypatch):
+    endpoint = MockEndpoint().start()
+    try:
+        diff_generator = generator(repo, tmp_path, monkeypatch, EndpointTransport(endpoint.url, max_retries=0),
+                                   commits_per_request=2)
+        merged, commit_reviews = diff_generator.review_commit_range("HEAD~5..HEAD")
+    finally:
+        endpoint.stop()
+    assert endpoint.request_count == 3
+    assert diff_generator.row_predictions is True
+    assert [record["message"] for record in commit_reviews] == [f"commit {index}" for index in range(1, 6)]
+    assert all(record["reviewed"] and record["findings"] for record in commit_reviews)
+    assert merged["messages"][0]["content"].count("# Commit ") == 5
+
+
+def test_batches_respect_the_byte_limit(repo, tmp_path, monkeypatch):
+    diff_generator = generator(repo, tmp_path, monkeypatch, SingleAnswerTransport(), commits_per_request=3,
+                               max_chunk_bytes=25)
+    commits = [{"diff": "x" * size} for size in (10, 10, 10, 30, 5, 5, 5, 5)]
+    assert [len(batch) for batch in diff_generator._batch_commits(commits)] == [2, 1, 1, 3, 1]
+
+
+def test_single_review_for_a_batch_is_re_sent_per_commit(repo, tmp_path, monkeypatch):
+    transport = SingleAnswerTransport()
+    diff_generator = generator(repo, tmp_path, monkeypatch, transport, commits_per_request=5, max_workers=1)
+    merged, commit_reviews = diff_generator.review_commit_range("HEAD~5..HEAD")
+    assert transport.rows == [5, 1, 1, 1, 1, 1]
+    assert diff_generator.row_predictions is False
+    assert all(record["reviewed"] for record in commit_reviews)
+
+
+def test_split_batch_review_shapes(repo, tmp_path, monkeypatch):
+    diff_generator = generator(repo, tmp_path, monkeypatch, SingleAnswerTransport())
+    single = {"messages": [{"role": "assistant", "content": "x"}]}
+    assert diff_generator._split_batch_review({"predictions": [single, "text"]}, 2) == [single, {"response": "text"}]
+    assert diff_generator._split_batch_review([single, single], 2) == [single, single]
+    assert diff_generator._split_batch_review(single, 2) is None
+    assert diff_generator._split_batch_review(single, 1) == [single]
+    assert diff_generator._split_batch_review(None, 3) == [None, None, None]
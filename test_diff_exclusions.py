@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from diff_exclusions import ExclusionRules, glob_to_regex, parse_rules
+
+
+def matches(pattern: str, path: str) -> bool:
+    return re.match(glob_to_regex(pattern) + r'\Z', path) is not None
+
+
+def file_diff(path: str, body: str) -> str:
+    return f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n{body}"
+
+
+def record(path: str, binary: bool = False) -> dict:
+    return {"path": path, "binary": binary}
+
+
+def run_filter(rules: ExclusionRules, diff: str, paths):
+    excluded = []
+    files = [path if isinstance(path, dict) else record(path) for path in paths]
+    output = ''.join(rules.filter_diff(diff.splitlines(keepends=True), files, excluded))
+    return output, excluded
+
+
+def test_glob_to_regex():
+    assert matches("*.min.js", "static/js/app.min.js")
+    assert not matches("*.min.js", "app.min.js.map")
+    assert matches("dist/*", "dist/app.js")
+    assert not matches("dist/*", "dist/sub/app.js")
+    assert not matches("dist/*", "web/dist/app.js")
+    assert matches("**/vendor/**", "vendor/lib/a.py")
+    assert matches("**/vendor/**", "src/vendor/lib/a.py")
+    assert matches("build/", "build/out/a.o")
+    assert matches("file?.[ch]", "src/file1.c")
+    assert not matches("file?.[!ch]", "file1.c")
+
+
+def test_last_matching_rule_wins():
+    rules = ExclusionRules(parse_rules("**/vendor/**  exclude\nvendor/ours/**  include\n", "rules"))
+    assert rules.match("vendor/lib/a.py")["action"] == "exclude"
+    assert rules.match("vendor/ours/a.py")["action"] == "include"
+    assert rules.match("src/app.py") is None
+    reordered = ExclusionRules(parse_rules("vendor/ours/**  include\n**/vendor/**  exclude\n", "rules"))
+    assert reordered.match("vendor/ours/a.py")["action"] == "exclude"
+
+
+def test_linguist_attributes():
+    rules = parse_rules(
+        "a.py linguist-generated\nb.py linguist-generated=true\nc.py -linguist-generated\n"
+        "d.py linguist-vendored=false\ne.py !linguist-generated\nf.py text eol=lf\n",
+        ".gitattributes"
+    )
+    assert [(rule["pattern"], rule["action"]) for rule in rules] == [
+        ("a.py", "exclude"), ("b.py", "exclude"), ("c.py", "include"), ("d.py", "include"), ("e.py", "unset")
+    ]
+    with pytest.raises(ValueError, match="rules:1"):
+        parse_rules("dist/** truncate=many\n", "rules")
+
+
+def test_unset_attribute_leaves_the_file_to_the_heuristics():
+    rules = ExclusionRules(parse_rules("*.py exclude\napp.py !linguist-generated\n", "rules"))
+    diff = file_diff("app.py", "@@ -1,1 +1,1 @@\n-a\n+b\n") + file_diff("lib.py", "@@ -1,1 +1,1 @@\n-a\n+b\n")
+    output, excluded = run_filter(rules, diff, ["app.py", "lib.py"])
+    assert "app.py" in output and "lib.py" not in output
+    assert [(entry["path"], entry["action"]) for entry in excluded] == [("lib.py", "excluded")]
+
+
+def test_truncation_rewrites_the_cut_hunk_header():
+    rules = ExclusionRules(parse_rules("gen/** truncate=3\n", "rules"))
+    body = "@@ -1,6 +1,6 @@ def f():\n a\n-c\n+C\n-d\n+D\n e\n@@ -20,1 +20,1 @@\n-x\n+y\n"
+    output, excluded = run_filter(rules, file_diff("gen/f.py", body), ["gen/f.py"])
+    assert output.endswith("@@ -1,3 +1,2 @@ def f():\n a\n-c\n+C\n-d\n")
+    assert excluded == [{"path": "gen/f.py", "action": "truncated", "reason": "rule gen/** (rules:1)",
+                         "dropped_lines": 5, "kept_lines": 3}]
+
+
+def test_truncation_at_a_hunk_boundary_keeps_whole_hunks():
+    rules = ExclusionRules(parse_rules("gen/** truncate=2\n", "rules"))
+    body = "@@ -1,1 +1,1 @@\n-a\n+b\n@@ -9,1 +9,1 @@\n-c\n+d\n"
+    output, excluded = run_filter(rules, file_diff("gen/f.py", body), ["gen/f.py"])
+    assert output.endswith("+++ b/gen/f.py\n@@ -1,1 +1,1 @@\n-a\n+b\n")
+    assert excluded[0]["kept_lines"] == 2
+
+
+def test_generated_marker_only_counts_in_the_file_header():
+    header = file_diff("api.py", "@@ -0,0 +1,2 @@\n+# Code generated by protoc. DO NOT EDIT.\n+x = 1\n")
+    later = file_diff("notes.py", "@@ -30,1 +30,2 @@\n x = 1\n+# Code generated by protoc. DO NOT EDIT.\n")
+    text = file_diff("docs.py", '@@ -0,0 +1,1 @@\n+MESSAGE = "This file is auto-generated"\n')
+    output, excluded = run_filter(ExclusionRules([]), header + later + text, ["api.py", "notes.py", "docs.py"])
+    assert [(entry["path"], entry["reason"]) for entry in excluded] == [("api.py", "generated")]
+    assert "notes.py" in output and "docs.py" in output
+
+
+def test_binary_and_minified_files_are_excluded():
+    minified = file_diff("static/app.js", "@@ -1,1 +1,1 @@\n-a\n+" + "x;" * 600 + "\n")
+    binary = "diff --git a/logo.png b/logo.png\nBinary files a/logo.png and b/logo.png differ\n"
+    output, excluded = run_filter(ExclusionRules([]), minified + binary,
+                                  ["static/app.js", record("logo.png", binary=True)])
+    assert output == ""
+    assert [(entry["path"], entry["reason"]) for entry in excluded] == [
+        ("static/app.js", "minified"), ("logo.png", "binary")
+    ]
+
+
+def test_default_rules():
+    rules = ExclusionRules.load(defaults=True, repo_path="/nonexistent")
+    assert rules.match("web/package-lock.json")["action"] == "exclude"
+    assert rules.match("src/third_party/lib.c")["action"] == "exclude"
+    assert rules.match("web/dist/bundle.js")["action"] == "truncate"
+    assert rules.match("src/app.py") is None
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from diff_packer import DiffPacker, classify_path, iter_file_diffs, trim_hunk
+
+
+def file_diff(path: str, body: str) -> str:
+    return f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n{body}"
+
+
+def hunk(start: int, changed: str, context: int = 10) -> str:
+    """A hunk with one changed line between ``context`` unchanged lines on each side."""
+    lines = [f" line {start + i}\n" for i in range(context)]
+    lines.append(f"+{changed}\n")
+    lines += [f" line {start + context + i}\n" for i in range(context)]
+    return f"@@ -{start},{2 * context} +{start},{2 * context + 1} @@\n" + ''.join(lines)
+
+
+def pack(diff: str, budget: int):
+    return DiffPacker(budget, min_context=2).pack(lambda: diff.splitlines(keepends=True))
+
+
+def test_classify_path():
+    assert classify_path("app/db.py") == "source"
+    assert classify_path("tests/test_db.py") == "test"
+    assert classify_path("docs/guide.md") == "docs"
+    assert classify_path("static/app.min.js") == "data"
+    assert classify_path("deploy/config.yaml") == "config"
+
+
+def test_trim_hunk_splits_distant_changes():
+    body = [f" {i}\n" for i in range(20)]
+    body[3] = "+first\n"
+    body[15] = "-second\n"
+    pieces = trim_hunk(["@@ -1,19 +1,19 @@ def f():\n"] + body, 1)
+    assert [piece[0] for piece in pieces] == ["@@ -3,2 +3,3 @@ def f():\n", "@@ -14,3 +15,2 @@ def f():\n"]
+    assert pieces[0][1:] == [" 2\n", "+first\n", " 4\n"]
+
+
+def test_everything_fits_in_a_large_budget():
+    diff = file_diff("README.md", hunk(1, "docs")) + file_diff("app/db.py", hunk(1, "cursor.execute(q)"))
+    packed, report = pack(diff, 10_000)
+    assert report["included"] == ["app/db.py", "README.md"]
+    # Security-relevant source comes first
+    assert packed.index("app/db.py") < packed.index("README.md")
+    assert sorted(packed.splitlines()) == sorted(diff.splitlines())
+
+
+def test_tight_budget_trims_context_and_skips_low_value_files():
+    source = file_diff("app/auth.py", hunk(1, "password = request.args['p']"))
+    docs = file_diff("docs/guide.md", hunk(1, "words"))
+    full = DiffPacker(1).estimate_tokens(len(source))
+    packed, report = pack(source + docs, full - 1)
+    assert report["trimmed"] == ["app/auth.py"]
+    assert report["skipped"] == ["docs/guide.md"]
+    assert "docs/guide.md" not in packed
+    assert "@@ -9,4 +9,5 @@" in packed
+    assert report["packed_tokens"] <= full - 1
+
+
+def test_only_the_most_relevant_hunks_are_kept():
+    diff = file_diff("app/views.py", hunk(1, "x = 1") + hunk(100, "os.system(cmd)") + hunk(200, "y = 2"))
+    (header, hunks), = iter_file_diffs(diff.splitlines(keepends=True))
+    packer = DiffPacker(1, min_context=2)
+    one_hunk = packer.estimate_tokens(sum(len(line) for line in header)) + \
+        packer.estimate_tokens(sum(len(line) for line in trim_hunk(hunks[1], 2)[0]))
+    packed, report = pack(diff, one_hunk)
+    record = report["files"][0]
+    assert record["status"] == "trimmed"
+    assert record["kept_hunks"] == [1]
+    assert "os.system(cmd)" in packed and "x = 1" not in packed and "y = 2" not in packed
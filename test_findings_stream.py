@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from findings_stream import SCHEMA_VERSION, FindingsStream, run_records
+
+
+def report(**extra) -> dict:
+    base = {
+        "metadata": {"timestamp": "2026-01-01T00:00:00", "is_initial_commit": False},
+        "commits": {"current": {"hash": "c" * 40}, "previous": {"hash": "a" * 40}},
+        "author": "Dev",
+        "timings": {"total_seconds": 3.5, "stages": {"api": 2.0}, "http": {"seconds": 1.9}},
+        "statistics": {"changed_files": 2, "additions": 10, "deletions": 4, "total_diff_lines": 40},
+        "ai_review": {}
+    }
+    base.update(extra)
+    return base
+
+
+def test_single_commit_findings():
+    findings = [
+        {"title": "SQL injection", "severity": "High", "cwe": "CWE-89", "file": "db.py", "line": "12"},
+        {"title": "SQL injection", "severity": "High", "file": "db2.py", "line": "40", "duplicate_of": "db.py:12"}
+    ]
+    *lines, run = run_records(report(findings=findings), "org/app", run_id="r1")
+    assert [(line["commit"], line["file"], line["cwe"], line["duplicate_of"]) for line in lines] == [
+        ("c" * 40, "db.py", "CWE-89", None), ("c" * 40, "db2.py", None, "db.py:12")
+    ]
+    assert all(line["type"] == "finding" and line["run_id"] == "r1" for line in lines)
+    assert lines[0]["timings"] == {"total_seconds": 3.5, "review_seconds": 2.0}
+    assert (run["type"], run["schema"], run["findings"], run["duplicates"]) == ("run", SCHEMA_VERSION, 2, 1)
+    assert run["severities"] == {"High": 2}
+    assert run["commits_reviewed"] is None and run["reviewed"]
+    assert run["timings"]["http_seconds"] == 1.9
+
+
+def test_range_mode_attributes_findings_to_their_commits():
+    commit_reviews = [
+        {"hash": "1" * 40, "findings": [{"title": "XSS", "severity": "Medium"}]},
+        {"hash": "2" * 40, "findings": []},
+        {"hash": "3" * 40, "findings": [{"title": "SSRF"}, {"title": "XXE", "severity": "Low"}]}
+    ]
+    *lines, run = run_records(report(commit_reviews=commit_reviews), "org/app")
+    assert [(line["commit"], line["title"]) for line in lines] == [
+        ("1" * 40, "XSS"), ("3" * 40, "SSRF"), ("3" * 40, "XXE")
+    ]
+    assert all(line["previous_commit"] == "a" * 40 for line in lines)
+    assert run["commit"] == "c" * 40 and run["commits_reviewed"] == 3
+    assert run["severities"] == {"Medium": 1, "Unspecified": 1, "Low": 1}
+
+
+def test_concurrent_runs_never_interleave_lines(tmp_path):
+    target = tmp_path / "out" / "findings.ndjson"
+    findings = [{"title": f"finding {i}", "description": "x" * 5000} for i in range(20)]
+    stream = FindingsStream(str(target))
+    threads = [threading.Thread(target=stream.write_run, args=(report(findings=findings), f"repo{n}"))
+               for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    records = [json.loads(line) for line in target.read_text(encoding="utf-8").splitlines()]
+    assert len(records) == 8 * 21
+    # Each run's lines are contiguous: 20 findings, then its run line
+    for start in range(0, len(records), 21):
+        run = records[start:start + 21]
+        assert len({record["run_id"] for record in run}) == 1
+        assert [record["type"] for record in run] == ["finding"] * 20 + ["run"]
+
+
+def test_dash_writes_to_standard_output(capsys):
+    written = FindingsStream("-").write_run(report(findings=[{"title": "t"}]), "org/app")
+    assert written == 1
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["type"] for line in lines] == ["finding", "run"]
@@ -1,135 +1,11 @@
 #!/usr/bin/env python3
 
-def _format_ai_review(ai_content: str) -> str:
-    """
-    Format the AI review content to be simple, readable and developer-friendly.
-    
-    Args:
-        ai_content: Raw AI review content
-        
-    Returns:
-        Formatted review content
-    """
-    if not ai_content:
-        return "❌ No AI review content available"
-    
-    # Simple, clean formatting
-    formatted_parts = []
-    
-    # Extract basic vulnerability info
-    if "Path Traversal Vulnerability" in ai_content:
-        formatted_parts.append("## 🚨 Security Issue: Path Traversal")
-        formatted_parts.append("")
-    
-    # Extract location
-    location = ""
-    for line in ai_content.split('\n'):
-        if "File:" in line:
-            location = line.replace("File:", "").strip()
-            break
-    
-    if location:
-        formatted_parts.append(f"**File:** {location}")
-    
-    # Extract severity
-    severity = "High"
-    for line in ai_content.split('\n'):
-        if "Severity:" in line:
-            severity = line.replace("Severity:", "").strip()
-            break
-    
-    formatted_parts.append(f"**Severity:** {severity}")
-    formatted_parts.append("")
-    
-    # Extract CWE
-    cwe = ""
-    for line in ai_content.split('\n'):
-        if "CWE-ID:" in line:
-            cwe = line.replace("CWE-ID:", "").strip()
-            break
-    
-    if cwe:
-        formatted_parts.append(f"**CWE:** {cwe}")
-        formatted_parts.append("")
-    
-    # Extract description (first meaningful paragraph)
-    description = ""
-    lines = ai_content.split('\n')
-    for i, line in enumerate(lines):
-        if "Vulnerability Description:" in line:
-            # Get the next meaningful line
-            for j in range(i + 1, len(lines)):
-                if lines[j].strip() and not lines[j].strip().startswith('###'):
-                    description = lines[j].strip()
-                    break
-            break
-    
-    if description:
-        formatted_parts.append("**Issue:** " + description)
-        formatted_parts.append("")
-    
-    # Extract vulnerable code
-    vulnerable_code = ""
-    start_idx = ai_content.find("```python")
-    if start_idx != -1:
-        end_idx = ai_content.find("```", start_idx + 9)
-        if end_idx != -1:
-            vulnerable_code = ai_content[start_idx:end_idx + 3]
-    
-    if vulnerable_code:
-        formatted_parts.append("**Vulnerable Code:**")
-        formatted_parts.append(vulnerable_code)
-        formatted_parts.append("")
-    
-    # Extract secure code
-    secure_code = ""
-    secure_start = ai_content.find("Secure Code:")
-    if secure_start != -1:
-        start_idx = ai_content.find("```python", secure_start)
-        if start_idx != -1:
-            end_idx = ai_content.find("```", start_idx + 9)
-            if end_idx != -1:
-                secure_code = ai_content[start_idx:end_idx + 3]
-    
-    if secure_code:
-        formatted_parts.append("**Secure Code:**")
-        formatted_parts.append(secure_code)
-        formatted_parts.append("")
-    
-    # Extract key recommendations
-    recommendations = []
-    in_recs = False
-    for line in ai_content.split('\n'):
-        if "Recommendations:" in line:
-            in_recs = True
-            continue
-        elif in_recs and line.strip().startswith('###'):
-            break
-        elif in_recs and line.strip().startswith('1.') or line.strip().startswith('-'):
-            rec = line.strip()
-            if rec.startswith('1.'):
-                rec = rec[2:].strip()
-            elif rec.startswith('-'):
-                rec = rec[1:].strip()
-            if rec and len(rec) > 10:
-                recommendations.append(rec)
-    
-    if recommendations:
-        formatted_parts.append("**Key Fixes:**")
-        for i, rec in enumerate(recommendations[:3], 1):  # Limit to 3
-            formatted_parts.append(f"{i}. {rec}")
-        formatted_parts.append("")
-    
-    # If no structured content found, provide a simple summary
-    if len(formatted_parts) <= 3:
-        formatted_parts = []
-        formatted_parts.append("## 🔍 AI Security Review")
-        formatted_parts.append("")
-        formatted_parts.append("The AI has analyzed your code changes and identified potential security considerations.")
-        formatted_parts.append("")
-        formatted_parts.append("**Recommendation:** Review the changes for security best practices and ensure proper input validation.")
-    
-    return '\n'.join(formatted_parts)
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from review_parser import parse_review, render_findings
 
 # Test with the actual Databricks response
 ai_response = """{'messages': [{'role': 'assistant', 'content': '## 🔴 Path Traversal Vulnerability
@@ -195,15 +71,94 @@ def read_file_secure(filename):
 - Consider using a web application firewall (WAF) to detect and prevent common web attacks, including path traversal attempts.
 - Regularly update and patch your system and applications to protect against known vulnerabilities.', 'id': 'run--b33f81b4-ab13-420b-9b4f-eb28d4d61432-0'}], 'id': 'b68cf68b-4630-4f10-b7cb-05505070650d'}"""
 
-# Extract the content from the response
-import json
-response_data = json.loads(ai_response)
-ai_content = response_data['messages'][0]['content']
-
-# Format and display the markdown
-formatted_markdown = _format_ai_review(ai_content)
-print("=" * 80)
-print("ACTUAL MARKDOWN OUTPUT FOR PR COMMENT:")
-print("=" * 80)
-print(formatted_markdown)
-print("=" * 80) 
\ No newline at end of file
+# Extract the content from the response (a Python repr, not JSON)
+ai_content = ai_response.split("'content': '", 1)[1].rsplit("', 'id':", 1)[0]
+
+# A response in the concise prompt's layout (system_prompts/security_analyst_agent_concise.txt)
+concise_content = """## 🔴 [CRITICAL] [SQL Injection]
+
+**Vector DB Context**: Similar string-built queries were exploited in several CVEs.
+**Location**: File: `app/db.py`, Line: 42, Function: `find_user()`
+**Description**: The user id is interpolated into the SQL text.
+**CWE**: CWE-89 | **OWASP**: A03:2021 Injection
+**Related CVEs**: CVE-2019-0000
+**Risk**: Severity: Critical | Impact: Data theft | Likelihood: High
+**Attack Scenario**: An attacker sends `1 OR 1=1` as the id.
+
+**Vulnerable Code**:
+```python
+cursor.execute(f"SELECT * FROM users WHERE id = {uid}")
+```
+
+**Secure Code**:
+```python
+cursor.execute("SELECT * FROM users WHERE id = %s", (uid,))
+```
+
+**Recommendations**: Use parameterized queries
+**Similar Cases**: The same pattern in the reporting module
+
+## 🟡 [medium] Weak Hash
+
+**Location**: File: `app/auth.py`, Line: 7
+**CWE**: CWE-328
+"""
+
+
+def test_long_form():
+    parsed = parse_review(ai_content)
+    assert not parsed.clean
+    assert len(parsed.findings) == 1
+    finding = parsed.findings[0]
+    assert finding.title == "Path Traversal Vulnerability"
+    assert finding.severity == "High"
+    assert finding.cwe == "CWE-23"
+    assert finding.file == "Path_Traversal_bad.py"
+    assert finding.line == "2-5"
+    assert finding.function == "read_file_vulnerable()"
+    assert finding.description.startswith("The `read_file_vulnerable` function is vulnerable")
+    assert finding.vulnerable_code_language == "python"
+    assert 'file_path = "/var/uploads/" + filename' in finding.vulnerable_code
+    assert "def read_file_secure(filename):" in finding.secure_code
+    assert finding.recommendations[:3] == [
+        "Validate user input to prevent directory traversal attacks.",
+        "Use `os.path.join` to construct file paths securely.",
+        "Check if the file exists and is a regular file before attempting to read it."
+    ]
+
+
+def test_concise_form():
+    parsed = parse_review(concise_content)
+    assert [finding.title for finding in parsed.findings] == ["SQL Injection", "Weak Hash"]
+    finding = parsed.findings[0]
+    # The severity comes from the [CRITICAL] heading prefix
+    assert finding.severity == "Critical"
+    assert finding.cwe == "CWE-89"
+    assert finding.file == "app/db.py"
+    assert finding.line == "42"
+    assert finding.function == "find_user()"
+    assert finding.description == "The user id is interpolated into the SQL text."
+    assert "{uid}" in finding.vulnerable_code
+    assert "%s" in finding.secure_code
+    # Similar Cases ends the Recommendations section instead of becoming a fix
+    assert finding.recommendations == ["Use parameterized queries"]
+    assert parsed.findings[1].severity == "Medium"
+    assert parsed.findings[1].cwe == "CWE-328"
+
+
+def test_clean_review():
+    parsed = parse_review("## ✅ SECURITY ANALYSIS COMPLETE - YOUR CODE IS GOOD TO GO! 🎉\n\n"
+                          "**Summary**: Files: 2 | Critical: 0 | High: 0\n")
+    assert parsed.clean
+    assert parsed.findings == []
+
+
+if __name__ == "__main__":
+    # Parse and format the markdown
+    parsed = parse_review(ai_content)
+    formatted_markdown = render_findings(parsed.findings, clean=parsed.clean)
+    print("=" * 80)
+    print("ACTUAL MARKDOWN OUTPUT FOR PR COMMENT:")
+    print("=" * 80)
+    print(formatted_markdown)
+    print("=" * 80)
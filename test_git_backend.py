@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from git_backend import NULL_OID, GitBackend, parse_file_records
+
+OLD_OID = "a" * 40
+NEW_OID = "b" * 40
+
+
+def git(repo, *args) -> str:
+    env = dict(os.environ, GIT_AUTHOR_NAME="Test", GIT_AUTHOR_EMAIL="test@example.com",
+               GIT_COMMITTER_NAME="Test", GIT_COMMITTER_EMAIL="test@example.com")
+    result = subprocess.run(["git", *args], cwd=repo, env=env, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def commit(repo, message: str) -> str:
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", message)
+    return git(repo, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "repo"
+    path.mkdir()
+    git(path, "init", "-q")
+    (path / "src").mkdir()
+    (path / "src" / "old.py").write_text(''.join(f"line_{i} = {i}\n" for i in range(20)))
+    (path / "logo.bin").write_bytes(bytes(range(256)))
+    (path / "a|b.py").write_text("x = 1\n")
+    (path / "tab\tname.txt").write_text("one\n")
+    first = commit(path, "first")
+    git(path, "mv", "src/old.py", "src/new.py")
+    (path / "src" / "new.py").write_text(''.join(f"line_{i} = {i}\n" for i in range(19)) + "line_19 = 0\n")
+    (path / "logo.bin").write_bytes(bytes(range(255, -1, -1)) + b"\0")
+    (path / "a|b.py").write_text("x = 2\ny = 3\n")
+    (path / "tab\tname.txt").unlink()
+    (path / "new file.txt").write_text("hello\n")
+    second = commit(path, "second")
+    return path, first, second
+
+
+def test_parse_rename_and_binary_records():
+    preamble = "\0".join([
+        f":100644 100644 {OLD_OID} {NEW_OID} R087", "src/old.py", "src/new.py",
+        f":100644 100644 {OLD_OID} {NEW_OID} M", "logo.bin",
+        "1\t1\t", "src/old.py", "src/new.py",
+        "-\t-\tlogo.bin", ""
+    ])
+    renamed, binary = parse_file_records(preamble)
+    assert (renamed["old_path"], renamed["path"], renamed["status"], renamed["similarity"]) == \
+        ("src/old.py", "src/new.py", "R", 87)
+    assert (renamed["additions"], renamed["deletions"], renamed["binary"]) == (1, 1, False)
+    assert (binary["path"], binary["binary"], binary["additions"]) == ("logo.bin", True, 0)
+
+
+def test_parse_paths_with_separators():
+    preamble = "\0".join([
+        f":000000 100644 {NULL_OID} {NEW_OID} A", "a|b\tc.py",
+        "3\t0\ta|b\tc.py", ""
+    ])
+    record, = parse_file_records(preamble)
+    assert (record["path"], record["old_path"], record["status"]) == ("a|b\tc.py", None, "A")
+    assert (record["additions"], record["deletions"]) == (3, 0)
+    assert (record["old_oid"], record["new_oid"]) == (NULL_OID, NEW_OID)
+
+
+def test_diff_with_files_from_a_real_repository(repo):
+    path, first, second = repo
+    backend = GitBackend(str(path))
+    try:
+        patch, files, return_code = backend.diff_with_files(first, second, 3)
+    finally:
+        backend.close()
+    assert return_code == 0
+    by_path = {record["path"]: record for record in files}
+    assert set(by_path) == {"a|b.py", "logo.bin", "new file.txt", "src/new.py", "tab\tname.txt"}
+    assert by_path["src/new.py"]["status"] == "R"
+    assert by_path["src/new.py"]["old_path"] == "src/old.py"
+    assert (by_path["a|b.py"]["additions"], by_path["a|b.py"]["deletions"]) == (2, 1)
+    assert by_path["logo.bin"]["binary"]
+    assert (by_path["logo.bin"]["old_size"], by_path["logo.bin"]["size"]) == (256, 257)
+    assert by_path["tab\tname.txt"]["status"] == "D" and by_path["tab\tname.txt"]["size"] == 0
+    assert by_path["new file.txt"]["old_path"] is None
+    assert patch.startswith("diff --git ")
+    assert "+y = 3" in patch and "\0" not in patch
+
+
+def test_streamed_diff_matches_the_single_call(repo):
+    path, first, second = repo
+    backend = GitBackend(str(path))
+    try:
+        patch, files, _ = backend.diff_with_files(first, second, 3)
+        streamed_files = []
+        streamed = ''.join(backend.iter_diff_with_files(first, second, 3, streamed_files))
+    finally:
+        backend.close()
+    assert streamed.rstrip("\n") == patch
+    assert streamed_files == files
+
+
+def test_log_entries_and_lookups_reuse_processes(repo):
+    path, first, second = repo
+    backend = GitBackend(str(path))
+    try:
+        entries = backend.log_entries("HEAD", 2)
+        assert [(entry["hash"], entry["parents"], entry["message"]) for entry in entries] == [
+            (second, first, "second"), (first, "", "first")
+        ]
+        assert entries[0]["author"] == "Test"
+        assert backend.log_entries("no-such-ref") == []
+        assert backend.resolve("HEAD~1") == first
+        assert backend.resolve("no-such-ref") is None
+        blobs = git(path, "ls-tree", "-r", first).split("\n")
+        oids = [line.split()[2] for line in blobs]
+        sizes = backend.object_sizes(oids + [NULL_OID, "f" * 40])
+        assert set(sizes) == set(oids) and sizes[git(path, "rev-parse", f"{first}:logo.bin")] == 256
+        # One git log per log_entries call, and one cat-file process for every lookup
+        assert backend.process_count == 3
+    finally:
+        backend.close()
+
+
+def test_many_object_sizes_in_windows(repo, monkeypatch):
+    path, first, _ = repo
+    monkeypatch.setattr("git_backend.BATCH_WINDOW", 2)
+    oids = [git(path, "rev-parse", f"{first}:{name}") for name in ("a|b.py", "logo.bin", "src/old.py")]
+    backend = GitBackend(str(path))
+    try:
+        source = ''.join(f"line_{i} = {i}\n" for i in range(20))
+        assert list(backend.object_sizes(oids + oids).values()) == [len("x = 1\n"), 256, len(source)]
+    finally:
+        backend.close()
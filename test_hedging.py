@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from hedging import CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, HedgedTransport
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeTransport:
+    """Answers calls in order with (delay, status) pairs; the last pair repeats."""
+
+    url = "https://example.test/serving-endpoints/review"
+    requires_token = True
+    retry_count = 0
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+        self.tracer = None
+        self._lock = threading.Lock()
+
+    def post(self, body, headers, stream=False):
+        with self._lock:
+            index = self.calls
+            self.calls += 1
+        delay, status = self.answers[min(index, len(self.answers) - 1)]
+        time.sleep(delay)
+        if status is None:
+            raise ConnectionError("connection reset")
+        return FakeResponse(status, f"call {index}")
+
+    def close(self):
+        pass
+
+
+def test_breaker_opens_after_consecutive_failures(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("hedging.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+
+    now[0] += 30
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+
+    now[0] += 30
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0, "trips": 1, "rejected": 2}
+
+
+def test_open_breaker_rejects_without_calling():
+    transport = FakeTransport((0, 503))
+    hedged = HedgedTransport(transport, percentile=None, breaker=CircuitBreaker(failure_threshold=1))
+    assert hedged.post("{}", {}).status_code == 503
+    with pytest.raises(CircuitOpenError):
+        hedged.post("{}", {})
+    assert transport.calls == 1
+
+
+def test_slow_call_is_hedged_and_the_hedge_wins():
+    transport = FakeTransport((1.0, 200), (0.0, 200))
+    hedged = HedgedTransport(transport, initial_delay=0.1)
+    response = hedged.post("{}", {})
+    assert response.text == "call 1"
+    assert (hedged.stats()["hedged"], hedged.stats()["hedge_wins"]) == (1, 1)
+
+
+def test_hedge_delay_follows_the_latency_percentile(monkeypatch):
+    monkeypatch.setattr("hedging.MIN_HEDGE_DELAY", 0.0)
+    hedged = HedgedTransport(FakeTransport((0.0, 200)), percentile=50, initial_delay=7)
+    assert hedged.hedge_delay() == 7
+    hedged._latencies.extend(float(i) for i in range(1, 12))
+    assert hedged.hedge_delay() == 6.0
+    assert HedgedTransport(FakeTransport((0.0, 200)), percentile=None).hedge_delay() is None
+
+
+def test_retryable_status_falls_back_when_both_fail():
+    transport = FakeTransport((0.3, 503), (0.0, 503))
+    hedged = HedgedTransport(transport, initial_delay=0.1)
+    assert hedged.post("{}", {}).status_code == 503
+    assert transport.calls == 2
+
+
+def test_deadline_abandons_the_call():
+    hedged = HedgedTransport(FakeTransport((1.0, 200)), percentile=None, deadline=Deadline(0.1))
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        hedged.post("{}", {})
+    assert time.monotonic() - start < 0.9
+    with pytest.raises(DeadlineExceeded):
+        hedged.post("{}", {})
+    assert hedged.stats()["deadline_exceeded"] == 1
+
+
+def test_connection_errors_are_raised_when_every_attempt_fails():
+    breaker = CircuitBreaker(failure_threshold=3)
+    hedged = HedgedTransport(FakeTransport((0.0, None)), percentile=None, breaker=breaker)
+    with pytest.raises(ConnectionError):
+        hedged.post("{}", {})
+    assert breaker.failures == 1
+
+
+@pytest.mark.parametrize("status", [401, 403, 404])
+def test_unusable_endpoint_counts_as_a_breaker_failure(status):
+    breaker = CircuitBreaker(failure_threshold=2)
+    transport = FakeTransport((0.0, status))
+    hedged = HedgedTransport(transport, percentile=None, breaker=breaker)
+    assert hedged.post("{}", {}).status_code == status
+    assert hedged.post("{}", {}).status_code == status
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        hedged.post("{}", {})
+    assert transport.calls == 2
+    assert hedged.stats()["latency_samples"] == 0
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from http_transport import EndpointTransport
+from mock_endpoint import MockEndpoint
+
+BODY = json.dumps({"dataframe_split": {"columns": ["messages"], "data": [["review " * 200]]}})
+
+
+class HeaderOnly:
+    def __init__(self, retry_after: str):
+        self.headers = {"Retry-After": retry_after}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_gzip_body_is_accepted():
+    endpoint = MockEndpoint().start()
+    transport = EndpointTransport(endpoint.url, gzip_body=True, max_retries=0)
+    try:
+        response = transport.post(BODY, {"Content-Type": "application/json"})
+        assert response.status_code == 200
+        assert response.json()["messages"][0]["content"] == endpoint.review
+        assert endpoint.bytes_received == len(BODY)
+    finally:
+        transport.close()
+        endpoint.stop()
+
+
+def test_throttled_requests_are_retried():
+    endpoint = MockEndpoint(latency=0.3, capacity=1).start()
+    transport = EndpointTransport(endpoint.url, max_retries=5, backoff_base=0.1, pool_size=2)
+    try:
+        statuses = []
+        threads = [threading.Thread(target=lambda: statuses.append(transport.post(BODY, {}).status_code))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert statuses == [200, 200]
+        assert endpoint.throttled_count >= 1
+        assert transport.retry_count == endpoint.throttled_count
+    finally:
+        transport.close()
+        endpoint.stop()
+
+
+def test_last_response_is_returned_once_retries_run_out():
+    endpoint = MockEndpoint(latency=0.3, capacity=1).start()
+    transport = EndpointTransport(endpoint.url, max_retries=0, pool_size=2)
+    try:
+        slow = threading.Thread(target=transport.post, args=(BODY, {}))
+        slow.start()
+        while endpoint.request_count == 0:
+            time.sleep(0.01)
+        assert transport.post(BODY, {}).status_code == 429
+        slow.join()
+    finally:
+        transport.close()
+        endpoint.stop()
+
+
+def test_connection_errors_are_retried_then_raised():
+    transport = EndpointTransport(f"http://127.0.0.1:{free_port()}/invocations", max_retries=2, backoff_base=0.01)
+    with pytest.raises(requests.ConnectionError):
+        transport.post(BODY, {})
+    assert transport.retry_count == 2
+
+
+def test_retry_after_header():
+    transport = EndpointTransport("http://127.0.0.1:1/invocations", backoff_max=30)
+    assert transport._retry_after(HeaderOnly("2.5")) == 2.5
+    assert transport._retry_after(HeaderOnly("3600")) == 30
+    assert 0 < transport._retry_after(HeaderOnly(formatdate(time.time() + 10, usegmt=True))) <= 10
+    assert transport._retry_after(HeaderOnly("soon")) is None
+
+
+def test_shared_view_shares_the_pool_but_not_the_counters():
+    transport = EndpointTransport("http://127.0.0.1:1/invocations")
+    transport.retry_count = 3
+    view = transport.shared_view()
+    assert view.session is transport.session and view.retry_count == 0
+    transport.close()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from hunk_dedup import HunkDeduplicator, hunk_key
+from review_parser import Finding
+
+HUNK_BODY = " def handler(request):\n-    data = request.args\n+    data = request.json\n     return data\n"
+
+
+def file_diff(path: str, *hunks: str) -> str:
+    return f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n" + ''.join(hunks)
+
+
+def codemod() -> str:
+    return (
+        file_diff("svc/a/views.py", "@@ -10,3 +10,3 @@\n" + HUNK_BODY)
+        + file_diff("svc/b/views.py", "@@ -40,3 +42,3 @@ class B:\n" + HUNK_BODY.replace("return data", "return data   "))
+        + file_diff("svc/c/views.py", "@@ -1,1 +1,1 @@\n-a\n+b\n", "@@ -7,3 +7,3 @@\n" + HUNK_BODY)
+    )
+
+
+def test_hunk_key_ignores_position_and_trailing_whitespace():
+    first = ["@@ -10,3 +10,3 @@\n"] + HUNK_BODY.splitlines(keepends=True)
+    moved = ["@@ -40,3 +42,3 @@ class B:\n"] + [line.rstrip("\n") + "  \n" for line in first[1:]]
+    assert hunk_key(first) == hunk_key(moved)
+    assert hunk_key(first) != hunk_key(first[:-1])
+
+
+def test_dedupe_keeps_the_first_copy_and_drops_empty_files():
+    diff, report = HunkDeduplicator().dedupe(codemod().splitlines(keepends=True))
+    assert diff.count("request.json") == 1
+    assert "svc/b/views.py" not in diff
+    # svc/c keeps its distinct (short) hunk, so its header stays
+    assert "svc/c/views.py" in diff and "@@ -7,3" not in diff
+    assert (report["total_hunks"], report["duplicate_hunks"], report["dropped_files"]) == (4, 2, 1)
+    group, = report["groups"]
+    assert group["reviewed"] == {"path": "svc/a/views.py", "start": 10, "lines": 3}
+    assert group["duplicates"] == [{"path": "svc/b/views.py", "start": 42, "lines": 3},
+                                   {"path": "svc/c/views.py", "start": 7, "lines": 3}]
+
+
+def test_short_hunks_are_never_deduplicated():
+    diff = file_diff("a.py", "@@ -1,1 +1,1 @@\n-a\n+b\n") + file_diff("b.py", "@@ -1,1 +1,1 @@\n-a\n+b\n")
+    deduped, report = HunkDeduplicator().dedupe(diff.splitlines(keepends=True))
+    assert deduped == diff
+    assert report["duplicate_hunks"] == 0
+
+
+def test_fan_out_shifts_line_numbers():
+    _, report = HunkDeduplicator().dedupe(codemod().splitlines(keepends=True))
+    finding = Finding(title="Unvalidated input", file="`svc/a/views.py`", line="11-12",
+                      recommendations=["Validate the payload"])
+    outside = Finding(title="Elsewhere", file="svc/a/views.py", line="30")
+    result = HunkDeduplicator.fan_out([finding, outside], report["groups"])
+    assert [(f.file, f.line, f.duplicate_of) for f in result] == [
+        ("`svc/a/views.py`", "11-12", ""),
+        ("svc/b/views.py", "43-44", "svc/a/views.py:11"),
+        ("svc/c/views.py", "8-9", "svc/a/views.py:11"),
+        ("svc/a/views.py", "30", "")
+    ]
+    assert result[1].recommendations == finding.recommendations
+    assert result[1].recommendations is not finding.recommendations
+
+
+def test_fan_out_matches_paths_relative_to_a_subdirectory():
+    _, report = HunkDeduplicator().dedupe(codemod().splitlines(keepends=True))
+    result = HunkDeduplicator.fan_out([Finding(title="t", file="a/views.py", line="Line 10")], report["groups"])
+    assert [(f.file, f.line) for f in result[1:]] == [("svc/b/views.py", "Line 42"), ("svc/c/views.py", "Line 7")]
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from rate_limiter import SharedRateLimiter
+
+KEY = "https://example.test/serving-endpoints/review"
+
+
+def limiter(tmp_path, **kwargs) -> SharedRateLimiter:
+    return SharedRateLimiter(KEY, path=str(tmp_path / "limits.sqlite"), **kwargs)
+
+
+def report(path: str, bounds, status, hold: bool = False):
+    """Run in a separate process: make one call with the given outcome, or take a slot and exit holding it."""
+    child = SharedRateLimiter(KEY, path=path, max_concurrency=bounds[0], min_concurrency=bounds[1])
+    lease = child.acquire()
+    if not hold:
+        child.release(lease, 0.01, status)
+    child.close()
+
+
+def in_process(shared: SharedRateLimiter, status, hold: bool = False):
+    bounds = (shared.max_concurrency, shared.min_concurrency)
+    process = multiprocessing.get_context("spawn").Process(target=report,
+                                                           args=(str(shared.path), bounds, status, hold))
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+
+
+def test_throttling_halves_and_successes_add_one_per_round(tmp_path):
+    shared = limiter(tmp_path, max_concurrency=8)
+    shared.release(shared.acquire(), 0.01, 200)
+    assert shared.stats()["concurrency_limit"] == 8
+    shared.release(shared.acquire(), 0.01, 429)
+    assert shared.stats()["concurrency_limit"] == 4
+    for _ in range(4):
+        shared.release(shared.acquire(), 0.01, 200)
+    assert 4.9 < shared.stats()["concurrency_limit"] < 5
+    assert shared.stats()["throttled"] == 1
+    shared.close()
+
+
+def test_one_decrease_per_cooldown(tmp_path):
+    shared = limiter(tmp_path, max_concurrency=8)
+    shared.release(shared.acquire(), 60.0, 200)
+    leases = [shared.acquire() for _ in range(3)]
+    for lease in leases:
+        shared.release(lease, 0.01, 503)
+    assert shared.stats()["concurrency_limit"] == 4
+    shared.close()
+
+
+def test_limit_is_shared_across_processes(tmp_path):
+    shared = limiter(tmp_path, max_concurrency=8, min_concurrency=2)
+    in_process(shared, 429)
+    assert shared.stats()["concurrency_limit"] == 4
+    in_process(shared, None)
+    in_process(shared, 504)
+    assert shared.stats()["concurrency_limit"] == 2
+    shared.close()
+
+
+def test_leases_of_dead_processes_are_reclaimed(tmp_path):
+    shared = limiter(tmp_path, max_concurrency=1)
+    in_process(shared, 200, hold=True)
+    lease, _ = shared._try_acquire()
+    assert lease is not None
+    # The slot is taken now, until released
+    assert shared._try_acquire()[0] is None
+    shared.release(lease, 0.01, 200)
+    assert shared._try_acquire()[0] is not None
+    shared.close()
+
+
+def test_token_bucket_caps_the_request_rate(tmp_path):
+    shared = limiter(tmp_path, requests_per_second=1, burst=2)
+    assert shared._try_acquire()[0] is not None
+    assert shared._try_acquire()[0] is not None
+    lease, delay = shared._try_acquire()
+    assert lease is None and 0 < delay <= 0.05
+    shared.close()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from http_transport import EndpointTransport
+from mock_endpoint import MockEndpoint
+from response_recorder import RecordReplayTransport
+
+BODY = json.dumps({"dataframe_split": {"columns": ["messages"], "data": [["review this"]]}})
+HEADERS = {"Authorization": "Bearer secret", "Content-Type": "application/json"}
+
+
+def test_fingerprint_depends_only_on_the_body():
+    assert RecordReplayTransport.fingerprint(BODY) == RecordReplayTransport.fingerprint(BODY)
+    assert RecordReplayTransport.fingerprint(BODY) != RecordReplayTransport.fingerprint(BODY + " ")
+
+
+def test_recording_requires_a_live_transport(tmp_path):
+    with pytest.raises(ValueError):
+        RecordReplayTransport(record_dir=str(tmp_path))
+
+
+def test_recorded_response_replays_without_the_endpoint(tmp_path):
+    endpoint = MockEndpoint().start()
+    try:
+        recorder = RecordReplayTransport(EndpointTransport(endpoint.url, max_retries=0),
+                                         record_dir=str(tmp_path))
+        live = recorder.post(BODY, HEADERS)
+        assert live.status_code == 200
+        assert recorder.stats() == {"replayed": 0, "recorded": 1, "missed": 0}
+    finally:
+        endpoint.stop()
+
+    recording = tmp_path / f"{RecordReplayTransport.fingerprint(BODY)}.json"
+    assert "secret" not in recording.read_text(encoding="utf-8")
+
+    replayer = RecordReplayTransport(replay_dir=str(tmp_path))
+    assert not replayer.requires_token
+    replayed = replayer.post(BODY, {})
+    assert (replayed.status_code, replayed.text) == (200, live.text)
+    assert replayed.json()["messages"][0]["content"] == endpoint.review
+    assert endpoint.request_count == 1
+
+
+def test_missing_recording_is_a_404(tmp_path):
+    replayer = RecordReplayTransport(replay_dir=str(tmp_path))
+    response = replayer.post(BODY, HEADERS)
+    assert response.status_code == 404
+    assert replayer.stats() == {"replayed": 0, "recorded": 0, "missed": 1}
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from generate_diff import DiffGenerator
+from http_transport import EndpointTransport
+from mock_endpoint import MockEndpoint
+from review_cache import ReviewCache
+
+
+def file_diff(first: str, second: str, offset: int = 0) -> str:
+    """A diff of one file with two hunks."""
+    return (
+        "diff --git a/app.py b/app.py\n"
+        "index 1111111..2222222 100644\n"
+        "--- a/app.py\n"
+        "+++ b/app.py\n"
+        f"@@ -{1 + offset},3 +{1 + offset},3 @@\n"
+        " import os\n"
+        f"-{first}\n"
+        f"+{first}_changed\n"
+        " pass\n"
+        f"@@ -{40 + offset},3 +{40 + offset},3 @@ def handler():\n"
+        " x = 1\n"
+        f"-{second}\n"
+        f"+{second}_changed\n"
+        " return x\n"
+    )
+
+
+def test_cache_key_ignores_line_numbers_and_index(tmp_path):
+    cache = ReviewCache(str(tmp_path / "cache.sqlite"))
+    moved = file_diff("a", "b", offset=12).replace("1111111..2222222", "3333333..4444444")
+    assert cache.make_key(file_diff("a", "b"), "id") == cache.make_key(moved, "id")
+    assert cache.make_key(file_diff("a", "b"), "id") != cache.make_key(file_diff("a", "c"), "id")
+    assert cache.make_key(file_diff("a", "b"), "id") != cache.make_key(file_diff("a", "b"), "other")
+
+
+def test_editing_one_hunk_keeps_the_other_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABRICKS_TOKEN", "test")
+    endpoint = MockEndpoint().start()
+    try:
+        cache = ReviewCache(str(tmp_path / "cache.sqlite"))
+
+        def run(diff: str) -> DiffGenerator:
+            generator = DiffGenerator(output_dir=str(tmp_path / "out"), cache=cache,
+                                      transport=EndpointTransport(endpoint.url, max_retries=0))
+            assert generator.review_diff_cached([diff]) is not None
+            return generator
+
+        assert run(file_diff("a", "b")).cache_lookups == {"cache_hits": 0, "cache_misses": 2}
+        assert run(file_diff("a", "c")).cache_lookups == {"cache_hits": 1, "cache_misses": 1}
+        assert endpoint.request_count == 3
+    finally:
+        endpoint.stop()
+
+
+def test_expired_entries_miss(tmp_path, monkeypatch):
+    cache = ReviewCache(str(tmp_path / "cache.sqlite"), ttl_seconds=60)
+    cache.put("key", {"review": 1})
+    assert cache.get("key") == {"review": 1}
+    now = time.time()
+    monkeypatch.setattr("review_cache.time.time", lambda: now + 61)
+    assert cache.get("key") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr("review_cache.time.time", lambda: next(clock))
+    review = {"content": "x" * 100}
+    size = len('{"content": "' + "x" * 100 + '"}')
+    cache = ReviewCache(str(tmp_path / "cache.sqlite"), max_bytes=3 * size)
+    for key in ("a", "b", "c"):
+        cache.put(key, review)
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") == review
+    cache.put("d", review)
+    assert cache.get("b") is None
+    assert all(cache.get(key) == review for key in ("a", "c", "d"))
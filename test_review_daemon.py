@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from http_transport import EndpointTransport
+from mock_endpoint import MockEndpoint
+from review_cache import ReviewCache
+from review_daemon import ReviewDaemon, make_handler
+
+
+def git(repo, *args):
+    env = dict(os.environ, GIT_AUTHOR_NAME="Test", GIT_AUTHOR_EMAIL="test@example.com",
+               GIT_COMMITTER_NAME="Test", GIT_COMMITTER_EMAIL="test@example.com")
+    subprocess.run(["git", *args], cwd=repo, env=env, capture_output=True, check=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "repo"
+    path.mkdir()
+    git(path, "init", "-q")
+    (path / "db.py").write_text("def find(name):\n    return None\n")
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", "first")
+    (path / "db.py").write_text("def find(name):\n    return cursor.execute(f\"SELECT {name}\")\n")
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", "second")
+    return path
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """A daemon with one worker behind its HTTP API, talking to a mock endpoint."""
+    monkeypatch.setenv("DATABRICKS_TOKEN", "test")
+    endpoint = MockEndpoint().start()
+    daemon = ReviewDaemon(EndpointTransport(endpoint.url, max_retries=0), workers=1, queue_size=1,
+                          cache=ReviewCache(":memory:"), generator_options={"chunked": True})
+    http = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(daemon))
+    thread = threading.Thread(target=http.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{http.server_port}", daemon, endpoint
+    http.shutdown()
+    http.server_close()
+    daemon.shutdown()
+    endpoint.stop()
+
+
+def test_submit_validates_job_requests(server, repo, tmp_path):
+    _, daemon, _ = server
+    for spec, message in (
+        (["not", "an", "object"], "JSON object"),
+        ({"repo": str(tmp_path)}, "Not a git repository"),
+        ({"repo": str(repo), "range": "a..b", "base": "a"}, "cannot be combined"),
+        ({"repo": str(repo), "range": "a...b"}, "BASE..HEAD"),
+    ):
+        with pytest.raises(ValueError, match=message):
+            daemon.submit(spec)
+    assert daemon.status()["counters"]["submitted"] == 0
+
+
+def test_jobs_share_the_cache_and_report_their_own_hits(server, repo, tmp_path):
+    url, daemon, endpoint = server
+    reports = []
+    for run in range(2):
+        reply = requests.post(f"{url}/jobs", json={"repo": str(repo), "output_dir": str(tmp_path / f"out{run}"),
+                                                   "wait": True})
+        assert reply.status_code == 200
+        job = reply.json()
+        assert job["status"] == "done" and job["ai_review"] and job["findings"] > 0
+        assert requests.get(f"{url}/jobs/{job['id']}").json()["status"] == "done"
+        with open(job["report"], encoding="utf-8") as f:
+            reports.append(json.load(f)["statistics"])
+    assert (reports[0]["cache_hits"], reports[0]["cache_misses"]) == (0, 1)
+    assert (reports[1]["cache_hits"], reports[1]["cache_misses"]) == (1, 0)
+    assert endpoint.request_count == 1
+    status = requests.get(f"{url}/status").json()
+    assert status["counters"]["completed"] == 2 and len(status["recent_jobs"]) == 2
+
+
+def test_http_errors(server, repo):
+    url, daemon, _ = server
+    assert requests.post(f"{url}/jobs", data="[1]").status_code == 400
+    assert requests.post(f"{url}/jobs", data="{not json").status_code == 400
+    assert requests.get(f"{url}/jobs/unknown").status_code == 404
+    assert requests.post(f"{url}/other", json={}).status_code == 404
+
+
+def test_full_queue_is_rejected(server, repo, monkeypatch):
+    _, daemon, _ = server
+    release = threading.Event()
+    monkeypatch.setattr(daemon, "_run", lambda job: release.wait(10))
+    running = daemon.submit({"repo": str(repo)})
+    while daemon.status()["active_jobs"] == 0:
+        time.sleep(0.01)
+    daemon.submit({"repo": str(repo)})
+    with pytest.raises(queue.Full):
+        daemon.submit({"repo": str(repo)})
+    assert daemon.status()["counters"]["rejected"] == 1
+    release.set()
+    assert running.done.wait(10)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from security_prefilter import SecurityPrefilter, derive_patterns
+
+BAD_CODE = """import hashlib
+import requests
+
+def fetch(url, password):
+    digest = hashlib.md5(password.encode()).hexdigest()
+    return requests.get(url, verify=False)
+"""
+
+GOOD_CODE = """import hashlib
+import requests
+
+def fetch(url, password):
+    digest = hashlib.sha256(password.encode()).hexdigest()
+    return requests.get(url, verify=True)
+"""
+
+
+def matches(patterns, line: str) -> bool:
+    return any(re.search(pattern, line) for pattern, _ in patterns)
+
+
+def test_derive_patterns_flags_the_insecure_example():
+    patterns = derive_patterns(BAD_CODE, "")
+    assert matches(patterns, "h = hashlib.md5(data)")
+    assert matches(patterns, "requests.post(u, verify = False)")
+    assert not matches(patterns, "h = hashlib.sha256(data)")
+
+
+def test_good_code_suppresses_shared_patterns():
+    # The secure variant calls hashlib.md5 too, only for a checksum; that call says nothing
+    good = GOOD_CODE + "\nchecksum = hashlib.md5(blob).hexdigest()\n"
+    patterns = derive_patterns(BAD_CODE, good)
+    assert not matches(patterns, "h = hashlib.md5(data)")
+    assert matches(patterns, "requests.get(u, verify=False)")
+    assert not matches(patterns, "requests.get(u, verify=True)")
+
+
+def test_generic_calls_never_become_patterns():
+    patterns = derive_patterns("import os\nvalue = os.environ.get('X')\nprint(len(value))\n", "")
+    assert not matches(patterns, "print(len(items))")
+    assert not matches(patterns, "config.get('key')")
+
+
+def test_shapes_need_an_example_without_the_secure_variant():
+    bad = 'query = f"SELECT * FROM users WHERE id = {uid}"\ncursor.execute(query)\n'
+    good = 'cursor.execute("SELECT * FROM users WHERE id = %s", (uid,))\n'
+    assert matches(derive_patterns(bad, good), 'sql = f"select name from t where id = {x}"')
+    assert not matches(derive_patterns(bad, bad), 'sql = f"select name from t where id = {x}"')
+
+
+def test_scan_diff_and_line_numbers():
+    prefilter = SecurityPrefilter([{"pattern": r"\bverify\s*=\s*False\b", "anchors": ["verify"],
+                                    "attack_type": "TLS", "catalog_ids": [7]}])
+    diff = (
+        "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n"
+        "@@ -10,2 +10,3 @@\n ok = 1\n+r = get(u, verify=False)\n-old(verify=False)\n"
+        "@@ -40,1 +41,1 @@\n+clean = 2\n"
+    ).splitlines(keepends=True)
+    flagged, report = prefilter.scan_diff(diff, keep_flagged=True)
+    assert (report["total_hunks"], report["flagged_hunks"], report["hit_count"]) == (2, 1, 1)
+    assert "clean = 2" not in flagged and "verify=False" in flagged
+    hits = prefilter.find_hits(diff)
+    assert [(hit["path"], hit["line"], hit["catalog_ids"]) for hit in hits] == [("a.py", 11, [7])]
+
+
+def test_catalog_rules_flag_catalog_examples():
+    prefilter = SecurityPrefilter.from_catalog()
+    assert prefilter.rules
+    assert prefilter.scan_line("subprocess.call(cmd, shell=True)")
+    assert not prefilter.scan_line("total = price * quantity")
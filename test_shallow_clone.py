@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from generate_diff import DiffGenerator
+from git_backend import GitBackend
+
+
+def git(repo, *args) -> str:
+    env = dict(os.environ, GIT_AUTHOR_NAME="Test", GIT_AUTHOR_EMAIL="test@example.com",
+               GIT_COMMITTER_NAME="Test", GIT_COMMITTER_EMAIL="test@example.com")
+    result = subprocess.run(["git", *args], cwd=repo, env=env, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+@pytest.fixture
+def origin(tmp_path):
+    """A repository with three commits on main and one on a feature branch off the first."""
+    path = tmp_path / "origin"
+    path.mkdir()
+    git(path, "init", "-q", "-b", "main")
+    for name in ("one", "two", "three"):
+        (path / f"{name}.txt").write_text(f"{name}\n")
+        git(path, "add", "-A")
+        git(path, "commit", "-q", "-m", name)
+    git(path, "checkout", "-q", "-b", "feature", "HEAD~2")
+    (path / "feature.txt").write_text("feature\n")
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", "feature")
+    git(path, "checkout", "-q", "main")
+    return path
+
+
+def clone(origin, tmp_path, *args):
+    path = tmp_path / "clone"
+    git(tmp_path, "clone", "-q", *args, f"file://{origin}", str(path))
+    return path
+
+
+def generator(repo, tmp_path, monkeypatch, **kwargs) -> DiffGenerator:
+    monkeypatch.setenv("DATABRICKS_TOKEN", "test")
+    return DiffGenerator(output_dir=str(tmp_path / "out"), repo_path=str(repo), **kwargs)
+
+
+def test_show_entries_keeps_duplicate_refs(origin):
+    backend = GitBackend(str(origin))
+    try:
+        head = git(origin, "rev-parse", "HEAD")
+        entries = backend.show_entries(["HEAD", "main", "HEAD~1"])
+        assert [entry["hash"] for entry in entries[:2]] == [head, head]
+        assert [entry["message"] for entry in entries] == ["three", "three", "two"]
+        assert backend.show_entries(["HEAD", "no-such-ref"]) == []
+    finally:
+        backend.close()
+
+
+def test_merge_base(origin):
+    backend = GitBackend(str(origin))
+    try:
+        assert backend.merge_base("main", "feature") == git(origin, "rev-parse", "main~2")
+    finally:
+        backend.close()
+
+
+def test_full_clone_reviews_the_root_commit_against_the_empty_tree(origin, tmp_path, monkeypatch):
+    root = git(origin, "rev-parse", "main~2")
+    info = generator(origin, tmp_path, monkeypatch, head=root).get_commit_info()
+    assert info["is_initial_commit"] and not info["is_shallow"]
+
+
+def test_depth_one_clone_explains_the_missing_parent(origin, tmp_path, monkeypatch):
+    repo = clone(origin, tmp_path, "--depth", "1", "--branch", "main")
+    with pytest.raises(ValueError, match="fetch depth of at least 2"):
+        generator(repo, tmp_path, monkeypatch).get_commit_info()
+
+
+def test_explicit_base_in_a_shallow_clone(origin, tmp_path, monkeypatch):
+    repo = clone(origin, tmp_path, "--depth", "1", "--branch", "main")
+    base = git(origin, "rev-parse", "main~1")
+    with pytest.raises(ValueError, match=f"git fetch --depth=1 origin {base}"):
+        generator(repo, tmp_path, monkeypatch, base=base).get_commit_info()
+    git(repo, "fetch", "-q", "--depth=1", "origin", base)
+    info = generator(repo, tmp_path, monkeypatch, base=base).get_commit_info()
+    assert info["previous_commit"] == base
+    assert info["is_shallow"] and not info["is_initial_commit"]
+
+
+def test_merge_base_beyond_the_shallow_history(origin, tmp_path, monkeypatch):
+    repo = clone(origin, tmp_path, "--depth", "1", "--no-single-branch")
+    with pytest.raises(ValueError, match="git fetch --deepen=N"):
+        generator(repo, tmp_path, monkeypatch, base="origin/feature", merge_base=True).get_commit_info()
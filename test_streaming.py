@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from generate_diff import DiffGenerator
+from http_transport import EndpointTransport
+from mock_endpoint import MockEndpoint
+
+DIFF = """diff --git a/app/db.py b/app/db.py
+--- a/app/db.py
++++ b/app/db.py
+@@ -1,2 +1,2 @@
+ def find_user(name):
+-    return None
++    return cursor.execute(f"SELECT * FROM users WHERE name = '{name}'")
+"""
+
+COMMIT_INFO = {"previous_commit": "a" * 40, "current_commit": "b" * 40}
+
+
+@pytest.fixture
+def endpoint(request):
+    mock = MockEndpoint(response_bytes=6000, stream_cutoff=getattr(request, "param", None)).start()
+    yield mock
+    mock.stop()
+
+
+def stream(endpoint, output_dir, monkeypatch):
+    monkeypatch.setenv("DATABRICKS_TOKEN", "test")
+    generator = DiffGenerator(output_dir=str(output_dir), stream_response=True,
+                              transport=EndpointTransport(endpoint.url, max_retries=0))
+    extras = {}
+    return generator.stream_databricks_review(DIFF, COMMIT_INFO, extras), extras
+
+
+def test_complete_stream_publishes_comment(endpoint, tmp_path, monkeypatch):
+    review, extras = stream(endpoint, tmp_path, monkeypatch)
+    assert review["messages"][0]["content"] == endpoint.review
+    comment = (tmp_path / "pr_comment.md").read_text(encoding="utf-8")
+    assert comment.rstrip().endswith("*AI analysis provided by Databricks SecureGuard AI*")
+    assert comment.count("## 🚨 Security Issue:") == extras["statistics"]["streaming"]["findings"] > 1
+    assert not (tmp_path / "pr_comment.md.tmp").exists()
+
+
+@pytest.mark.parametrize("endpoint", [40], indirect=True)
+def test_interrupted_stream_leaves_no_partial_review(endpoint, tmp_path, monkeypatch):
+    review, extras = stream(endpoint, tmp_path, monkeypatch)
+    assert review is None
+    # Findings were published before the cut, but nothing of them may remain
+    assert extras["statistics"]["streaming"]["findings"] >= 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == []
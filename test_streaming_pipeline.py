@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from generate_diff import DiffGenerator
+from http_transport import EndpointTransport
+from mock_endpoint import MockEndpoint
+
+# Fields that differ between any two runs
+VOLATILE_KEYS = {"timestamp", "timings"}
+
+
+def git(repo, *args):
+    env = dict(os.environ, GIT_AUTHOR_NAME="Test", GIT_AUTHOR_EMAIL="test@example.com",
+               GIT_COMMITTER_NAME="Test", GIT_COMMITTER_EMAIL="test@example.com")
+    subprocess.run(["git", *args], cwd=repo, env=env, capture_output=True, check=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "repo"
+    path.mkdir()
+    git(path, "init", "-q")
+    (path / "config.py").write_text(''.join(f"SETTING_{i} = {i}\n" for i in range(200)))
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", "settings")
+    (path / "config.py").write_text(''.join(f"SETTING_{i} = {i * 2 if i % 40 == 0 else i}\n" for i in range(200)))
+    (path / "run.py").write_text("import os\n\ndef run(cmd):\n    os.system(cmd)\n")
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", "run commands")
+    return path
+
+
+def stable(value):
+    if isinstance(value, dict):
+        return {key: stable(item) for key, item in value.items() if key not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [stable(item) for item in value]
+    return value
+
+
+def test_streamed_run_matches_the_in_memory_run(repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABRICKS_TOKEN", "test")
+    endpoint = MockEndpoint().start()
+    outputs = {}
+    try:
+        for stream in (False, True):
+            output_dir = tmp_path / f"out-{stream}"
+            generator = DiffGenerator(output_dir=str(output_dir), chunked=True, max_chunk_bytes=600,
+                                      stream=stream, repo_path=str(repo),
+                                      transport=EndpointTransport(endpoint.url, max_retries=0))
+            try:
+                generator.generate()
+            finally:
+                generator.close()
+            outputs[stream] = output_dir
+    finally:
+        endpoint.stop()
+
+    in_memory, streamed = outputs[False], outputs[True]
+    assert sorted(path.name for path in in_memory.iterdir()) == sorted(path.name for path in streamed.iterdir())
+    for name in ("code_diff.txt", "ai_review.json", "pr_comment.md"):
+        assert (in_memory / name).read_bytes() == (streamed / name).read_bytes()
+    summaries = [re.sub(r"\*\*Timestamp:\*\* \S+", "", (path / "diff_summary.md").read_text(encoding="utf-8"))
+                 for path in (in_memory, streamed)]
+    assert summaries[0] == summaries[1]
+    reports = [json.loads((path / "diff_report.json").read_text(encoding="utf-8")) for path in (in_memory, streamed)]
+    assert stable(reports[0]) == stable(reports[1])
+    assert len(json.loads((streamed / "ai_review.json").read_text(encoding="utf-8"))["chunks"]) > 1